@@ -1,21 +1,49 @@
 import streamlit as st
 import pandas as pd
-from sqlalchemy.orm import Session
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from backend.database import SessionLocal
-from backend.models import Course, Video, VideoProgress, Question, Answer
+from backend.services import analytics
+from backend.services.auth import ADMIN_TOKEN, ADMIN_TOKEN_HEADER
 
 # Page Config
 st.set_page_config(page_title="LearningDB Explorer", layout="wide")
 
-# Database Connection
-def get_db():
+# The sync APIs are admin-only; the dashboard authenticates with ADMIN_TOKEN
+API_HEADERS = {ADMIN_TOKEN_HEADER: ADMIN_TOKEN} if ADMIN_TOKEN else {}
+
+# Cached aggregates expire after this many seconds even if nothing was written
+CACHE_TTL_SECONDS = 300
+
+# Database Connection: a short-lived session per query, never held across reruns
+@contextmanager
+def db_session():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
-db = next(get_db())
+# data_version is part of each cache key, so any tracked write invalidates these
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_course_overview(data_version: int, user_id=None):
+    with db_session() as db:
+        return analytics.course_overview(db, user_id=user_id)
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_course_videos(course_id: int, data_version: int, user_id=None):
+    with db_session() as db:
+        return analytics.course_video_status(db, course_id, user_id=user_id)
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_learners(data_version: int):
+    with db_session() as db:
+        return analytics.learners(db)
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS)
+def load_video_list(data_version: int):
+    with db_session() as db:
+        return analytics.video_list(db)
 
 # Title
 st.title("📚 Learning System DB Explorer")
@@ -36,120 +64,160 @@ if os.getenv("sql_host") or os.getenv("REMOTE_DB_URL"):
 
 view_option = st.sidebar.radio("View", options)
 
+if st.sidebar.button("🔄 Refresh data"):
+    st.cache_data.clear()
+
+with db_session() as db:
+    data_version = analytics.data_version(db)
+
 if view_option == "Courses & Progress":
     st.header("Courses Overview")
     # Only show Visible courses in the main view (as requested)
-    courses = db.query(Course).filter(Course.is_hidden != True).all()
+    learner = st.selectbox("Learner", ["All"] + load_learners(data_version))
+    learner_id = None if learner == "All" else learner
+    courses = load_course_overview(data_version, learner_id)
     
     if not courses:
         st.warning("No courses found.")
     else:
-        # Create DataFrame
-        data = []
-        for c in courses:
-            total_videos = len(c.videos)
-            completed_videos = 0
-            for v in c.videos:
-                prog = db.query(VideoProgress).filter(VideoProgress.video_id == v.id).first()
-                if prog and prog.completed:
-                    completed_videos += 1
-            
-            progress = int((completed_videos / total_videos * 100)) if total_videos > 0 else 0
-            
-            data.append({
-                "ID": c.id,
-                "Title": c.title,
-                "Videos": total_videos,
-                "Progress (%)": f"{progress}%",
-                "Playlist ID": c.playlist_id
-            })
+        data = [{
+            "ID": c["id"],
+            "Title": c["title"],
+            "Videos": c["videos"],
+            "Progress (%)": f"{c['progress']}%",
+            "Playlist ID": c["playlist_id"]
+        } for c in courses]
         
         st.dataframe(pd.DataFrame(data), hide_index=True, width='stretch')
 
         st.divider()
         st.subheader("Deep Dive: Select a Course")
-        selected_course_title = st.selectbox("Choose Course", [c.title for c in courses])
+        course_by_title = {c["title"]: c["id"] for c in courses}
+        selected_course_title = st.selectbox("Choose Course", list(course_by_title.keys()))
         
         if selected_course_title:
-            course = db.query(Course).filter(Course.title == selected_course_title).first()
+            videos = load_course_videos(course_by_title[selected_course_title], data_version, learner_id)
             
-            # Show Videos in this course
-            v_data = []
-            previous_completed = True
-            sorted_videos = sorted(course.videos, key=lambda x: x.order)
-            
-            for v in sorted_videos:
-                prog = db.query(VideoProgress).filter(VideoProgress.video_id == v.id).first()
-                is_completed = prog.completed if prog else False
-                is_locked = not previous_completed
-                
-                v_data.append({
-                    "Order": v.order + 1,
-                    "Title": v.title,
-                    "Duration (s)": v.duration,
-                    "Status": "✅ Completed" if is_completed else ("🔒 LOCKED" if is_locked else "🔓 Open"),
-                    "Last Watched": prog.last_watched_timestamp if prog else 0
-                })
-                # Update for next
-                previous_completed = is_completed
+            v_data = [{
+                "Order": v["order"] + 1,
+                "Title": v["title"],
+                "Duration (s)": v["duration"],
+                "Status": "✅ Completed" if v["completed"] else ("🔒 LOCKED" if v["locked"] else "🔓 Open"),
+                "Last Watched": v["last_watched"]
+            } for v in videos]
             
             st.table(pd.DataFrame(v_data))
 
 elif view_option == "All Videos":
     st.header("All Videos Repository")
-    videos = db.query(Video).all()
+    videos = load_video_list(data_version)
     # Simple list
     df = pd.DataFrame([{
-        "ID": v.id, 
-        "Course ID": v.course_id, 
-        "Title": v.title, 
-        "YouTube ID": v.youtube_id
+        "ID": v["id"], 
+        "Course ID": v["course_id"], 
+        "Title": v["title"], 
+        "YouTube ID": v["youtube_id"]
     } for v in videos])
     st.dataframe(df, width='stretch')
 
 elif view_option == "Q&A Analysis":
     st.header("Exam Results & Answers")
     
-    # Filter by Video
-    videos = db.query(Video).all()
-    vid_map = {f"{v.id}: {v.title}": v.id for v in videos}
+    # Filters (all applied in SQL)
+    courses = load_course_overview(data_version)
+    course_map = {f"{c['id']}: {c['title']}": c['id'] for c in courses}
+    videos = load_video_list(data_version)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        selected_course_label = st.selectbox("Filter by Course", ["All"] + list(course_map.keys()))
+        course_id = course_map.get(selected_course_label)
+    with col2:
+        course_videos = [v for v in videos if course_id is None or v['course_id'] == course_id]
+        vid_map = {f"{v['id']}: {v['title']}": v['id'] for v in course_videos}
+        selected_vid_label = st.selectbox("Filter by Video", ["All"] + list(vid_map.keys()))
+        video_id = vid_map.get(selected_vid_label)
+    with col3:
+        pass_filter = st.selectbox("Result", ["All", "Passed", "Failed"])
+        passed = {"Passed": True, "Failed": False}.get(pass_filter)
     
-    selected_vid_label = st.selectbox("Filter by Video", ["All"] + list(vid_map.keys()))
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        dates = st.date_input("Date range", value=())
+    with col2:
+        min_rating, max_rating = st.slider("Score range", 0, 100, (0, 100))
+    with col3:
+        page_size = st.selectbox("Page size", [25, 50, 100, 200], index=1)
     
-    query = db.query(Answer)
-    if selected_vid_label != "All":
-        vid_id = vid_map[selected_vid_label]
-        # Join Question to filter by video
-        query = query.join(Question).filter(Question.video_id == vid_id)
+    date_from = datetime.combine(dates[0], datetime.min.time()) if len(dates) > 0 else None
+    date_to = datetime.combine(dates[1], datetime.min.time()) + timedelta(days=1) if len(dates) > 1 else None
     
-    answers = query.order_by(Answer.created_at.desc()).all()
+    # Keyset pagination: keep the cursors of visited pages, reset when the filters change
+    filters = (course_id, video_id, passed, date_from, date_to, min_rating, max_rating, page_size)
+    if st.session_state.get("qa_filters") != filters:
+        st.session_state.qa_filters = filters
+        st.session_state.qa_cursors = [None]
+    cursors = st.session_state.qa_cursors
     
-    if not answers:
+    with db_session() as db:
+        page = analytics.answer_page(
+            db, course_id=course_id, video_id=video_id, date_from=date_from, date_to=date_to,
+            passed=passed,
+            min_rating=min_rating if min_rating > 0 else None,
+            max_rating=max_rating if max_rating < 100 else None,
+            cursor=cursors[-1], limit=page_size,
+        )
+    
+    if not page["items"]:
         st.info("No answers found.")
     else:
-        a_data = []
-        for a in answers:
-            # Fetch question text
-            q = db.query(Question).filter(Question.id == a.question_id).first()
-            a_data.append({
-                "ID": a.id,
-                "Time": a.created_at,
-                "Question": q.text if q else "Unknown",
-                "User Answer": a.user_answer,
-                "Rating": a.rating,
-                "Pass": "✅" if a.is_correct else "❌",
-                "Feedback": a.feedback
-            })
+        a_data = [{
+            "ID": a["id"],
+            "Time": a["created_at"],
+            "Video": a["video_title"],
+            "Question": a["question"],
+            "User Answer": a["answer_preview"] + ("…" if a["truncated"] else ""),
+            "Rating": a["rating"],
+            "Pass": "✅" if a["is_correct"] else "❌",
+            "Feedback": a["feedback_preview"]
+        } for a in page["items"]]
+        
+        st.dataframe(pd.DataFrame(a_data), width='stretch', hide_index=True)
         
-        st.dataframe(pd.DataFrame(a_data), width='stretch')
+        nav1, nav2, nav3 = st.columns([1, 1, 4])
+        with nav1:
+            if st.button("◀ Newer", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with nav2:
+            if st.button("Older ▶", disabled=page["next_cursor"] is None):
+                cursors.append(page["next_cursor"])
+                st.rerun()
+        with nav3:
+            st.caption(f"Page {len(cursors)}")
+        
+        # Full text is only loaded for the answer being inspected
+        answer_ids = [a["id"] for a in page["items"]]
+        selected_id = st.selectbox("Show full answer", ["-"] + answer_ids)
+        if selected_id != "-":
+            with db_session() as db:
+                detail = analytics.answer_detail(db, selected_id)
+            if detail:
+                with st.expander(f"Answer {detail['id']} ({detail['rating']}/100)", expanded=True):
+                    st.markdown(f"**Question:** {detail['question']}")
+                    st.markdown("**User Answer:**")
+                    st.text(detail["user_answer"] or "")
+                    st.markdown("**Feedback:**")
+                    st.write(detail["feedback"] or "")
         
 elif view_option == "Cloud Sync":
     st.header("☁️ Cloud Database Sync")
 
     # Fetch status from API
+    import time
     import requests
     try:
-        res = requests.get("http://127.0.0.1:8000/api/sync/status")
+        res = requests.get("http://127.0.0.1:8000/api/sync/status", headers=API_HEADERS)
         if res.status_code == 200:
             status = res.json()
             
@@ -168,42 +236,54 @@ elif view_option == "Cloud Sync":
             
             st.divider()
             
+            def run_sync_job(query: str, success_label: str):
+                """Starts a background sync job and follows it until it finishes."""
+                try:
+                    sync_res = requests.post(f"http://127.0.0.1:8000/api/sync/trigger?{query}", headers=API_HEADERS)
+                    if sync_res.status_code not in (200, 202):
+                        st.error(f"Error: {sync_res.text}")
+                        return
+                    started = sync_res.json()
+                    if started['status'] == 'already_running':
+                        st.info(f"A sync job is already running ({started['job_id']}).")
+                    job_id = started['job_id']
+
+                    bar = st.progress(0.0, text="Starting...")
+                    while True:
+                        job = requests.get(f"http://127.0.0.1:8000/api/sync/jobs/{job_id}", headers=API_HEADERS).json()
+                        if job['rows_total']:
+                            fraction = min(job['rows_done'] / job['rows_total'], 1.0)
+                            eta = f", ETA {job['eta_seconds']:.0f}s" if job['eta_seconds'] is not None else ""
+                            bar.progress(fraction, text=f"{job['rows_done']:,}/{job['rows_total']:,} rows "
+                                                        f"({job['rows_per_second']:,.0f} rows/s{eta})")
+                        if job['status'] not in ('queued', 'running'):
+                            break
+                        time.sleep(1)
+
+                    result = job['result'] or {}
+                    if job['status'] == 'success':
+                        bar.progress(1.0, text="Done")
+                        st.success(success_label)
+                        st.json(result.get('details', {}))
+                    elif job['status'] == 'skipped':
+                        st.error(f"Sync Skipped: {result.get('message')}")
+                    else:
+                        st.error(f"Sync Failed: {result.get('message')}")
+                except Exception as e:
+                    st.error(f"Request failed: {e}")
+
             # Trigger
             if st.button("🔄 Sync Now (Force)", type="primary"):
-                with st.spinner("Syncing data to Remote DB..."):
-                    try:
-                        sync_res = requests.post("http://127.0.0.1:8000/api/sync/trigger?force=true")
-                        if sync_res.status_code == 200:
-                            result = sync_res.json()
-                            if result['status'] == 'success':
-                                st.success("Sync Successful!")
-                                st.json(result['details'])
-                            else:
-                                st.error(f"Sync Skipped: {result.get('message')}")
-                        else:
-                            st.error(f"Error: {sync_res.text}")
-                    except Exception as e:
-                        st.error(f"Request failed: {e}")
+                run_sync_job("force=true", "Sync Successful!")
             
             st.write("") # Spacer
             if st.button("⚠️ Reset Remote DB & Sync", type="secondary"):
                 st.warning("This will DELETE ALL DATA on the remote database and re-sync from local.")
                 if st.button("Confirm Reset & Sync"):
-                    with st.spinner("Resetting Remote DB and Syncing..."):
-                        try:
-                            sync_res = requests.post("http://127.0.0.1:8000/api/sync/trigger?force=true&reset=true")
-                            if sync_res.status_code == 200:
-                                result = sync_res.json()
-                                if result['status'] == 'success':
-                                    st.success("Reset & Sync Successful!")
-                                    st.json(result['details'])
-                                else:
-                                    st.error(f"Sync Skipped: {result.get('message')}")
-                            else:
-                                st.error(f"Error: {sync_res.text}")
-                        except Exception as e:
-                            st.error(f"Request failed: {e}")
+                    run_sync_job("force=true&reset=true", "Reset & Sync Successful!")
 
+        elif res.status_code in (401, 403):
+            st.error("The sync API is admin-only: set ADMIN_TOKEN to the same value here and on the server.")
         else:
             st.error("Could not fetch sync status from backend.")
             
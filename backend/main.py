@@ -1,9 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from .database import engine, Base
-from .models import Course, Video, Transcript, Question, Answer, VideoProgress
-from backend.routers import course, sync
+from fastapi.responses import PlainTextResponse, RedirectResponse
+from urllib.parse import quote
+from .database import engine
+from . import migrations
+from .services.sync_service import get_sync_service
+from .services.sync_scheduler import start_scheduler
+from .services.snapshots import start_snapshot_scheduler
+from .services import jobs
+from .services.profiler import ProfilerMiddleware
+from .services.auth import LoginRequired
+from .services.metrics import MetricsMiddleware, instrument_sqlalchemy, render as render_metrics
+from .services.assets import (
+    STATIC_DIR, VIDEO_CACHE_CONTROL, build_manifest,
+    FingerprintedStaticFiles, CachedStaticFiles, DynamicGZipMiddleware,
+)
+from backend.routers import course, sync, admin, auth
 import json
 import os
 from dotenv import load_dotenv
@@ -12,41 +24,65 @@ from dotenv import load_dotenv
 env_path = os.path.join(os.path.dirname(__file__), '.env')
 load_dotenv(env_path)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-# Auto-migrate: add new columns if missing
-from sqlalchemy import inspect as sa_inspect, text
-with engine.connect() as conn:
-    video_cols = [c['name'] for c in sa_inspect(engine).get_columns('videos')]
-    if 'local_filename' not in video_cols:
-        conn.execute(text("ALTER TABLE videos ADD COLUMN local_filename VARCHAR(512)"))
-    course_cols = [c['name'] for c in sa_inspect(engine).get_columns('courses')]
-    if 'source_path' not in course_cols:
-        conn.execute(text("ALTER TABLE courses ADD COLUMN source_path VARCHAR(1024)"))
-    if 'thumbnail' not in course_cols:
-        conn.execute(text("ALTER TABLE courses ADD COLUMN thumbnail VARCHAR(512)"))
-    conn.commit()
+# Time every SQL statement for /metrics
+instrument_sqlalchemy()
 
 app = FastAPI(title="Learning Platform API")
 
-app.mount("/static", StaticFiles(directory="backend/static"), name="static")
+# Fingerprint and precompress static assets; hashed URLs are served as immutable
+print(f"Fingerprinted {build_manifest()} static assets.", flush=True)
+app.mount("/static", FingerprintedStaticFiles(directory=STATIC_DIR), name="static")
 
 # Serve locally downloaded videos
 videos_dir = os.path.join(os.path.dirname(__file__), "videos")
 os.makedirs(videos_dir, exist_ok=True)
-app.mount("/videos", StaticFiles(directory=videos_dir), name="videos")
+app.mount("/videos", CachedStaticFiles(directory=videos_dir, cache_control=VIDEO_CACHE_CONTROL), name="videos")
+
+# Compress HTML/JSON; media, precompressed assets and event streams (which must reach the browser unbuffered) are left alone
+app.add_middleware(DynamicGZipMiddleware, minimum_size=1000, excluded_prefixes=("/static", "/videos", "/stream", "/api/events"))
+
+# Profiles requests carrying PROFILE_TOKEN, or a PROFILE_SAMPLE_RATE share of them
+app.add_middleware(ProfilerMiddleware)
+
+# Outermost, so recorded latency includes compression and the other middleware
+app.add_middleware(MetricsMiddleware)
 
-# Configure CORS
+# Sessions are cookies: only the origins listed in CORS_ORIGINS (comma-separated,
+# e.g. a separate dev frontend) may make credentialed cross-site requests
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"], # Allow all origins for dev
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+@app.exception_handler(LoginRequired)
+def redirect_to_login(request: Request, exc: LoginRequired):
+    return RedirectResponse(url=f"/login?next={quote(exc.next_url)}", status_code=303)
+
+app.include_router(auth.router)
 app.include_router(course.router)
 app.include_router(sync.router)
+app.include_router(admin.router)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+def start_background_workers():
+    # Before anything touches the database; concurrent workers queue on the migration lock
+    migrations.run(engine)
+    get_sync_service().start_health_monitor()
+    start_scheduler()
+    start_snapshot_scheduler()
+    jobs.start_workers()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    # Hand running jobs back to the queue now rather than after JOB_STALE_SECONDS
+    jobs.stop_workers()
 
 # We will add more routers here later
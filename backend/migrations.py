@@ -0,0 +1,151 @@
+"""
+Schema and data migrations, run once per process before it serves requests.
+
+Everything runs in a single BEGIN IMMEDIATE transaction, which takes
+SQLite's write lock up front. When several processes start together
+(`uvicorn --workers N`, a CLI next to the server), one migrates while the
+others wait on the lock, then find nothing left to do. Each step is
+idempotent, and if any step fails the whole migration rolls back.
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect as sa_inspect, text
+
+from .database import SQLITE_BUSY_TIMEOUT_MS, Base
+from .services import peer_sync
+from .services.sync_service import install_change_tracking
+
+# Waiting for another process's migration beats failing startup
+MIGRATION_LOCK_TIMEOUT_MS = 120_000
+
+# (table, column, DDL type) added to databases created before the column existed
+_ADDED_COLUMNS = [
+    ("videos", "local_filename", "VARCHAR(512)"),
+    ("courses", "source_path", "VARCHAR(1024)"),
+    ("courses", "thumbnail", "VARCHAR(512)"),
+    ("sync_changelog", "origin", "VARCHAR(64)"),
+    ("answers", "attempt_id", "INTEGER REFERENCES exam_attempts(id)"),
+    ("jobs", "detail", "TEXT"),
+    ("users", "is_admin", "BOOLEAN NOT NULL DEFAULT 0"),
+]
+
+
+def run(engine):
+    """Brings the database up to date with the models."""
+    if engine.dialect.name != "sqlite":
+        Base.metadata.create_all(bind=engine)
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql(f"PRAGMA busy_timeout={MIGRATION_LOCK_TIMEOUT_MS}")
+        try:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                _migrate(conn)
+            except Exception:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+            conn.exec_driver_sql("COMMIT")
+        finally:
+            # The connection goes back to the pool
+            conn.exec_driver_sql(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+
+
+def _migrate(conn):
+    Base.metadata.create_all(bind=conn)
+
+    added = set()
+    inspector = sa_inspect(conn)
+    for table, column, ddl in _ADDED_COLUMNS:
+        if column not in [c["name"] for c in inspector.get_columns(table)]:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            added.add((table, column))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_answers_created_id ON answers (created_at, id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_answers_attempt_id ON answers (attempt_id)"))
+
+    if ("users", "is_admin") in added:
+        # Accounts predate roles: the first one, who set the instance up, administers it
+        conn.execute(text("UPDATE users SET is_admin = 1 WHERE id = (SELECT MIN(id) FROM users)"))
+
+    # Record row changes for incremental sync. Accounts used to be synced;
+    # their triggers and changelog entries go
+    for op in ("i", "u", "d"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS trg_sync_users_{op}"))
+    conn.execute(text("DELETE FROM sync_changelog WHERE table_name = 'users'"))
+    install_change_tracking(conn)
+
+    migrate_answers_to_attempts(conn)
+    migrate_progress_per_user(conn)
+
+    # Under the lock, so processes starting together settle on one peer sync identity
+    peer_sync.node_id()
+
+
+def migrate_answers_to_attempts(conn):
+    """
+    Folds legacy answers (one row per question, each repeating the full
+    submission text and feedback) into exam_attempts. Rows of one submission
+    share video, text and feedback and were written within a few seconds.
+    Runs after change tracking is installed so the rewrite is synced too.
+    """
+    rows = conn.execute(text(
+        "SELECT a.id, a.user_answer, a.feedback, a.rating, a.is_correct, a.created_at, q.video_id "
+        "FROM answers a JOIN questions q ON q.id = a.question_id "
+        "WHERE a.attempt_id IS NULL "
+        "ORDER BY q.video_id, a.user_answer, a.feedback, a.created_at, a.id"
+    )).fetchall()
+    if not rows:
+        return
+
+    groups = []
+    for row in rows:
+        created = datetime.fromisoformat(str(row.created_at)) if row.created_at else None
+        last = groups[-1] if groups else None
+        if (last and (last["video_id"], last["text"], last["feedback"]) == (row.video_id, row.user_answer, row.feedback)
+                and created and last["created_at"] and (created - last["created_at"]).total_seconds() <= 5):
+            last["answers"].append(row)
+        else:
+            groups.append({"video_id": row.video_id, "text": row.user_answer, "feedback": row.feedback,
+                           "created_at": created, "answers": [row]})
+
+    for g in groups:
+        scores = [a.rating or 0 for a in g["answers"]]
+        attempt_id = conn.execute(text(
+            "INSERT INTO exam_attempts (video_id, user_id, submission_text, overall_score, passed, feedback, created_at) "
+            "VALUES (:video_id, 'user', :text, :score, :passed, :feedback, :created_at)"
+        ), {
+            "video_id": g["video_id"],
+            "text": g["text"],
+            "score": sum(scores) / len(scores),
+            "passed": len(scores) >= 2 and sum(1 for a in g["answers"] if a.is_correct) >= 2,
+            "feedback": g["feedback"],
+            "created_at": g["answers"][0].created_at,
+        }).lastrowid
+        conn.execute(
+            text("UPDATE answers SET attempt_id = :attempt_id, user_answer = NULL, feedback = NULL WHERE id = :id"),
+            [{"attempt_id": attempt_id, "id": a.id} for a in g["answers"]],
+        )
+    print(f"Migrated {len(rows)} answers into {len(groups)} exam attempts.", flush=True)
+
+
+def migrate_progress_per_user(conn):
+    """
+    Progress used to be keyed on video alone, so older databases can hold
+    NULL user ids and several rows per (user, video). Keeps the most advanced
+    row of each pair, then adds the unique index that upserts rely on.
+    """
+    for table in ("video_progress", "exam_attempts"):
+        conn.execute(text(f"UPDATE {table} SET user_id = 'user' WHERE user_id IS NULL"))
+    removed = conn.execute(text(
+        "DELETE FROM video_progress WHERE id IN ("
+        " SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+        "  PARTITION BY user_id, video_id ORDER BY completed DESC, updated_at DESC, id DESC) AS rn"
+        "  FROM video_progress) WHERE rn > 1)"
+    )).rowcount
+    if removed:
+        print(f"Removed {removed} duplicate progress rows.", flush=True)
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_video_progress_user_video ON video_progress (user_id, video_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_exam_attempts_user_video ON exam_attempts (user_id, video_id)"
+    ))
@@ -1,8 +1,19 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, Float
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, Float, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
 
+class User(Base):
+    """A learner account; other tables refer to it by username in their user_id column."""
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(255), unique=True, index=True, nullable=False)
+    password_hash = Column(String(255), nullable=False)
+    # Admins manage the library, jobs and sync; learners only study
+    is_admin = Column(Boolean, nullable=False, default=False, server_default=text("0"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Course(Base):
     __tablename__ = "courses"
 
@@ -58,28 +69,143 @@ class Question(Base):
     video = relationship("Video", back_populates="questions")
     answers = relationship("Answer", back_populates="question")
 
+class ExamAttempt(Base):
+    """One exam submission: the graded text and overall feedback, stored once."""
+    __tablename__ = "exam_attempts"
+    __table_args__ = (Index("ix_exam_attempts_user_video", "user_id", "video_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, ForeignKey("videos.id"), index=True)
+    user_id = Column(String(255), default="user")
+    submission_text = Column(Text) # Typed answer, or the transcription of the recording
+    source = Column(String(16), nullable=True) # 'text' or 'audio'; NULL for migrated answers
+    overall_score = Column(Float, default=0.0)
+    passed = Column(Boolean, default=False)
+    feedback = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    video = relationship("Video")
+    answers = relationship("Answer", back_populates="attempt")
+
 class Answer(Base):
+    """Per-question score within an exam attempt."""
     __tablename__ = "answers"
+    # Keyset pagination for the Q&A views walks this index newest-first
+    __table_args__ = (Index("ix_answers_created_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     question_id = Column(Integer, ForeignKey("questions.id"))
-    user_answer = Column(Text) # Or path to image/audio
+    attempt_id = Column(Integer, ForeignKey("exam_attempts.id"), nullable=True, index=True)
+    user_answer = Column(Text, nullable=True) # Legacy; exam text now lives on the attempt
     is_correct = Column(Boolean)
     rating = Column(Integer, default=0) # 0-100
-    feedback = Column(Text)
+    feedback = Column(Text, nullable=True) # Legacy; overall feedback now lives on the attempt
     created_at = Column(DateTime, default=datetime.utcnow)
 
     question = relationship("Question", back_populates="answers")
+    attempt = relationship("ExamAttempt", back_populates="answers")
 
 class VideoProgress(Base):
     __tablename__ = "video_progress"
+    # One row per learner and video; every progress lookup goes through it
+    __table_args__ = (Index("ux_video_progress_user_video", "user_id", "video_id", unique=True),)
 
     id = Column(Integer, primary_key=True, index=True)
     video_id = Column(Integer, ForeignKey("videos.id"))
-    user_id = Column(String(255), default="user") # Placeholder for single user
+    user_id = Column(String(255), default="user", nullable=False) # Username of the learner
     completed = Column(Boolean, default=False)
     score = Column(Integer, default=0)
     last_watched_timestamp = Column(Float, default=0.0)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
     video = relationship("Video", back_populates="progress")
+
+class SyncChange(Base):
+    """Local-only changelog filled by SQLite triggers; drives incremental sync."""
+    __tablename__ = "sync_changelog"
+    # AUTOINCREMENT so ids never rewind after pruning, keeping watermarks valid
+    __table_args__ = (Index("ix_sync_changelog_table_id", "table_name", "id"), {"sqlite_autoincrement": True})
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(64), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    op = Column(String(1), nullable=False) # 'I', 'U' or 'D'
+    origin = Column(String(64), nullable=True) # Peer node name for imported changes, NULL for local edits
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+class SyncKey(Base):
+    """
+    Peer sync identity of rows first created on another instance: uid is
+    "<node id>:<row id there>". Rows created here have no entry; their uid
+    is derived from this instance's node id. Mirrored, never sent to peers.
+    """
+    __tablename__ = "sync_keys"
+    __table_args__ = (
+        Index("ux_sync_keys_table_uid", "table_name", "uid", unique=True),
+        Index("ix_sync_keys_table_row", "table_name", "row_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String(64), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    uid = Column(String(100), nullable=False)
+
+class LLMCall(Base):
+    """Local-only ledger of Groq API calls (tokens, latency, outcome) for cost tracking."""
+    __tablename__ = "llm_calls"
+    __table_args__ = (Index("ix_llm_calls_created_function", "created_at", "function"),)
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    function = Column(String(64), nullable=False) # ai_tutor function that made the call
+    kind = Column(String(16), nullable=False) # 'chat' or 'transcription'
+    model = Column(String(128))
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cached_tokens = Column(Integer, nullable=True)
+    prompt_chars = Column(Integer, nullable=True)
+    audio_seconds = Column(Float, nullable=True)
+    latency_ms = Column(Integer)
+    retries = Column(Integer, default=0) # 0 for the first attempt
+    outcome = Column(String(64)) # 'ok' or the exception class name
+    error = Column(String(255), nullable=True)
+
+class Job(Base):
+    """Local-only background job queue, shared by every server and worker process on this database."""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_queue_status_run_after", "queue", "status", "run_after"),
+        # At most one queued or running job per dedupe key
+        Index("ux_jobs_active_dedupe", "dedupe_key", unique=True,
+              sqlite_where=text("status IN ('queued', 'running')")),
+        Index("ix_jobs_batch", "batch"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(64), nullable=False) # Handler name, e.g. 'download_video'
+    queue = Column(String(32), nullable=False, default="default") # Worker pool that runs this kind
+    payload = Column(Text, nullable=False, default="{}") # JSON arguments for the handler
+    status = Column(String(16), nullable=False, default="queued") # queued, running, done, failed
+    dedupe_key = Column(String(255), nullable=True)
+    batch = Column(String(64), nullable=True) # Groups jobs started together, e.g. one course download
+    priority = Column(Integer, default=0) # Higher runs first
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow) # Retries are pushed back with a backoff
+    worker = Column(String(128), nullable=True) # host:pid:thread of the claiming worker
+    heartbeat_at = Column(DateTime, nullable=True)
+    progress = Column(Float, nullable=True) # 0..1 when the handler reports it
+    message = Column(String(255), nullable=True)
+    detail = Column(Text, nullable=True) # JSON progress details, e.g. bytes, speed and ETA of a download
+    result = Column(Text, nullable=True) # JSON returned by the handler
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class PageVersion(Base):
+    """Local-only page cache version counters, shared so every server process sees each other's bumps."""
+    __tablename__ = "page_versions"
+
+    scope = Column(String(300), primary_key=True) # 'library', 'dashboard', 'course:<id>' or 'user:<name>'
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,109 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+from ..database import get_db
+from ..services import snapshots, analytics, llm_ledger, profiler, jobs
+from ..services.auth import require_admin
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], route_class=profiler.ProfiledRoute,
+                   dependencies=[Depends(require_admin)])
+
+@router.get("/snapshots")
+def list_snapshots():
+    """Compressed learning.db snapshots, newest first."""
+    return {"snapshots": snapshots.list_snapshots(), "keep": snapshots.SNAPSHOT_KEEP}
+
+@router.post("/snapshots")
+def create_snapshot():
+    """Takes a consistent snapshot of the live database and rotates old ones."""
+    result = snapshots.create_snapshot()
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
+@router.get("/answers")
+def list_answers(
+    course_id: Optional[int] = None,
+    video_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    passed: Optional[bool] = None,
+    min_rating: Optional[int] = Query(None, ge=0, le=100),
+    max_rating: Optional[int] = Query(None, ge=0, le=100),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """
+    Answers newest first with truncated previews. Pass the returned
+    next_cursor back as `cursor` to get the following page.
+    """
+    try:
+        return analytics.answer_page(
+            db, course_id=course_id, video_id=video_id, date_from=date_from, date_to=date_to,
+            passed=passed, min_rating=min_rating, max_rating=max_rating, cursor=cursor, limit=limit,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/answers/{answer_id}")
+def get_answer(answer_id: int, db: Session = Depends(get_db)):
+    """Full answer text and feedback."""
+    answer = analytics.answer_detail(db, answer_id)
+    if not answer:
+        raise HTTPException(status_code=404, detail="Answer not found")
+    return answer
+
+@router.get("/llm_report")
+def llm_report(days: int = Query(7, ge=1, le=365), top: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    """Groq usage per function and model (tokens, audio seconds, latency, errors) plus the largest prompts."""
+    # Include calls still waiting in the ledger queue
+    llm_ledger.flush()
+    return llm_ledger.report(db, days=days, top=top)
+
+@router.get("/profiles")
+def list_profiles():
+    """Stored request profiles, newest first."""
+    return {"profiles": profiler.list_profiles(), "keep": profiler.PROFILE_KEEP}
+
+@router.get("/profiles/{name}")
+def get_profile(name: str):
+    """
+    One stored profile: pyinstrument's HTML view, or a cProfile text report.
+    Admin-only like the rest of this router: profiles expose request paths,
+    SQL and code layout. The HTML runs in a sandbox (an opaque origin), so its
+    scripts can't use the admin's session.
+    """
+    path = profiler.profile_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/html" if name.endswith(".html") else "text/plain"
+    return FileResponse(path, media_type=media_type, headers={
+        "Content-Security-Policy": "sandbox allow-scripts",
+        "X-Content-Type-Options": "nosniff",
+    })
+
+@router.get("/jobs")
+def list_jobs(status: Optional[str] = None, kind: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    """Background jobs newest first, with counts per status."""
+    return {"jobs": jobs.list_jobs(status=status, kind=kind, limit=limit), "counts": jobs.counts_by_status()}
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: int):
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/retry")
+def retry_job(job_id: int):
+    """
+    Queues a failed job again with a fresh set of attempts. If the same work
+    was queued again meanwhile, that job is returned instead.
+    """
+    queued_id = jobs.retry(job_id)
+    if queued_id is None:
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried")
+    return jobs.get_job(queued_id)
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, Form, Request
+from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+from ..database import get_db
+from ..services import auth
+from .course import templates
+
+router = APIRouter(tags=["auth"])
+
+def _login_page(request: Request, db: Session, error: Optional[str] = None, next_url: str = "/",
+                status_code: int = 200):
+    return templates.TemplateResponse("login.html", {
+        "request": request,
+        "error": error,
+        "next": auth.safe_next(next_url),
+        "allow_signup": auth.signup_open(db),
+    }, status_code=status_code)
+
+def _signed_in(username: str, next_url: str) -> RedirectResponse:
+    response = RedirectResponse(url=auth.safe_next(next_url), status_code=303)
+    response.set_cookie(
+        auth.SESSION_COOKIE, auth.sign_session(username),
+        max_age=auth.SESSION_DAYS * 86400, httponly=True, samesite="lax",
+    )
+    return response
+
+@router.get("/login", response_class=HTMLResponse)
+def login_page(request: Request, next: str = "/", db: Session = Depends(get_db)):
+    if auth.session_user(request):
+        return RedirectResponse(url=auth.safe_next(next), status_code=303)
+    return _login_page(request, db, next_url=next)
+
+@router.post("/login")
+def login(request: Request, username: str = Form(...), password: str = Form(...), next: str = Form("/"),
+          db: Session = Depends(get_db)):
+    user = auth.authenticate(db, username, password)
+    if not user:
+        return _login_page(request, db, "Wrong username or password.", next, status_code=401)
+    return _signed_in(user.username, next)
+
+@router.post("/signup")
+def signup(request: Request, username: str = Form(...), password: str = Form(...), next: str = Form("/"),
+           db: Session = Depends(get_db)):
+    if not auth.signup_open(db):
+        return _login_page(request, db, "Sign-up is disabled; ask for an account.", next, status_code=403)
+    try:
+        user = auth.create_user(db, username, password)
+    except ValueError as e:
+        return _login_page(request, db, str(e), next, status_code=400)
+    print(f"[AUTH] Created account {user.username}", flush=True)
+    return _signed_in(user.username, next)
+
+@router.post("/logout")
+def logout():
+    response = RedirectResponse(url="/login", status_code=303)
+    response.delete_cookie(auth.SESSION_COOKIE)
+    return response
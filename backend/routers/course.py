@@ -1,24 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Form, UploadFile, File
 from datetime import datetime
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from ..database import get_db
-from ..models import Course, Video, VideoProgress, Question, Answer, Transcript
-from ..services.youtube import get_playlist_info, get_video_transcript, download_video
+from ..database import SessionLocal, get_db
+from ..models import Course, Video, VideoProgress, Question, Answer, ExamAttempt
 from ..services.local_import import scan_local_folder
-from ..services.ai_tutor import generate_questions, evaluate_answer
-from ..database import SessionLocal
+from ..services.ai_tutor import evaluate_answer
+from ..services import page_cache, profiler, jobs
+from ..services.auth import current_user, is_admin, require_admin
+from ..services.assets import asset_url
 from pydantic import BaseModel
-import threading
+import asyncio
 import os
 import re
 import json
-
-# In-memory download job tracker
-# { course_id: { "status": "running"|"done", "total": N, "completed": N, "failed": N, "results": [...] } }
-_download_jobs: dict = {}
+from urllib.parse import parse_qs, urlparse
 
 
 def _to_int(value, default=0):
@@ -36,8 +37,30 @@ def _to_float(value, default=0.0):
     except (TypeError, ValueError):
         return default
 
-router = APIRouter()
+
+def _user_progress(db: Session, user_id: str, video_id: int) -> VideoProgress:
+    """
+    The learner's progress row for a video, created if missing. The insert
+    is a no-op when the row exists, so two concurrent requests (e.g. two
+    open tabs) can't trip the unique (user_id, video_id) index.
+    """
+    db.execute(
+        sqlite_insert(VideoProgress)
+        .values(user_id=user_id, video_id=video_id)
+        .on_conflict_do_nothing(index_elements=["user_id", "video_id"])
+    )
+    return db.query(VideoProgress).filter(
+        VideoProgress.user_id == user_id, VideoProgress.video_id == video_id
+    ).one()
+
+router = APIRouter(route_class=profiler.ProfiledRoute)
 templates = Jinja2Templates(directory="backend/templates")
+templates.env.globals["asset_url"] = asset_url
+templates.env.globals["is_admin"] = is_admin
+
+# Download event streams re-check progress this often, and send a keepalive after this long without changes
+DOWNLOAD_EVENTS_INTERVAL_SECONDS = float(os.getenv("DOWNLOAD_EVENTS_INTERVAL_SECONDS", "1"))
+DOWNLOAD_EVENTS_KEEPALIVE_SECONDS = 15
 
 class ProgressUpdate(BaseModel):
     video_id: int
@@ -46,9 +69,12 @@ class ProgressUpdate(BaseModel):
     completed: bool
 
 def _get_course_thumbnail(course: Course, db: Session) -> Optional[str]:
-    """Get or generate a thumbnail URL for a course."""
-    if course.thumbnail:
-        return course.thumbnail
+    """
+    Thumbnail URL for a course. Local courses get a frame grabbed by a
+    background job; the page shows the placeholder until it is done.
+    """
+    if course.thumbnail is not None:
+        return course.thumbnail or None
 
     sorted_videos = sorted(course.videos, key=lambda v: v.order)
     if not sorted_videos:
@@ -63,42 +89,35 @@ def _get_course_thumbnail(course: Course, db: Session) -> Optional[str]:
         db.commit()
         return thumb_url
 
-    # Local video: extract a frame with ffmpeg
-    if first_video.local_filename and os.path.isfile(first_video.local_filename):
-        thumbs_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "thumbs")
-        os.makedirs(thumbs_dir, exist_ok=True)
-        thumb_file = f"course_{course.id}.jpg"
-        thumb_path = os.path.join(thumbs_dir, thumb_file)
-
-        if not os.path.exists(thumb_path):
-            try:
-                import subprocess
-                subprocess.run(
-                    ['ffmpeg', '-ss', '30', '-i', first_video.local_filename,
-                     '-vframes', '1', '-vf', 'scale=320:-1', '-q:v', '5',
-                     '-y', thumb_path],
-                    capture_output=True, timeout=15,
-                )
-            except Exception:
-                pass
-
-        if os.path.exists(thumb_path):
-            thumb_url = f"/static/thumbs/{thumb_file}"
-            course.thumbnail = thumb_url
-            db.commit()
-            return thumb_url
+    # Local video: extract a frame with ffmpeg, off the request path
+    if first_video.local_filename:
+        jobs.enqueue("thumbnail", {"course_id": course.id}, dedupe_key=f"thumbnail:{course.id}", max_attempts=1)
 
     return None
 
 @router.get("/", response_class=HTMLResponse)
-def dashboard(request: Request, db: Session = Depends(get_db)):
+def dashboard(request: Request, db: Session = Depends(get_db), user_id: str = Depends(current_user)):
+    return page_cache.cached_page(
+        request, f"dashboard:{user_id}", page_cache.dashboard_etag(user_id),
+        lambda: _render_dashboard(request, user_id, db),
+    )
+
+def _render_dashboard(request: Request, user_id: str, db: Session):
     # Only show non-hidden courses
     courses = db.query(Course).filter(Course.is_hidden == False).all()
-    # Enrich with progress
+    # Per-course video and completion counts for this learner, in two grouped queries
+    video_counts = dict(db.query(Video.course_id, func.count(Video.id)).group_by(Video.course_id).all())
+    completed_counts = dict(
+        db.query(Video.course_id, func.count(VideoProgress.id))
+        .join(VideoProgress, VideoProgress.video_id == Video.id)
+        .filter(VideoProgress.user_id == user_id, VideoProgress.completed == True)
+        .group_by(Video.course_id)
+        .all()
+    )
     course_data = []
     for c in courses:
-        total_vids = len(c.videos)
-        completed = sum(1 for v in c.videos if any(p.completed for p in v.progress))
+        total_vids = video_counts.get(c.id, 0)
+        completed = completed_counts.get(c.id, 0)
         progress = int((completed / total_vids * 100)) if total_vids > 0 else 0
 
         course_data.append({
@@ -110,37 +129,25 @@ def dashboard(request: Request, db: Session = Depends(get_db)):
             "thumbnail": _get_course_thumbnail(c, db),
         })
 
-    return templates.TemplateResponse("dashboard.html", {"request": request, "courses": course_data})
+    return templates.TemplateResponse("dashboard.html", {"request": request, "courses": course_data, "current_user": user_id})
 
-@router.post("/ingest")
+@router.post("/ingest", dependencies=[Depends(require_admin)])
 def ingest_course(playlist_url: str = Form(...), db: Session = Depends(get_db)):
-    # 1. Fetch info
-    info = get_playlist_info(playlist_url)
-    if not info:
+    """Queues a playlist import and returns at once; videos appear as the job reads them."""
+    playlist_url = playlist_url.strip()
+    if not playlist_url.startswith(("https://", "http://")):
         return RedirectResponse(url="/?error=invalid_url", status_code=303)
 
-    # 2. Check exists
-    existing = db.query(Course).filter(Course.playlist_id == info['id']).first()
-    if existing:
-        return RedirectResponse(url=f"/course/{existing.id}", status_code=303)
+    # A known playlist id skips the import; otherwise the job finds out
+    playlist_id = parse_qs(urlparse(playlist_url).query).get("list", [None])[0]
+    if playlist_id:
+        existing = db.query(Course).filter(Course.playlist_id == playlist_id).first()
+        if existing:
+            return RedirectResponse(url=f"/course/{existing.id}", status_code=303)
 
-    # 3. Create
-    new_course = Course(title=info['title'], description=f"Imported from YouTube: {info['title']}", playlist_id=info['id'])
-    db.add(new_course)
-    db.commit()
-    db.refresh(new_course)
-
-    # 4. Videos
-    for idx, v in enumerate(info.get('videos', [])):
-        y_id = v['youtube_id']
-        if '&' in y_id: y_id = y_id.split('&')[0]
-        if '?' in y_id: y_id = y_id.split('?')[0]
-
-        new_vid = Video(course_id=new_course.id, youtube_id=y_id, title=v['title'], order=idx, duration=v['duration'])
-        db.add(new_vid)
-    db.commit()
-
-    return RedirectResponse(url=f"/", status_code=303)
+    job_id, _ = jobs.enqueue("ingest_playlist", {"playlist_url": playlist_url},
+                             dedupe_key=f"ingest_playlist:{playlist_id or playlist_url}")
+    return RedirectResponse(url=f"/admin?status=ingest_started&job={job_id}", status_code=303)
 
 def _import_single_folder(folder_path: str, db: Session) -> Optional[Course]:
     """Import a single local folder as a course. Returns the Course or None."""
@@ -174,12 +181,13 @@ def _import_single_folder(folder_path: str, db: Session) -> Optional[Course]:
         )
         db.add(new_vid)
     db.commit()
+    page_cache.bump()
 
     print(f"[LOCAL IMPORT] Imported {len(info['videos'])} videos from {folder_path}", flush=True)
     return new_course
 
 @router.post("/ingest_local")
-def ingest_local_course(folder_path: str = Form(...), db: Session = Depends(get_db)):
+def ingest_local_course(folder_path: str = Form(...), db: Session = Depends(get_db), _admin=Depends(require_admin)):
     """Import a course from a single local folder."""
     folder_path = folder_path.strip()
     if not os.path.isdir(folder_path):
@@ -192,7 +200,7 @@ def ingest_local_course(folder_path: str = Form(...), db: Session = Depends(get_
     return RedirectResponse(url=f"/", status_code=303)
 
 @router.post("/ingest_local_batch")
-def ingest_local_batch(folder_path: str = Form(...), db: Session = Depends(get_db)):
+def ingest_local_batch(folder_path: str = Form(...), db: Session = Depends(get_db), _admin=Depends(require_admin)):
     """Import all subfolders of a root directory as separate courses."""
     folder_path = folder_path.strip()
     if not os.path.isdir(folder_path):
@@ -223,10 +231,8 @@ def ingest_local_batch(folder_path: str = Form(...), db: Session = Depends(get_d
     return RedirectResponse(url=f"/admin?status=batch_done&imported={imported}&skipped={skipped}", status_code=303)
 
 @router.get("/stream/{video_id}")
-def stream_video(video_id: int, request: Request, db: Session = Depends(get_db)):
+def stream_video(video_id: int, request: Request, db: Session = Depends(get_db), user_id: str = Depends(current_user)):
     """Serve a local video file with range request support for seeking."""
-    from starlette.responses import StreamingResponse
-
     video = db.query(Video).filter(Video.id == video_id).first()
     if not video or not video.local_filename:
         raise HTTPException(status_code=404, detail="Video not found")
@@ -275,7 +281,8 @@ def stream_video(video_id: int, request: Request, db: Session = Depends(get_db))
     return FileResponse(file_path, media_type=media_type)
 
 @router.post("/api/download_video/{video_id}")
-def download_video_endpoint(video_id: int, db: Session = Depends(get_db)):
+def download_video_endpoint(video_id: int, db: Session = Depends(get_db), _admin=Depends(require_admin)):
+    """Queues the video's download; follow it at /api/admin/jobs/{job_id}."""
     video = db.query(Video).filter(Video.id == video_id).first()
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
@@ -283,112 +290,108 @@ def download_video_endpoint(video_id: int, db: Session = Depends(get_db)):
     if video.local_filename:
         return {"status": "already_downloaded", "filename": video.local_filename}
 
-    course = video.course
-    filename = download_video(
-        video.youtube_id,
-        course_title=course.title if course else "",
-        video_title=video.title,
-        video_order=video.order,
-    )
-    if not filename:
-        raise HTTPException(status_code=500, detail="Failed to download video")
-
-    video.local_filename = filename
-    db.commit()
-    return {"status": "ok", "filename": filename}
+    job_id, created = jobs.enqueue("download_video", {"video_id": video.id}, dedupe_key=f"download_video:{video.id}")
+    return {"status": "queued" if created else "already_queued", "job_id": job_id}
 
 @router.post("/api/download_course/{course_id}")
-def download_course_start(course_id: int, db: Session = Depends(get_db)):
-    """Kick off a background download job for all videos in a course."""
+def download_course_start(course_id: int, db: Session = Depends(get_db), _admin=Depends(require_admin)):
+    """Queues a download job for every video in a course that isn't local yet."""
     course = db.query(Course).filter(Course.id == course_id).first()
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    # Don't start a second job if one is already running
-    existing = _download_jobs.get(course_id)
+    # Don't start a second batch while one is still going
+    existing = _download_summary(course)
     if existing and existing["status"] == "running":
         return {"status": "already_running", "job": existing}
 
-    to_download = []
-    already = 0
-    course_title = course.title
-    for video in sorted(course.videos, key=lambda v: v.order):
-        if video.local_filename:
-            already += 1
-        else:
-            to_download.append({
-                "video_id": video.id,
-                "youtube_id": video.youtube_id,
-                "video_title": video.title,
-                "video_order": video.order,
-            })
-
+    to_download = [v for v in sorted(course.videos, key=lambda v: v.order) if not v.local_filename]
     if not to_download:
-        return {"status": "all_downloaded", "total": already}
-
-    job = {
-        "status": "running",
-        "total": len(to_download) + already,
+        return {"status": "all_downloaded", "total": len(course.videos)}
+
+    batch = f"download_course:{course_id}:{datetime.utcnow():%Y%m%d%H%M%S%f}"
+    for video in to_download:
+        jobs.enqueue("download_video", {"video_id": video.id}, dedupe_key=f"download_video:{video.id}", batch=batch)
+    print(f"[QUEUE] Queued {len(to_download)} downloads for course {course_id}", flush=True)
+    return {"status": "started", "job": _download_summary(course)}
+
+def _download_summary(course: Course) -> Optional[dict]:
+    """Progress of the latest download batch of a course, in the shape the admin page polls."""
+    batch = jobs.latest_batch(f"download_course:{course.id}:")
+    if not batch:
+        return None
+    batch_jobs = jobs.list_jobs(batch=batch, limit=10000)
+    batch_videos = {j["payload"].get("video_id") for j in batch_jobs}
+    video_titles = {v.id: v.title for v in course.videos}
+    already = sum(1 for v in course.videos if v.local_filename and v.id not in batch_videos)
+    running = [j for j in batch_jobs if j["status"] in jobs.ACTIVE_STATUSES]
+    return {
+        "status": "running" if running else "done",
+        "batch": batch,
+        "total": len(batch_jobs) + already,
         "already": already,
-        "completed": 0,
-        "failed": 0,
-        "results": [],
-        "current": [],
+        "completed": sum(1 for j in batch_jobs if j["status"] == "done"),
+        "failed": sum(1 for j in batch_jobs if j["status"] == "failed"),
+        "results": [
+            {"video_id": j["payload"].get("video_id"), "job_id": j["id"],
+             "status": {"done": "ok"}.get(j["status"], j["status"]), "error": j["error"]}
+            for j in reversed(batch_jobs) if j["status"] in ("done", "failed")
+        ],
+        "current": [video_titles.get(j["payload"].get("video_id"), "") for j in running if j["status"] == "running"],
+        # Live yt-dlp stats of the downloads in progress
+        "active": [
+            {"video_id": j["payload"].get("video_id"), "title": video_titles.get(j["payload"].get("video_id"), ""),
+             "progress": j["progress"], **(j["detail"] or {})}
+            for j in running if j["status"] == "running"
+        ],
     }
-    _download_jobs[course_id] = job
-
-    def _run_downloads():
-        total = len(to_download)
-        for idx, item in enumerate(to_download):
-            vid_id = item["video_id"]
-            yt_id = item["youtube_id"]
-            job["current"] = [yt_id]
-            print(f"[QUEUE] ({idx + 1}/{total}) Starting: {item['video_title']}", flush=True)
-            try:
-                filename = download_video(
-                    yt_id,
-                    course_title=course_title,
-                    video_title=item["video_title"],
-                    video_order=item["video_order"],
-                )
-                if filename:
-                    s = SessionLocal()
-                    try:
-                        v = s.query(Video).filter(Video.id == vid_id).first()
-                        if v:
-                            v.local_filename = filename
-                            s.commit()
-                    finally:
-                        s.close()
-                    job["completed"] += 1
-                    job["results"].append({"video_id": vid_id, "status": "ok"})
-                    print(f"[QUEUE] ({idx + 1}/{total}) Done: {item['video_title']}", flush=True)
-                else:
-                    job["failed"] += 1
-                    job["results"].append({"video_id": vid_id, "status": "failed"})
-                    print(f"[QUEUE] ({idx + 1}/{total}) Failed: {item['video_title']}", flush=True)
-            except Exception as e:
-                job["failed"] += 1
-                job["results"].append({"video_id": vid_id, "status": "failed", "error": str(e)})
-                print(f"[QUEUE] ({idx + 1}/{total}) Error: {item['video_title']}: {e}", flush=True)
-        job["current"] = []
-        job["status"] = "done"
-        print(f"[QUEUE] All done. {job['completed']} ok, {job['failed']} failed.", flush=True)
-
-    thread = threading.Thread(target=_run_downloads, daemon=True)
-    thread.start()
-    return {"status": "started", "job": job}
 
 @router.get("/api/download_course/{course_id}/status")
-def download_course_status(course_id: int):
+def download_course_status(course_id: int, db: Session = Depends(get_db), _admin=Depends(require_admin)):
     """Poll download progress for a course."""
-    job = _download_jobs.get(course_id)
+    course = db.query(Course).filter(Course.id == course_id).first()
+    job = _download_summary(course) if course else None
     if not job:
         return {"status": "no_job"}
     return {"status": job["status"], "job": job}
 
+def _download_summary_for(course_id: int) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        course = db.get(Course, course_id)
+        return _download_summary(course) if course else None
+    finally:
+        db.close()
+
+@router.get("/api/events/download_course/{course_id}")
+async def download_course_events(course_id: int, request: Request, _admin=Depends(require_admin)):
+    """
+    Server-sent events for a course download: a `progress` event whenever the
+    summary changes, then one `done` event when the batch has finished.
+    """
+    async def stream():
+        last, quiet = None, 0.0
+        while not await request.is_disconnected():
+            job = await run_in_threadpool(_download_summary_for, course_id)
+            if not job or job["status"] == "done":
+                yield f"event: done\ndata: {json.dumps({'status': job['status'] if job else 'no_job', 'job': job})}\n\n"
+                return
+            data = json.dumps({"status": job["status"], "job": job})
+            if data != last:
+                yield f"event: progress\ndata: {data}\n\n"
+                last, quiet = data, 0.0
+            elif quiet >= DOWNLOAD_EVENTS_KEEPALIVE_SECONDS:
+                # Comment line, so proxies don't drop an idle connection
+                yield ": keepalive\n\n"
+                quiet = 0.0
+            await asyncio.sleep(DOWNLOAD_EVENTS_INTERVAL_SECONDS)
+            quiet += DOWNLOAD_EVENTS_INTERVAL_SECONDS
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.get("/admin", response_class=HTMLResponse)
-def admin_page(request: Request, db: Session = Depends(get_db)):
+def admin_page(request: Request, db: Session = Depends(get_db), user_id: str = Depends(require_admin)):
     courses = db.query(Course).all()
     status_code = request.query_params.get("status")
     status_messages = {
@@ -404,22 +407,33 @@ def admin_page(request: Request, db: Session = Depends(get_db)):
         imp = request.query_params.get("imported", "0")
         skp = request.query_params.get("skipped", "0")
         status_messages["batch_done"] = f"Batch import complete: {imp} courses imported, {skp} already existed."
+    if status_code == "ingest_started":
+        job_id = request.query_params.get("job", "")
+        status_messages["ingest_started"] = (
+            f"Importing the playlist in the background (job #{job_id}). Videos appear as they are read."
+        )
     return templates.TemplateResponse("admin.html", {
         "request": request,
         "courses": courses,
-        "status_message": status_messages.get(status_code)
+        "status_message": status_messages.get(status_code),
+        "profiles": profiler.list_profiles()[:20],
+        "jobs": jobs.list_jobs(limit=20),
+        "current_user": user_id,
     })
 
 @router.post("/admin/toggle_course/{course_id}")
-def toggle_course_visibility(course_id: int, hide: bool = Form(...), db: Session = Depends(get_db)):
+def toggle_course_visibility(course_id: int, hide: bool = Form(...), db: Session = Depends(get_db),
+                             _admin=Depends(require_admin)):
     course = db.query(Course).filter(Course.id == course_id).first()
     if course:
         course.is_hidden = hide
         db.commit()
+        page_cache.bump(course_id)
     return RedirectResponse(url="/admin", status_code=303)
 
 @router.post("/admin/unlock_next_video/{course_id}")
-def unlock_next_video(course_id: int, db: Session = Depends(get_db)):
+def unlock_next_video(course_id: int, db: Session = Depends(get_db), user_id: str = Depends(require_admin)):
+    """Marks the signed-in learner's first incomplete video in the course as completed."""
     course = db.query(Course).filter(Course.id == course_id).first()
     if not course:
         return RedirectResponse(url="/admin?status=course_not_found", status_code=303)
@@ -431,7 +445,7 @@ def unlock_next_video(course_id: int, db: Session = Depends(get_db)):
     video_ids = [video.id for video in sorted_videos]
     progress_rows = db.query(VideoProgress).filter(
         VideoProgress.video_id.in_(video_ids),
-        VideoProgress.user_id == "user"
+        VideoProgress.user_id == user_id
     ).all()
     progress_by_video = {row.video_id: row for row in progress_rows}
 
@@ -445,25 +459,33 @@ def unlock_next_video(course_id: int, db: Session = Depends(get_db)):
     if not first_incomplete_video:
         return RedirectResponse(url="/admin?status=all_videos_completed", status_code=303)
 
-    progress = progress_by_video.get(first_incomplete_video.id)
-    if not progress:
-        progress = VideoProgress(video_id=first_incomplete_video.id, user_id="user")
-        db.add(progress)
-
+    progress = progress_by_video.get(first_incomplete_video.id) or _user_progress(db, user_id, first_incomplete_video.id)
     progress.completed = True
     progress.updated_at = datetime.utcnow()
     db.commit()
+    page_cache.bump(user_id=user_id)
 
     return RedirectResponse(url="/admin?status=next_video_unlocked", status_code=303)
 
 @router.get("/course/{course_id}", response_class=HTMLResponse)
-def player(request: Request, course_id: int, video_id: Optional[int] = None, db: Session = Depends(get_db)):
+def player(request: Request, course_id: int, video_id: Optional[int] = None, db: Session = Depends(get_db),
+           user_id: str = Depends(current_user)):
+    variant = f"v{video_id}" if video_id else ""
+    return page_cache.cached_page(
+        request, f"course:{user_id}:{course_id}:{variant}", page_cache.course_etag(course_id, user_id, variant),
+        lambda: _render_player(request, course_id, video_id, user_id, db),
+    )
+
+def _render_player(request: Request, course_id: int, video_id: Optional[int], user_id: str, db: Session):
     course = db.query(Course).filter(Course.id == course_id).first()
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
 
     sorted_videos = sorted(course.videos, key=lambda x: x.order)
-    progress_rows = db.query(VideoProgress).filter(VideoProgress.video_id.in_([v.id for v in sorted_videos])).all() if sorted_videos else []
+    progress_rows = db.query(VideoProgress).filter(
+        VideoProgress.user_id == user_id,
+        VideoProgress.video_id.in_([v.id for v in sorted_videos]),
+    ).all() if sorted_videos else []
     progress_by_video_id = {p.video_id: p for p in progress_rows}
 
     def is_unlocked(video: Video) -> bool:
@@ -533,72 +555,54 @@ def player(request: Request, course_id: int, video_id: Optional[int] = None, db:
             "progress_percent": progress_percent,
             "playlist_id": course.playlist_id
         },
-        "video": video_data
+        "video": video_data,
+        "current_user": user_id,
     })
 
 @router.post("/api/progress")
-def update_progress(data: ProgressUpdate, db: Session = Depends(get_db)):
-    prog = db.query(VideoProgress).filter(VideoProgress.video_id == data.video_id).first()
-    if not prog:
-        prog = VideoProgress(video_id=data.video_id, user_id="user")
-        db.add(prog)
-    
+def update_progress(data: ProgressUpdate, db: Session = Depends(get_db), user_id: str = Depends(current_user)):
+    prog = _user_progress(db, user_id, data.video_id)
     prog.last_watched_timestamp = data.timestamp
-    if data.completed:
+    # Heartbeats only move the resume position, which the player reads from
+    # GET /api/progress; cached pages are invalidated when completion changes
+    newly_completed = data.completed and not prog.completed
+    if newly_completed:
         prog.completed = True
     
     prog.updated_at = datetime.utcnow()
     db.commit()
+    if newly_completed:
+        page_cache.bump(user_id=user_id)
     return {"status": "ok"}
 
+@router.get("/api/progress/{video_id}")
+def get_progress(video_id: int, db: Session = Depends(get_db), user_id: str = Depends(current_user)):
+    prog = db.query(VideoProgress).filter(
+        VideoProgress.user_id == user_id, VideoProgress.video_id == video_id
+    ).first()
+    return {
+        "video_id": video_id,
+        "timestamp": prog.last_watched_timestamp if prog else 0,
+        "completed": bool(prog and prog.completed),
+    }
+
 @router.get("/api/videos/{video_id}/quiz")
-def get_quiz(video_id: int, db: Session = Depends(get_db)):
+def get_quiz(video_id: int, db: Session = Depends(get_db), user_id: str = Depends(current_user)):
     video = db.query(Video).filter(Video.id == video_id).first()
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
-    
+
     if not video.questions:
-        # Check if we have transcripts in DB
-        transcripts_db = db.query(Transcript).filter(Transcript.video_id == video.id).all()
-        
-        if not transcripts_db:
-            # Fetch from YouTube
-            transcript_list = get_video_transcript(video.youtube_id)
-            if transcript_list:
-                # Save to DB
-                for t in transcript_list:
-                    new_t = Transcript(
-                        video_id=video.id,
-                        text=t['text'],
-                        start_time=t['start'],
-                        duration=t['duration']
-                    )
-                    db.add(new_t)
-                db.commit()
-                # Re-fetch from DB to be clean
-                transcripts_db = db.query(Transcript).filter(Transcript.video_id == video.id).all()
-        
-        # Prepare text for AI
-        if transcripts_db:
-             full_text = " ".join([t.text for t in transcripts_db])
-        else:
-             full_text = f"Title: {video.title}. Use this title as context."
+        # Transcript fetch and question generation run as a job; the player polls until it's done
+        job_id, _ = jobs.enqueue("generate_quiz", {"video_id": video.id},
+                                 dedupe_key=f"generate_quiz:{video.id}", priority=10)
+        return JSONResponse(status_code=202, content={
+            "video_id": video.id, "status": "generating", "job_id": job_id, "questions": [],
+        })
 
-        generated = generate_questions(full_text)
-        
-        for q in generated:
-            new_q = Question(
-                video_id=video.id,
-                text=q['question'],
-                kind='text',
-                correct_answer_summary=q.get('context', '') 
-            )
-            db.add(new_q)
-        db.commit()
-        db.refresh(video)
-        
     return {
         "video_id": video.id,
+        "status": "ready",
         "questions": [
             {
                 "id": q.id,
@@ -609,18 +613,25 @@ def get_quiz(video_id: int, db: Session = Depends(get_db)):
     }
 
 @router.post("/api/submit_exam")
-async def submit_exam(
+def submit_exam(
     video_id: int = Form(...),
     answer_text: Optional[str] = Form(None),
     audio_file: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    user_id: str = Depends(current_user),
 ):
+    # A plain def, so transcription and grading (ffmpeg, Groq calls with retries)
+    # run on the thread pool rather than stalling the event loop for everyone
     # 1. Logic to get text
     final_text = ""
     if audio_file:
-        content = await audio_file.read()
-        from ..services.ai_tutor import transcribe_audio
-        final_text = transcribe_audio(content)
+        content = audio_file.file.read()
+        from ..services.ai_tutor import transcribe_audio, TranscriptionError
+        try:
+            final_text = transcribe_audio(content)
+        except TranscriptionError:
+            # Grading a partial or empty transcript would fail an answer the learner did give
+            raise HTTPException(status_code=502, detail="Could not transcribe your recording. Please submit it again.")
     else:
         final_text = answer_text or ""
 
@@ -650,23 +661,7 @@ async def submit_exam(
             if q_id > 0:
                 score_by_qid[q_id] = _to_float(value, default=0.0)
 
-    per_answer_scores = []
-
-    # 5. Save Answers (Individual)
-    # We save individual records for history tracking, even if graded in batch
-    for q_id in answered_question_ids:
-        score = score_by_qid.get(q_id, 0)
-        per_answer_scores.append(score)
-        is_pass = score >= 70
-
-        new_answer = Answer(
-            question_id=q_id,
-            user_answer=final_text, # We save full transcript for each
-            is_correct=is_pass,
-            rating=_to_int(score, default=0),
-            feedback=result.get('feedback', "")
-        )
-        db.add(new_answer)
+    per_answer_scores = [score_by_qid.get(q_id, 0) for q_id in answered_question_ids]
 
     # Require at least 2 answered questions and both to clear 70+.
     passing_answers = sum(1 for score in per_answer_scores if score >= 70)
@@ -676,17 +671,35 @@ async def submit_exam(
         default=(sum(per_answer_scores) / len(per_answer_scores)) if per_answer_scores else 0.0
     )
 
+    # 5. Save the attempt once, with a lightweight score row per answered question
+    attempt = ExamAttempt(
+        video_id=video_id,
+        user_id=user_id,
+        submission_text=final_text,
+        source="audio" if audio_file else "text",
+        overall_score=overall_score,
+        passed=passed_exam,
+        feedback=result.get('feedback', "")
+    )
+    db.add(attempt)
+    for q_id, score in zip(answered_question_ids, per_answer_scores):
+        db.add(Answer(
+            question_id=q_id,
+            attempt=attempt,
+            is_correct=score >= 70,
+            rating=_to_int(score, default=0)
+        ))
+
     # 6. Update Course Progress if Passed
     if passed_exam:
-        prog = db.query(VideoProgress).filter(VideoProgress.video_id == video_id).first()
-        if not prog:
-            prog = VideoProgress(video_id=video_id, user_id="user")
-            db.add(prog)
+        prog = _user_progress(db, user_id, video_id)
         prog.completed = True
         prog.score = _to_int(overall_score, default=0)
         prog.updated_at = datetime.utcnow()
     
     db.commit()
+    if passed_exam:
+        page_cache.bump(user_id=user_id)
 
     # 7. Find Next Video ID
     next_video_id = None
@@ -1,31 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from anyio import from_thread
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from ..database import get_db
-from ..services.sync_service import SyncService
+from ..services.sync_service import get_sync_service
+from ..services import sync_scheduler, peer_sync, profiler
+from ..services.auth import require_admin
 from typing import Optional
 import os
+import requests
 
-router = APIRouter(prefix="/api/sync", tags=["sync"])
+router = APIRouter(prefix="/api/sync", tags=["sync"], route_class=profiler.ProfiledRoute)
 
-@router.get("/status")
+@router.get("/status", dependencies=[Depends(require_admin)])
 def get_sync_status():
-    service = SyncService()
+    # Answers from cached state and health only; never touches the remote
+    service = get_sync_service()
     state = service._get_state()
     can_sync = service.can_sync()
     
     return {
         "last_sync": state.get("last_sync"),
         "remote_configured": bool(service.remote_url),
+        "remote_reachable": service.health["reachable"],
+        "health_checked_at": service.health["checked_at"],
         "can_sync": can_sync['allowed'],
-        "message": can_sync['reason']
+        "message": can_sync['reason'],
+        "current_job_id": sync_scheduler.current_job_id(),
     }
 
-@router.post("/trigger")
-def trigger_sync(force: bool = Query(False), reset: bool = Query(False)):
-    service = SyncService()
-    result = service.run_sync(force=force, reset=reset)
-    
-    if result["status"] == "error":
-        raise HTTPException(status_code=500, detail=result["message"])
-    
-    return result
+@router.post("/trigger", status_code=202, dependencies=[Depends(require_admin)])
+def trigger_sync(
+    force: bool = Query(False),
+    reset: bool = Query(False),
+    mode: str = Query("sync", pattern="^(sync|verify|repair)$"),
+):
+    """
+    Starts a background job and returns its ID; poll /api/sync/jobs/{job_id}.
+    mode=sync pushes local changes; mode=verify compares range checksums and
+    reports differing id ranges; mode=repair also re-sends those ranges.
+    """
+    return sync_scheduler.start_sync_job(mode=mode, force=force, reset=reset)
+
+@router.get("/jobs/{job_id}", dependencies=[Depends(require_admin)])
+def get_sync_job(job_id: int):
+    """Job status with per-table progress, rows per second and ETA."""
+    job = sync_scheduler.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return job
+
+@router.post("/restore", status_code=202, dependencies=[Depends(require_admin)])
+def restore_from_remote(confirm: bool = Query(False)):
+    """
+    Rebuilds learning.db from the remote mirror as a background job.
+    The current file is kept as learning.db.pre-restore-<timestamp>.
+    """
+    if not confirm:
+        raise HTTPException(status_code=400, detail="Restore replaces the local database; pass confirm=true.")
+    return sync_scheduler.start_sync_job(mode="restore")
+
+@router.get("/peer/info", dependencies=[Depends(peer_sync.require_peer)])
+def peer_info():
+    return {"node": peer_sync.NODE_NAME}
+
+@router.get("/peer/export", dependencies=[Depends(peer_sync.require_peer)])
+def peer_export(since: Optional[int] = Query(None), peer: Optional[str] = Query(None)):
+    """
+    Streams rows changed after changelog id `since` as gzip-compressed NDJSON.
+    Without `since` (or when it predates the pruned changelog) every row is sent.
+    """
+    header, body = peer_sync.build_export(since, peer)
+    return StreamingResponse(
+        body,
+        media_type="application/x-ndjson",
+        headers={"Content-Encoding": "gzip", "X-Sync-High-Water": str(header["high_water"])},
+    )
+
+@router.post("/peer/import", dependencies=[Depends(peer_sync.require_peer)])
+async def peer_import(request: Request, peer: Optional[str] = Query(None)):
+    """
+    Applies an export stream pushed by another instance as it arrives: the
+    import thread pulls the body chunk by chunk, so neither the body nor
+    the whole transfer's write lock is ever held at once.
+    """
+    body = request.stream().__aiter__()
+
+    def _chunks():
+        while True:
+            try:
+                yield from_thread.run(body.__anext__)
+            except StopAsyncIteration:
+                return
+
+    return await run_in_threadpool(peer_sync.import_changes, _chunks(), peer)
+
+@router.post("/peer/sync", dependencies=[Depends(require_admin)])
+def peer_sync_now():
+    """Pulls the changes of the peer at SYNC_PEER_URL, then pushes ours to it."""
+    if not (peer_sync.PEER_URL and peer_sync.PEER_SECRET):
+        raise HTTPException(status_code=400, detail="Set SYNC_PEER_URL and SYNC_PEER_SECRET to sync with a peer.")
+    peer_url = peer_sync.PEER_URL
+    try:
+        pulled = peer_sync.pull_from_peer(peer_url)
+        pushed = peer_sync.push_to_peer(peer_url) if pulled["status"] == "success" else None
+    except requests.RequestException as e:
+        raise HTTPException(status_code=502, detail=f"Peer unreachable: {e}")
+    return {"pulled": pulled, "pushed": pushed}
@@ -1,9 +1,14 @@
 import os
+import re
 import json
+import time
 import tempfile
-from typing import List, Dict, Optional, Union
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple, Union
 from groq import Groq
 from dotenv import load_dotenv
+from . import metrics, llm_ledger
 
 load_dotenv()
 
@@ -13,30 +18,197 @@ client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
 MODEL_TEXT = "openai/gpt-oss-20b"
 MODEL_AUDIO = "whisper-large-v3-turbo"
 
-def transcribe_audio(audio_bytes: bytes) -> str:
+# Long oral answers are split at silences and transcribed concurrently.
+# Recordings shorter than LONG_AUDIO_SECONDS still go out as a single request.
+LONG_AUDIO_SECONDS = int(os.environ.get("TRANSCRIBE_LONG_AUDIO_SECONDS", "90"))
+CHUNK_TARGET_SECONDS = int(os.environ.get("TRANSCRIBE_CHUNK_SECONDS", "45"))
+CHUNK_MAX_SECONDS = int(os.environ.get("TRANSCRIBE_CHUNK_MAX_SECONDS", "75"))
+CHUNK_RETRIES = int(os.environ.get("TRANSCRIBE_CHUNK_RETRIES", "2"))
+TRANSCRIBE_CONCURRENCY = int(os.environ.get("TRANSCRIBE_CONCURRENCY", "4"))
+
+_SILENCE_RE = re.compile(r"silence_(start|end):\s*(-?[\d.]+)")
+
+
+class TranscriptionError(Exception):
+    """Raised when an answer recording could not be transcribed in full."""
+
+
+def _call_groq(function: str, kind: str, model: str, request, prompt_chars: Optional[int] = None,
+               audio_seconds: Optional[float] = None, retries: int = 0):
     """
-    Transcribes audio bytes using Groq Whisper model.
+    Runs one Groq request and records its latency and usage in /metrics and
+    the LLM ledger, whether it succeeds or raises.
     """
+    start = time.perf_counter()
+    response = None
+    error = None
     try:
-        # Groq API expects a file-like object or path. 
-        # We'll use a temp file to be safe with the SDK.
-        with tempfile.NamedTemporaryFile(suffix=".m4a", delete=False) as tmp_file:
-            tmp_file.write(audio_bytes)
-            tmp_path = tmp_file.name
-
-        with open(tmp_path, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(tmp_path, file.read()),
+        response = request()
+        return response
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        outcome = type(error).__name__ if error else "ok"
+        metrics.observe("llm_request_duration_seconds", elapsed, function=function, kind=kind,
+                        outcome="ok" if error is None else "error")
+        llm_ledger.record(
+            function=function, kind=kind, model=model, latency=elapsed, outcome=outcome,
+            usage=getattr(response, "usage", None), prompt_chars=prompt_chars,
+            audio_seconds=audio_seconds, retries=retries, error=str(error) if error else None,
+        )
+
+
+def _chat(function: str, messages: List[Dict], **kwargs):
+    """chat.completions.create() on MODEL_TEXT, recorded under `function`."""
+    return _call_groq(
+        function, "chat", MODEL_TEXT,
+        lambda: client.chat.completions.create(model=MODEL_TEXT, messages=messages, **kwargs),
+        prompt_chars=sum(len(m["content"]) for m in messages),
+    )
+
+
+def _transcribe_file(path: str, audio_seconds: Optional[float] = None, retries: int = 0) -> str:
+    """Sends a single audio file to Groq Whisper and returns the text."""
+    with open(path, "rb") as file:
+        transcription = _call_groq(
+            "transcribe_audio", "transcription", MODEL_AUDIO,
+            lambda: client.audio.transcriptions.create(
+                file=(path, file.read()),
                 model=MODEL_AUDIO,
                 temperature=0,
                 response_format="json", # simpler than verbose_json for just text
-            )
-        
-        os.unlink(tmp_path)
-        return transcription.text
+            ),
+            audio_seconds=audio_seconds, retries=retries,
+        )
+    return transcription.text
+
+
+def _probe_duration(path: str) -> float:
+    """Audio duration in seconds via ffprobe, or 0.0 if it can't be read."""
+    try:
+        result = metrics.run_subprocess(
+            ['ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            capture_output=True, text=True, timeout=15
+        )
+        return float(result.stdout.strip())
+    except Exception:
+        return 0.0
+
+
+def _detect_silences(path: str) -> List[float]:
+    """
+    Runs ffmpeg silencedetect and returns the midpoint of every silent stretch.
+    These are the candidate cut points; cutting there never splits a word.
+    """
+    result = metrics.run_subprocess(
+        ['ffmpeg', '-hide_banner', '-nostats', '-i', path,
+         '-af', 'silencedetect=noise=-30dB:d=0.4', '-f', 'null', '-'],
+        capture_output=True, text=True, timeout=120
+    )
+    midpoints = []
+    start = None
+    for kind, value in _SILENCE_RE.findall(result.stderr):
+        if kind == "start":
+            start = max(float(value), 0.0)
+        elif start is not None:
+            midpoints.append((start + float(value)) / 2)
+            start = None
+    return midpoints
+
+
+def _plan_chunks(duration: float, silences: List[float]) -> List[Tuple[float, float]]:
+    """
+    Greedily picks cut points so chunks land near CHUNK_TARGET_SECONDS.
+    Prefers the silence closest to the target; falls back to a hard cut at
+    CHUNK_MAX_SECONDS when someone talks without pausing.
+    """
+    chunks = []
+    start = 0.0
+    while duration - start > CHUNK_MAX_SECONDS:
+        window = [s for s in silences if start + CHUNK_TARGET_SECONDS / 2 <= s <= start + CHUNK_MAX_SECONDS]
+        if window:
+            cut = min(window, key=lambda s: abs(s - (start + CHUNK_TARGET_SECONDS)))
+        else:
+            cut = start + CHUNK_MAX_SECONDS
+        chunks.append((start, cut))
+        start = cut
+    chunks.append((start, duration))
+    return chunks
+
+
+def _extract_chunk(src: str, start: float, end: float, dest: str):
+    """Cuts [start, end) out of src as 16 kHz mono FLAC, which Whisper handles natively."""
+    metrics.run_subprocess(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-ss', f"{start:.3f}", '-t', f"{end - start:.3f}",
+         '-i', src, '-ac', '1', '-ar', '16000', '-c:a', 'flac', '-y', dest],
+        capture_output=True, timeout=120, check=True
+    )
+
+
+def _transcribe_chunk(path: str, index: int, seconds: Optional[float] = None) -> str:
+    """
+    Transcribes one chunk, retrying transient failures with a short backoff.
+    Raises TranscriptionError once the retries are spent: a missing chunk
+    would leave a hole in the answer, which must not be graded.
+    """
+    for attempt in range(CHUNK_RETRIES + 1):
+        try:
+            return _transcribe_file(path, audio_seconds=seconds, retries=attempt)
+        except Exception as e:
+            print(f"Chunk {index} transcription failed (attempt {attempt + 1}): {e}", flush=True)
+            if attempt < CHUNK_RETRIES:
+                time.sleep(0.5 * (2 ** attempt))
+            else:
+                raise TranscriptionError(f"chunk {index} failed after {attempt + 1} attempts: {e}") from e
+
+
+def _transcribe_long(path: str, duration: float, work_dir: str) -> str:
+    chunks = _plan_chunks(duration, _detect_silences(path))
+    chunk_paths = []
+    for idx, (start, end) in enumerate(chunks):
+        chunk_path = os.path.join(work_dir, f"chunk_{idx:03d}.flac")
+        _extract_chunk(path, start, end, chunk_path)
+        chunk_paths.append(chunk_path)
+
+    with ThreadPoolExecutor(max_workers=max(1, TRANSCRIBE_CONCURRENCY)) as pool:
+        texts = list(pool.map(_transcribe_chunk, chunk_paths, range(len(chunk_paths)),
+                              [end - start for start, end in chunks]))
+
+    return " ".join(t.strip() for t in texts if t and t.strip())
+
+
+def transcribe_audio(audio_bytes: bytes) -> str:
+    """
+    Transcribes audio bytes using Groq Whisper model.
+    Long recordings are split at silences and the chunks are transcribed in
+    parallel, so latency tracks the longest chunk rather than the full answer.
+    If any chunk still fails after its retries, the whole file is sent as one
+    request instead. Raises TranscriptionError when no complete transcript
+    can be produced, so a partial or empty answer is never graded.
+    """
+    try:
+        # Groq API expects a file-like object or path. 
+        # We'll use a temp dir so chunk files are cleaned up with the upload.
+        with tempfile.TemporaryDirectory() as work_dir:
+            tmp_path = os.path.join(work_dir, "answer.m4a")
+            with open(tmp_path, "wb") as tmp_file:
+                tmp_file.write(audio_bytes)
+
+            duration = _probe_duration(tmp_path)
+            if duration > LONG_AUDIO_SECONDS:
+                try:
+                    return _transcribe_long(tmp_path, duration, work_dir)
+                except (OSError, subprocess.SubprocessError, TranscriptionError) as e:
+                    # ffmpeg missing or choked on the input, or a chunk kept failing: fall back to one request
+                    print(f"Chunked transcription unavailable, sending whole file: {e}", flush=True)
+
+            return _transcribe_file(tmp_path, audio_seconds=duration or None)
     except Exception as e:
-        print(f"Error transcribing audio: {e}")
-        return ""
+        print(f"Error transcribing audio: {e}", flush=True)
+        raise TranscriptionError(str(e)) from e
 
 def generate_questions(transcript_text: str, num_questions: int = 3) -> List[Dict]:
     """
@@ -55,9 +227,9 @@ def generate_questions(transcript_text: str, num_questions: int = 3) -> List[Dic
     """
 
     try:
-        completion = client.chat.completions.create(
-            model=MODEL_TEXT,
-            messages=[
+        completion = _chat(
+            "generate_questions",
+            [
                 {"role": "system", "content": "You are a helpful AI assistant. Output strictly valid JSON."},
                 {"role": "user", "content": prompt}
             ],
@@ -112,9 +284,9 @@ def evaluate_answer(question_text: str, user_answer_text: str, history: Optional
     """
     
     try:
-        completion = client.chat.completions.create(
-            model=MODEL_TEXT,
-            messages=[
+        completion = _chat(
+            "evaluate_answer",
+            [
                 {"role": "system", "content": "You are a strict tutor. Output JSON only."},
                 {"role": "user", "content": prompt}
             ],
@@ -169,9 +341,9 @@ def evaluate_exam(questions: List[Dict], user_input: str) -> Dict:
     """
     
     try:
-        completion = client.chat.completions.create(
-            model=MODEL_TEXT,
-            messages=[
+        completion = _chat(
+            "evaluate_exam",
+            [
                 {"role": "system", "content": "You are an Exam Proctor AI. Output strict JSON."},
                 {"role": "user", "content": prompt}
             ],
@@ -0,0 +1,241 @@
+"""
+Aggregate and paginated read queries for the admin dashboard and admin API.
+
+Each function issues a fixed number of queries regardless of how many
+courses, videos or answers exist, and returns plain dicts so results can be cached
+(st.cache_data pickles return values) without holding on to a Session.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, or_, select, case, text
+from sqlalchemy.orm import Session
+
+from ..models import Answer, Course, ExamAttempt, Question, Video, VideoProgress
+
+
+def data_version(db: Session) -> int:
+    """
+    Monotonic counter bumped by every tracked write (the changelog's
+    AUTOINCREMENT sequence). Cheap to read; use it as a cache key so cached
+    aggregates refresh as soon as the data changes.
+    """
+    seq = db.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'sync_changelog'")).scalar()
+    return seq or 0
+
+
+def _video_progress_subquery(user_id: Optional[str] = None):
+    # One row per video; a video counts as completed if any (or the given) learner completed it
+    stmt = select(
+        VideoProgress.video_id.label("video_id"),
+        func.max(case((VideoProgress.completed == True, 1), else_=0)).label("completed"),
+        func.max(VideoProgress.last_watched_timestamp).label("last_watched"),
+    )
+    if user_id:
+        stmt = stmt.where(VideoProgress.user_id == user_id)
+    return stmt.group_by(VideoProgress.video_id).subquery()
+
+
+def learners(db: Session) -> List[str]:
+    """Every user_id with recorded progress."""
+    stmt = select(VideoProgress.user_id).distinct().order_by(VideoProgress.user_id)
+    return list(db.execute(stmt).scalars())
+
+
+def course_overview(db: Session, include_hidden: bool = False, user_id: Optional[str] = None) -> List[Dict]:
+    """Courses with video counts and completion percentage, in one grouped query."""
+    progress = _video_progress_subquery(user_id)
+    stmt = (
+        select(
+            Course.id,
+            Course.title,
+            Course.playlist_id,
+            func.count(Video.id).label("videos"),
+            func.coalesce(func.sum(progress.c.completed), 0).label("completed"),
+        )
+        .outerjoin(Video, Video.course_id == Course.id)
+        .outerjoin(progress, progress.c.video_id == Video.id)
+        .group_by(Course.id, Course.title, Course.playlist_id)
+        .order_by(Course.id)
+    )
+    if not include_hidden:
+        stmt = stmt.where(Course.is_hidden != True)
+
+    rows = []
+    for r in db.execute(stmt):
+        rows.append({
+            "id": r.id,
+            "title": r.title,
+            "playlist_id": r.playlist_id,
+            "videos": r.videos,
+            "completed": r.completed,
+            "progress": int(r.completed / r.videos * 100) if r.videos else 0,
+        })
+    return rows
+
+
+def course_video_status(db: Session, course_id: int, user_id: Optional[str] = None) -> List[Dict]:
+    """Videos of one course in order, with completion, lock state and last position."""
+    progress = _video_progress_subquery(user_id)
+    stmt = (
+        select(
+            Video.id,
+            Video.order,
+            Video.title,
+            Video.duration,
+            func.coalesce(progress.c.completed, 0).label("completed"),
+            func.coalesce(progress.c.last_watched, 0).label("last_watched"),
+        )
+        .outerjoin(progress, progress.c.video_id == Video.id)
+        .where(Video.course_id == course_id)
+        .order_by(Video.order)
+    )
+
+    rows = []
+    previous_completed = True
+    for r in db.execute(stmt):
+        completed = bool(r.completed)
+        rows.append({
+            "id": r.id,
+            "order": r.order,
+            "title": r.title,
+            "duration": r.duration,
+            "completed": completed,
+            # Same rule as the player: a video unlocks once the previous one is completed
+            "locked": not previous_completed,
+            "last_watched": r.last_watched,
+        })
+        previous_completed = completed
+    return rows
+
+
+def video_list(db: Session) -> List[Dict]:
+    """Flat listing of every video (column select, no ORM objects)."""
+    stmt = select(Video.id, Video.course_id, Video.title, Video.youtube_id).order_by(Video.id)
+    return [dict(r) for r in db.execute(stmt).mappings()]
+
+
+ANSWER_PREVIEW_CHARS = 200
+
+
+def _answer_text():
+    # Submission text lives on the attempt; unmigrated rows still carry their own copy
+    return func.coalesce(Answer.user_answer, ExamAttempt.submission_text)
+
+
+def _answer_feedback():
+    return func.coalesce(Answer.feedback, ExamAttempt.feedback)
+
+
+def _encode_cursor(created_at, answer_id: int) -> str:
+    return f"{created_at.isoformat() if created_at else ''}|{answer_id}"
+
+
+def _decode_cursor(cursor: str):
+    stamp, _, answer_id = cursor.partition("|")
+    return (datetime.fromisoformat(stamp) if stamp else None), int(answer_id)
+
+
+def answer_page(
+    db: Session,
+    course_id: Optional[int] = None,
+    video_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    passed: Optional[bool] = None,
+    min_rating: Optional[int] = None,
+    max_rating: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> Dict:
+    """
+    One page of answers, newest first, joined with their question and video.
+    Filters run in SQL and pagination is keyset-based on (created_at, id), so
+    every page costs the same no matter how deep; answers without a
+    created_at are paged last, by id. Answer text is truncated to
+    ANSWER_PREVIEW_CHARS; fetch the full record with answer_detail().
+    Returns {"items": [...], "next_cursor": str|None}.
+    """
+    answer_text = _answer_text()
+    feedback = _answer_feedback()
+    stmt = (
+        select(
+            Answer.id,
+            Answer.created_at,
+            Answer.question_id,
+            Answer.attempt_id,
+            Answer.rating,
+            Answer.is_correct,
+            func.substr(answer_text, 1, ANSWER_PREVIEW_CHARS).label("answer_preview"),
+            func.length(answer_text).label("answer_length"),
+            func.substr(feedback, 1, ANSWER_PREVIEW_CHARS).label("feedback_preview"),
+            Question.text.label("question"),
+            Video.id.label("video_id"),
+            Video.title.label("video_title"),
+            Video.course_id,
+        )
+        .join(Question, Question.id == Answer.question_id)
+        .join(Video, Video.id == Question.video_id)
+        .outerjoin(ExamAttempt, ExamAttempt.id == Answer.attempt_id)
+    )
+    if course_id is not None:
+        stmt = stmt.where(Video.course_id == course_id)
+    if video_id is not None:
+        stmt = stmt.where(Question.video_id == video_id)
+    if date_from is not None:
+        stmt = stmt.where(Answer.created_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Answer.created_at < date_to)
+    if passed is not None:
+        stmt = stmt.where(Answer.is_correct == passed)
+    if min_rating is not None:
+        stmt = stmt.where(Answer.rating >= min_rating)
+    if max_rating is not None:
+        stmt = stmt.where(Answer.rating <= max_rating)
+    if cursor:
+        # NULL sorts lowest, so undated answers come last, after every dated one
+        after_created, after_id = _decode_cursor(cursor)
+        if after_created is None:
+            stmt = stmt.where(Answer.created_at.is_(None), Answer.id < after_id)
+        else:
+            stmt = stmt.where(or_(
+                Answer.created_at < after_created,
+                Answer.created_at.is_(None),
+                and_(Answer.created_at == after_created, Answer.id < after_id),
+            ))
+
+    # Fetch one extra row to know whether another page exists
+    stmt = stmt.order_by(Answer.created_at.desc(), Answer.id.desc()).limit(limit + 1)
+    rows = [dict(r) for r in db.execute(stmt).mappings()]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    for r in rows:
+        r["truncated"] = (r["answer_length"] or 0) > ANSWER_PREVIEW_CHARS
+
+    next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_more else None
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+def answer_detail(db: Session, answer_id: int) -> Optional[Dict]:
+    """Full submission text and feedback for a single answer, plus its attempt's result."""
+    stmt = (
+        select(
+            Answer.id,
+            Answer.created_at,
+            Answer.rating,
+            Answer.is_correct,
+            Answer.attempt_id,
+            _answer_text().label("user_answer"),
+            _answer_feedback().label("feedback"),
+            ExamAttempt.source,
+            ExamAttempt.overall_score,
+            ExamAttempt.passed.label("attempt_passed"),
+            Question.text.label("question"),
+            Question.correct_answer_summary,
+        )
+        .join(Question, Question.id == Answer.question_id)
+        .outerjoin(ExamAttempt, ExamAttempt.id == Answer.attempt_id)
+        .where(Answer.id == answer_id)
+    )
+    row = db.execute(stmt).mappings().first()
+    return dict(row) if row else None
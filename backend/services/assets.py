@@ -0,0 +1,198 @@
+"""
+Build-free static asset pipeline.
+
+Files under backend/static are fingerprinted with a short content hash
+(`thumbs/course_1.jpg` -> `thumbs/course_1.3fa9c2d41b.jpg`). Templates link to
+the hashed URL through the `asset_url()` Jinja helper, and those URLs are served
+with a one-year immutable Cache-Control, so browsers never revalidate them; a
+changed file gets a new URL. Text assets get .gz (and .br when the `brotli`
+package is installed) variants generated once next to the original and
+served when the client accepts them.
+
+Files added after startup (e.g. generated thumbnails) are fingerprinted on
+first use.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.staticfiles import StaticFiles
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
+STATIC_URL = "/static/"
+
+# Generated course thumbnails, served under /static/thumbs
+THUMBS_DIR = os.path.join(STATIC_DIR, "thumbs")
+
+# Worth precompressing; images and video are already compressed
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".json", ".svg", ".html", ".txt", ".map", ".xml", ".ico"}
+PRECOMPRESSED_SUFFIXES = (".gz", ".br")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Downloaded videos don't change once written; let browsers reuse them for a day
+VIDEO_CACHE_CONTROL = "public, max-age=86400"
+
+_lock = threading.Lock()
+_manifest: Dict[str, Tuple[str, float]] = {}   # rel path -> (hashed rel path, mtime)
+_reverse: Dict[str, str] = {}                  # hashed rel path -> rel path
+
+
+def _hashed_name(rel_path: str, digest: str) -> str:
+    base, ext = os.path.splitext(rel_path)
+    return f"{base}.{digest}{ext}"
+
+
+def _precompress(full_path: str):
+    """Writes .gz/.br siblings for text assets unless they're already current."""
+    if os.path.splitext(full_path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return
+    mtime = os.path.getmtime(full_path)
+    data = None
+    variants = [(".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", lambda d: brotli.compress(d, quality=11)))
+    for suffix, compress in variants:
+        target = full_path + suffix
+        if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+            continue
+        if data is None:
+            with open(full_path, "rb") as f:
+                data = f.read()
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(compress(data))
+        os.replace(tmp, target)
+
+
+def _fingerprint(rel_path: str) -> Optional[str]:
+    """Hashed rel path for a file under STATIC_DIR, recomputed only when its mtime changes."""
+    full_path = os.path.join(STATIC_DIR, rel_path)
+    try:
+        mtime = os.path.getmtime(full_path)
+    except OSError:
+        return None
+
+    cached = _manifest.get(rel_path)
+    if cached and cached[1] == mtime:
+        return cached[0]
+
+    h = hashlib.sha256()
+    with open(full_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    hashed = _hashed_name(rel_path, h.hexdigest()[:10])
+    _precompress(full_path)
+
+    with _lock:
+        if cached:
+            _reverse.pop(cached[0], None)
+        _manifest[rel_path] = (hashed, mtime)
+        _reverse[hashed] = rel_path
+    return hashed
+
+
+def build_manifest() -> int:
+    """Fingerprints (and precompresses) every file under STATIC_DIR. Returns the file count."""
+    os.makedirs(STATIC_DIR, exist_ok=True)
+    count = 0
+    for root, _, files in os.walk(STATIC_DIR):
+        for name in files:
+            if name.endswith(PRECOMPRESSED_SUFFIXES) or name.endswith(".tmp"):
+                continue
+            rel_path = os.path.relpath(os.path.join(root, name), STATIC_DIR).replace(os.sep, "/")
+            if _fingerprint(rel_path):
+                count += 1
+    return count
+
+
+def asset_url(path: str) -> str:
+    """
+    Jinja helper: hashed /static URL for `path` (relative to backend/static,
+    or already starting with /static/). Unknown files fall back to the plain URL.
+    """
+    rel_path = path[len(STATIC_URL):] if path.startswith(STATIC_URL) else path.lstrip("/")
+    hashed = _fingerprint(rel_path)
+    return STATIC_URL + (hashed or rel_path)
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    Serves hashed asset URLs as immutable and picks a precompressed variant
+    by Accept-Encoding. Plain (unhashed) URLs still work, with revalidation.
+    """
+
+    async def get_response(self, path: str, scope):
+        rel_path = path.replace(os.sep, "/")
+        original = _reverse.get(rel_path)
+        if original is None:
+            response = await super().get_response(path, scope)
+            if response.status_code == 200:
+                response.headers.setdefault("Cache-Control", "no-cache")
+            return response
+
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        for suffix, encoding in ((".br", "br"), (".gz", "gzip")):
+            if encoding in accept and os.path.isfile(os.path.join(STATIC_DIR, original + suffix)):
+                response = await super().get_response(original + suffix, scope)
+                if response.status_code == 200:
+                    # Type of the original file, not application/gzip
+                    response.headers["Content-Type"] = _content_type(original)
+                    response.headers["Content-Encoding"] = encoding
+                    response.headers["Vary"] = "Accept-Encoding"
+                    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+                return response
+
+        response = await super().get_response(original, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with a fixed Cache-Control on successful responses."""
+
+    def __init__(self, *args, cache_control: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 206):
+            response.headers["Cache-Control"] = self.cache_control
+        return response
+
+
+class DynamicGZipMiddleware(GZipMiddleware):
+    """
+    GZip for HTML/JSON responses only: skips paths serving media or
+    precompressed files, where compressing again would waste CPU or break
+    byte-range requests.
+    """
+
+    def __init__(self, app, excluded_prefixes: Tuple[str, ...] = (), **kwargs):
+        super().__init__(app, **kwargs)
+        self.excluded_prefixes = excluded_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.excluded_prefixes):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+def _content_type(path: str) -> str:
+    media_type, _ = mimetypes.guess_type(path)
+    if media_type and media_type.startswith("text/"):
+        return f"{media_type}; charset=utf-8"
+    return media_type or "application/octet-stream"
@@ -0,0 +1,288 @@
+"""
+Learner accounts and signed session cookies.
+
+Each learner has their own progress, exam attempts and unlock state, keyed
+by `user_id` (the username). Passwords are stored as salted PBKDF2 hashes.
+The session cookie is `username|expiry|hmac`, so checking it costs one HMAC
+plus a lookup that the account still exists, cached for
+ACCOUNT_CHECK_SECONDS. The signing key comes from SESSION_SECRET, or is
+generated once and kept in backend/.session_secret.
+
+Before accounts existed, every row was written as user "user"; the first
+account created takes over those rows and is the instance's admin. Admins
+manage the library, background jobs and sync (require_admin); scripts such
+as the Streamlit dashboard can call the admin APIs with ADMIN_TOKEN instead.
+
+CLI:
+    python -m backend.services.auth create-user alice [--admin]
+    python -m backend.services.auth set-admin alice [--revoke]
+    python -m backend.services.auth list
+"""
+import argparse
+import getpass
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from fastapi import HTTPException, Request
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models import User, VideoProgress, ExamAttempt
+
+SESSION_COOKIE = "ls_session"
+SESSION_DAYS = int(os.getenv("SESSION_DAYS", "30"))
+
+# Only the first account can be created from the login page unless sign-up
+# is opened explicitly (a household on a LAN); otherwise use the CLI
+AUTH_ALLOW_SIGNUP = os.getenv("AUTH_ALLOW_SIGNUP", "0") == "1"
+
+# Sent as X-Admin-Token by scripts calling the admin APIs; unset disables it
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+# How long a session's account is trusted to still exist before it is looked up again
+ACCOUNT_CHECK_SECONDS = float(os.getenv("ACCOUNT_CHECK_SECONDS", "30"))
+
+# user_id of rows written before accounts existed
+LEGACY_USER_ID = "user"
+
+PBKDF2_ITERATIONS = 200_000
+USERNAME_RE = re.compile(r"^[a-z0-9_.-]{2,32}$")
+MIN_PASSWORD_LENGTH = 6
+
+_SECRET_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".session_secret")
+_secret: Optional[bytes] = None
+_accounts_seen: Dict[str, float] = {}  # username -> when it was last found in the users table
+
+
+class LoginRequired(Exception):
+    """Raised for page requests without a valid session; main.py redirects to /login."""
+
+    def __init__(self, next_url: str = "/"):
+        self.next_url = next_url
+
+
+def _session_secret() -> bytes:
+    global _secret
+    if _secret is None:
+        value = os.getenv("SESSION_SECRET")
+        if not value:
+            try:
+                with open(_SECRET_FILE) as f:
+                    value = f.read().strip()
+            except FileNotFoundError:
+                value = secrets.token_hex(32)
+                fd = os.open(_SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, "w") as f:
+                    f.write(value)
+        _secret = value.encode()
+    return _secret
+
+
+def hash_password(password: str) -> str:
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${salt.hex()}${digest.hex()}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    try:
+        _, iterations, salt, expected = stored.split("$")
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+    except (ValueError, AttributeError):
+        return False
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+def normalize_username(username: str) -> str:
+    return (username or "").strip().lower()
+
+
+def create_user(db: Session, username: str, password: str, is_admin: bool = False) -> User:
+    """
+    Creates an account; the first one is always an admin. Raises ValueError
+    for invalid or taken usernames and short passwords.
+    """
+    username = normalize_username(username)
+    if not USERNAME_RE.match(username):
+        raise ValueError("Usernames are 2-32 characters: letters, digits, '.', '_' or '-'.")
+    if len(password or "") < MIN_PASSWORD_LENGTH:
+        raise ValueError(f"Passwords need at least {MIN_PASSWORD_LENGTH} characters.")
+    if db.query(User).filter(User.username == username).first():
+        raise ValueError("That username is taken.")
+
+    first_account = db.query(User.id).first() is None
+    user = User(username=username, password_hash=hash_password(password), is_admin=is_admin or first_account)
+    db.add(user)
+    if first_account and username != LEGACY_USER_ID:
+        # Progress and attempts recorded before accounts existed belong to the first learner
+        for model in (VideoProgress, ExamAttempt):
+            db.execute(update(model).where(model.user_id == LEGACY_USER_ID).values(user_id=username))
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def signup_open(db: Session) -> bool:
+    """Sign-up is open until the first account exists, then only with AUTH_ALLOW_SIGNUP=1."""
+    return AUTH_ALLOW_SIGNUP or db.query(User.id).first() is None
+
+
+def authenticate(db: Session, username: str, password: str) -> Optional[User]:
+    user = db.query(User).filter(User.username == normalize_username(username)).first()
+    if user and verify_password(password, user.password_hash):
+        return user
+    return None
+
+
+def sign_session(username: str) -> str:
+    expires = int(time.time()) + SESSION_DAYS * 86400
+    payload = f"{username}|{expires}"
+    sig = hmac.new(_session_secret(), payload.encode(), hashlib.sha256).hexdigest()
+    return f"{payload}|{sig}"
+
+
+def read_session(value: Optional[str]) -> Optional[str]:
+    """Username from a session cookie value, or None if it is missing, forged or expired."""
+    if not value:
+        return None
+    try:
+        username, expires, sig = value.split("|")
+    except ValueError:
+        return None
+    expected = hmac.new(_session_secret(), f"{username}|{expires}".encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(sig, expected) or not expires.isdigit() or int(expires) < time.time():
+        return None
+    return username
+
+
+def _account_exists(username: str) -> bool:
+    # Only hits are cached, so a deleted or renamed account is locked out within ACCOUNT_CHECK_SECONDS
+    seen = _accounts_seen.get(username)
+    if seen is not None and time.monotonic() - seen < ACCOUNT_CHECK_SECONDS:
+        return True
+    db = SessionLocal()
+    try:
+        exists = db.query(User.id).filter(User.username == username).first() is not None
+    finally:
+        db.close()
+    if exists:
+        _accounts_seen[username] = time.monotonic()
+    else:
+        _accounts_seen.pop(username, None)
+    return exists
+
+
+def session_user(request: Request) -> Optional[str]:
+    """The signed-in username; a validly signed cookie of an account that is gone counts as signed out."""
+    username = read_session(request.cookies.get(SESSION_COOKIE))
+    if username and _account_exists(username):
+        return username
+    return None
+
+
+def current_user(request: Request) -> str:
+    """
+    Dependency: the signed-in username. API calls without a session get a
+    401; page requests are redirected to /login and come back afterwards.
+    """
+    user_id = session_user(request)
+    if user_id:
+        return user_id
+    if request.url.path.startswith("/api/"):
+        raise HTTPException(status_code=401, detail="Not signed in")
+    next_url = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+    raise LoginRequired(next_url)
+
+
+def is_admin(username: Optional[str]) -> bool:
+    if not username:
+        return False
+    db = SessionLocal()
+    try:
+        return bool(db.query(User.is_admin).filter(User.username == username).scalar())
+    finally:
+        db.close()
+
+
+def require_admin(request: Request) -> Optional[str]:
+    """
+    Dependency for admin-only routes: the signed-in admin's username. API
+    calls may present ADMIN_TOKEN instead, and then there is no username.
+    Signed-in learners who are not admins get a 403.
+    """
+    token = request.headers.get(ADMIN_TOKEN_HEADER)
+    if token and ADMIN_TOKEN and request.url.path.startswith("/api/"):
+        if hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return None
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    user_id = current_user(request)
+    if not is_admin(user_id):
+        raise HTTPException(status_code=403, detail="Admins only")
+    return user_id
+
+
+def safe_next(next_url: Optional[str]) -> str:
+    """Only allow redirects back into this site."""
+    if not next_url or not next_url.startswith("/"):
+        return "/"
+    # Browsers read /\host as //host, and drop tabs and newlines (so /<tab>/host is one too)
+    if "\\" in next_url or any(ord(ch) < 0x20 for ch in next_url):
+        return "/"
+    parts = urlsplit(next_url)
+    if parts.scheme or parts.netloc:
+        return "/"
+    return next_url
+
+
+def main():
+    from .. import migrations
+    from ..database import engine
+
+    parser = argparse.ArgumentParser(description="Manage learner accounts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    create = sub.add_parser("create-user", help="Create an account (prompts for the password)")
+    create.add_argument("username")
+    create.add_argument("--admin", action="store_true", help="Let the account manage the library and sync")
+    grant = sub.add_parser("set-admin", help="Make an account an admin")
+    grant.add_argument("username")
+    grant.add_argument("--revoke", action="store_true", help="Take admin rights away instead")
+    sub.add_parser("list", help="List accounts")
+    args = parser.parse_args()
+
+    migrations.run(engine)
+    db = SessionLocal()
+    try:
+        if args.command == "create-user":
+            password = getpass.getpass("Password: ")
+            if password != getpass.getpass("Repeat password: "):
+                raise SystemExit("Passwords do not match.")
+            try:
+                user = create_user(db, args.username, password, is_admin=args.admin)
+            except ValueError as e:
+                raise SystemExit(str(e))
+            print(f"Created {user.username}{' (admin)' if user.is_admin else ''}")
+        elif args.command == "set-admin":
+            user = db.query(User).filter(User.username == normalize_username(args.username)).first()
+            if not user:
+                raise SystemExit(f"No account named {args.username}.")
+            user.is_admin = not args.revoke
+            db.commit()
+            print(f"{user.username} is {'now' if user.is_admin else 'no longer'} an admin")
+        else:
+            for user in db.query(User).order_by(User.username):
+                role = "admin" if user.is_admin else "learner"
+                print(f"{user.username:<32} {role:<8} created {user.created_at:%Y-%m-%d}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,641 @@
+"""
+Durable background jobs, stored in the jobs table.
+
+Slow or flaky work that used to run on a request thread or an in-memory
+thread (video downloads, thumbnail extraction, quiz generation, playlist
+imports, transcript fetches) is enqueued
+as a row and run by worker threads. The queue lives in SQLite, so every
+process on the same database shares it: `uvicorn --workers N`, a restarted
+server and a separate `python -m backend.services.jobs worker` all see and
+run the same jobs.
+
+- A worker claims a job with a conditional UPDATE (queued -> running), so a
+  job is never run twice at the same time.
+- Running jobs get a heartbeat every JOB_HEARTBEAT_SECONDS. Jobs whose
+  worker has not heartbeated for JOB_STALE_SECONDS (a crash or restart) are
+  queued again.
+- A failed job is retried up to its max_attempts, with exponential backoff.
+- Finished jobs are deleted after JOB_KEEP_DAYS.
+
+Each job type belongs to a queue with its own worker threads, so hour-long
+downloads never hold up quiz generation. JOB_WORKERS sets the threads per
+process, e.g. "default=2,downloads=1,sync=1"; "0" makes a process enqueue
+only. Sync runs (see sync_scheduler) have the "sync" queue to themselves.
+
+CLI:
+    python -m backend.services.jobs worker
+    python -m backend.services.jobs list
+"""
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from ..database import SessionLocal, engine
+from ..models import Course, Job, Question, Transcript, Video
+from . import assets, metrics, page_cache
+
+DEFAULT_WORKERS = "default=2,downloads=1,sync=1"
+JOB_WORKERS = os.getenv("JOB_WORKERS", DEFAULT_WORKERS)
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_SECONDS = float(os.getenv("JOB_RETRY_SECONDS", "30"))  # doubled on each further attempt
+JOB_KEEP_DAYS = float(os.getenv("JOB_KEEP_DAYS", "7"))
+
+# Playlist imports insert videos this many at a time and prefetch transcripts of this many
+INGEST_PAGE_SIZE = int(os.getenv("INGEST_PAGE_SIZE", "50"))
+INGEST_PREFETCH_TRANSCRIPTS = int(os.getenv("INGEST_PREFETCH_TRANSCRIPTS", "3"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# kind -> (queue, handler). Handlers take (context, payload) and return a JSON-able result.
+HANDLERS: Dict[str, Tuple[str, Callable]] = {}
+
+_PROCESS = f"{socket.gethostname()}:{os.getpid()}"
+_running: Dict[int, int] = {}  # job id -> worker thread, for heartbeats and shutdown
+_running_lock = threading.Lock()
+_wake: Dict[str, threading.Event] = {}
+_stop = threading.Event()
+_workers_started = False
+
+
+def handler(kind: str, queue: str = "default"):
+    """Registers a job type."""
+    def register(fn):
+        HANDLERS[kind] = (queue, fn)
+        return fn
+    return register
+
+
+def parse_workers(spec: str) -> Dict[str, int]:
+    """'default=2,downloads=1' -> {"default": 2, "downloads": 1}; a bare number applies to every queue."""
+    spec = (spec or "").strip()
+    if spec.isdigit():
+        return {queue: int(spec) for queue in {q for q, _ in HANDLERS.values()}}
+    counts = {}
+    for item in spec.split(","):
+        name, _, count = item.partition("=")
+        if name.strip():
+            counts[name.strip()] = int(count or 1)
+    return counts
+
+
+class JobContext:
+    """Passed to handlers so they can report progress on their job row."""
+
+    def __init__(self, job_id: int, attempt: int):
+        self.job_id = job_id
+        self.attempt = attempt
+        self._last_write = 0.0
+
+    def progress(self, fraction: Optional[float] = None, message: Optional[str] = None,
+                 detail: Optional[Dict] = None, force: bool = False):
+        # At most two writes a second; progress is advisory
+        now = time.monotonic()
+        if not force and now - self._last_write < 0.5:
+            return
+        self._last_write = now
+        values = {"heartbeat_at": datetime.utcnow()}
+        if fraction is not None:
+            values["progress"] = max(0.0, min(1.0, fraction))
+        if message is not None:
+            values["message"] = message[:255]
+        if detail is not None:
+            values["detail"] = json.dumps(detail)
+        with engine.begin() as conn:
+            conn.execute(update(Job).where(Job.id == self.job_id).values(**values))
+
+
+def enqueue(kind: str, payload: Optional[Dict] = None, dedupe_key: Optional[str] = None,
+            batch: Optional[str] = None, priority: int = 0, max_attempts: Optional[int] = None) -> Tuple[int, bool]:
+    """
+    Adds a job and wakes this process's workers. Returns (job_id, created).
+    With `dedupe_key`, a queued or running job with the same key is returned
+    instead of adding another.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    queue = HANDLERS[kind][0]
+    with engine.begin() as conn:
+        result = conn.execute(
+            sqlite_insert(Job).values(
+                kind=kind, queue=queue, payload=json.dumps(payload or {}), status="queued",
+                dedupe_key=dedupe_key, batch=batch, priority=priority,
+                max_attempts=max_attempts or JOB_MAX_ATTEMPTS, attempts=0,
+                run_after=datetime.utcnow(), created_at=datetime.utcnow(),
+            ).on_conflict_do_nothing(index_elements=["dedupe_key"], index_where=Job.status.in_(ACTIVE_STATUSES))
+        )
+        if result.rowcount:
+            job_id, created = result.inserted_primary_key[0], True
+        else:
+            job_id = conn.execute(
+                select(Job.id).where(Job.dedupe_key == dedupe_key, Job.status.in_(ACTIVE_STATUSES))
+            ).scalar()
+            created = False
+    if created and queue in _wake:
+        _wake[queue].set()
+    return job_id, created
+
+
+def _claim(queue: str, worker: str):
+    """Takes the next due job of `queue`; the guarded UPDATE makes the claim atomic across processes."""
+    for _ in range(5):
+        now = datetime.utcnow()
+        with engine.connect() as conn:
+            job_id = conn.execute(
+                select(Job.id)
+                .where(Job.queue == queue, Job.status == "queued", Job.run_after <= now)
+                .order_by(Job.priority.desc(), Job.id)
+                .limit(1)
+            ).scalar()
+        if job_id is None:
+            return None
+        with engine.begin() as conn:
+            claimed = conn.execute(
+                update(Job).where(Job.id == job_id, Job.status == "queued").values(
+                    status="running", worker=worker, attempts=Job.attempts + 1,
+                    started_at=now, heartbeat_at=now, progress=None, message=None, detail=None,
+                )
+            ).rowcount
+            if claimed:
+                return conn.execute(select(Job.__table__).where(Job.id == job_id)).first()
+    return None
+
+
+def _finish(job, worker: str, result: Optional[Dict] = None, error: Optional[str] = None):
+    now = datetime.utcnow()
+    if error is None:
+        values = {"status": "done", "result": json.dumps(result) if result is not None else None,
+                  "progress": 1.0, "finished_at": now, "error": None}
+    elif job.attempts < job.max_attempts:
+        delay = JOB_RETRY_SECONDS * 2 ** (job.attempts - 1)
+        values = {"status": "queued", "error": error, "run_after": now + timedelta(seconds=delay)}
+    else:
+        values = {"status": "failed", "error": error, "finished_at": now}
+    with engine.begin() as conn:
+        # Skipped if the job was declared stale and handed to another worker meanwhile
+        conn.execute(update(Job).where(Job.id == job.id, Job.worker == worker, Job.status == "running").values(**values))
+    return values["status"]
+
+
+def _run(job, worker: str):
+    entry = HANDLERS.get(job.kind)
+    with _running_lock:
+        _running[job.id] = threading.get_ident()
+    try:
+        if entry is None:
+            raise RuntimeError(f"No handler for job kind '{job.kind}'")
+        result = entry[1](JobContext(job.id, job.attempts), json.loads(job.payload or "{}"))
+        _finish(job, worker, result)
+    except Exception as e:
+        if _stop.is_set():
+            # Most likely stop_workers killing its subprocess; it requeues the job, not counted as a failure
+            print(f"[JOBS] {job.kind} #{job.id} interrupted by shutdown: {e}", flush=True)
+            return
+        status = _finish(job, worker, error=f"{type(e).__name__}: {e}")
+        print(f"[JOBS] {job.kind} #{job.id} attempt {job.attempts}/{job.max_attempts} failed ({status}): {e}", flush=True)
+    finally:
+        with _running_lock:
+            _running.pop(job.id, None)
+
+
+def _worker_loop(queue: str, worker: str):
+    wake = _wake[queue]
+    while not _stop.is_set():
+        try:
+            job = _claim(queue, worker)
+        except Exception as e:
+            print(f"[JOBS] {worker} could not claim a job: {e}", flush=True)
+            job = None
+        if job is None:
+            wake.wait(JOB_POLL_SECONDS)
+            wake.clear()
+            continue
+        _run(job, worker)
+
+
+def requeue_stale() -> int:
+    """Requeues (or fails, when out of attempts) running jobs whose worker stopped heartbeating."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    with engine.begin() as conn:
+        return conn.execute(
+            update(Job).where(Job.status == "running", Job.heartbeat_at < cutoff).values(
+                status=case((Job.attempts < Job.max_attempts, "queued"), else_="failed"),
+                finished_at=case((Job.attempts < Job.max_attempts, None), else_=datetime.utcnow()),
+                error="Worker stopped responding", worker=None,
+            )
+        ).rowcount
+
+
+def prune_finished() -> int:
+    cutoff = datetime.utcnow() - timedelta(days=JOB_KEEP_DAYS)
+    with engine.begin() as conn:
+        return conn.execute(
+            delete(Job).where(Job.status.in_(("done", "failed")), Job.finished_at < cutoff)
+        ).rowcount
+
+
+def _maintenance_loop():
+    last_prune = 0.0
+    while not _stop.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            with _running_lock:
+                running = dict(_running)
+            if running:
+                with engine.begin() as conn:
+                    conn.execute(update(Job).where(Job.id.in_(running)).values(heartbeat_at=datetime.utcnow()))
+            requeued = requeue_stale()
+            if requeued:
+                print(f"[JOBS] Requeued {requeued} stale jobs.", flush=True)
+            if time.monotonic() - last_prune > 3600:
+                last_prune = time.monotonic()
+                prune_finished()
+        except Exception as e:
+            print(f"[JOBS] Maintenance error: {e}", flush=True)
+
+
+def start_workers(spec: Optional[str] = None) -> int:
+    """Starts worker threads once per process. Returns the number started."""
+    global _workers_started
+    if _workers_started:
+        return 0
+    counts = {queue: n for queue, n in parse_workers(JOB_WORKERS if spec is None else spec).items() if n > 0}
+    if not counts:
+        return 0
+    _workers_started = True
+    _stop.clear()
+    started = 0
+    for queue, count in counts.items():
+        _wake.setdefault(queue, threading.Event())
+        for i in range(count):
+            worker = f"{_PROCESS}:{queue}-{i}"
+            threading.Thread(target=_worker_loop, args=(queue, worker), name=f"job-{queue}-{i}", daemon=True).start()
+            started += 1
+    threading.Thread(target=_maintenance_loop, name="job-maintenance", daemon=True).start()
+    print(f"[JOBS] Started {started} workers ({', '.join(f'{q}={n}' for q, n in counts.items())}).", flush=True)
+    return started
+
+
+def stop_workers():
+    """
+    Stops claiming and hands this process's running jobs back to the queue
+    right away, instead of waiting for them to go stale. Their yt-dlp/ffmpeg
+    process groups are killed first: they would outlive this process and keep
+    writing the files the job's next run starts over.
+    """
+    global _workers_started
+    _stop.set()
+    for event in _wake.values():
+        event.set()
+    with _running_lock:
+        running = dict(_running)
+    killed = metrics.kill_subprocesses(running.values())
+    if killed:
+        print(f"[JOBS] Killed {killed} subprocesses of running jobs.", flush=True)
+    if running:
+        with engine.begin() as conn:
+            conn.execute(update(Job).where(Job.id.in_(list(running)), Job.status == "running").values(
+                status="queued", attempts=Job.attempts - 1, worker=None, error="Worker shut down",
+            ))
+    _workers_started = False
+
+
+def _job_dict(job: Job) -> Dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "queue": job.queue,
+        "status": job.status,
+        "payload": json.loads(job.payload or "{}"),
+        "batch": job.batch,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "worker": job.worker,
+        "progress": job.progress,
+        "message": job.message,
+        "detail": json.loads(job.detail) if job.detail else None,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "run_after": job.run_after.isoformat() if job.run_after else None,
+    }
+
+
+def get_job(job_id: int) -> Optional[Dict]:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        return _job_dict(job) if job else None
+    finally:
+        db.close()
+
+
+def list_jobs(status: Optional[str] = None, kind: Optional[str] = None, batch: Optional[str] = None,
+              limit: int = 50) -> List[Dict]:
+    stmt = select(Job).order_by(Job.id.desc()).limit(limit)
+    if status:
+        stmt = stmt.where(Job.status == status)
+    if kind:
+        stmt = stmt.where(Job.kind == kind)
+    if batch:
+        stmt = stmt.where(Job.batch == batch)
+    db = SessionLocal()
+    try:
+        return [_job_dict(job) for job in db.execute(stmt).scalars()]
+    finally:
+        db.close()
+
+
+def latest_batch(prefix: str) -> Optional[str]:
+    """Most recent batch name starting with `prefix`."""
+    with engine.connect() as conn:
+        return conn.execute(
+            select(Job.batch).where(Job.batch.startswith(prefix)).order_by(Job.id.desc()).limit(1)
+        ).scalar()
+
+
+def counts_by_status() -> Dict[str, int]:
+    with engine.connect() as conn:
+        return dict(conn.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+
+
+def retry(job_id: int) -> Optional[int]:
+    """
+    Queues a failed job again with a fresh set of attempts. Returns the id of
+    the queued job: this one, or the queued or running job with the same
+    dedupe key that was enqueued since it failed. None if it hasn't failed.
+    """
+    try:
+        with engine.begin() as conn:
+            retried = conn.execute(update(Job).where(Job.id == job_id, Job.status == "failed").values(
+                status="queued", attempts=0, run_after=datetime.utcnow(), finished_at=None,
+            )).rowcount
+    except IntegrityError:
+        # The dedupe index allows one active job per key, and another one has it
+        with engine.connect() as conn:
+            dedupe_key = select(Job.dedupe_key).where(Job.id == job_id).scalar_subquery()
+            return conn.execute(
+                select(Job.id).where(Job.dedupe_key == dedupe_key, Job.status.in_(ACTIVE_STATUSES))
+            ).scalar()
+    if not retried:
+        return None
+    for event in _wake.values():
+        event.set()
+    return job_id
+
+
+# --- Job types ---
+
+def download_course_video(video_id: int, ctx: Optional[JobContext] = None) -> Dict:
+    """Downloads one video with yt-dlp and records the file. Raises when yt-dlp fails, so the job is retried."""
+    from .youtube import download_video
+
+    db = SessionLocal()
+    try:
+        video = db.get(Video, video_id)
+        if not video:
+            return {"status": "missing"}
+        if video.local_filename:
+            return {"status": "already_downloaded", "filename": video.local_filename}
+        if ctx:
+            ctx.progress(0.0, f"Downloading {video.title}", force=True)
+
+        def on_progress(progress: Dict):
+            try:
+                ctx.progress(progress["percent"] / 100, detail=progress, force=progress["percent"] >= 100)
+            except Exception as e:
+                # A locked database must not abort the download
+                print(f"[JOBS] Could not record download progress: {e}", flush=True)
+
+        course = video.course
+        filename = download_video(
+            video.youtube_id,
+            course_title=course.title if course else "",
+            video_title=video.title,
+            video_order=video.order,
+            on_progress=on_progress if ctx else None,
+        )
+        if not filename:
+            raise RuntimeError("yt-dlp did not produce a file")
+        video.local_filename = filename
+        db.commit()
+        page_cache.bump(video.course_id)
+        return {"status": "ok", "filename": filename}
+    finally:
+        db.close()
+
+
+def generate_course_thumbnail(course_id: int) -> Optional[str]:
+    """
+    Extracts a frame of the course's first local video into THUMBS_DIR.
+    Stores "" when no frame can be taken, so the attempt isn't repeated.
+    """
+    from .local_import import extract_thumbnail
+
+    db = SessionLocal()
+    try:
+        course = db.get(Course, course_id)
+        if not course:
+            return None
+        first = db.query(Video).filter(Video.course_id == course_id).order_by(Video.order).first()
+        thumb_url = None
+        if first and first.local_filename and os.path.isfile(first.local_filename):
+            os.makedirs(assets.THUMBS_DIR, exist_ok=True)
+            thumb_file = f"course_{course.id}.jpg"
+            thumb_path = os.path.join(assets.THUMBS_DIR, thumb_file)
+            if os.path.exists(thumb_path) or extract_thumbnail(first.local_filename, thumb_path, first.duration or 0):
+                thumb_url = f"/static/thumbs/{thumb_file}"
+        course.thumbnail = thumb_url or ""
+        db.commit()
+        page_cache.bump(course_id)
+        return thumb_url
+    finally:
+        db.close()
+
+
+def ingest_playlist(playlist_url: str, ctx: Optional[JobContext] = None) -> Dict:
+    """
+    Creates a course from a YouTube playlist, bulk-inserting its videos one
+    page at a time as yt-dlp reads them, so the course can be opened before a
+    large playlist is fully read. Transcripts of the first
+    INGEST_PREFETCH_TRANSCRIPTS videos are queued as soon as they are known.
+    Videos already in the course are skipped, so a retried job carries on
+    where it stopped.
+    """
+    from .youtube import iter_playlist_pages
+
+    db = SessionLocal()
+    try:
+        course = None
+        known = set()
+        position = added = 0
+        for playlist, videos in iter_playlist_pages(playlist_url, INGEST_PAGE_SIZE):
+            if course is None:
+                course = db.query(Course).filter(Course.playlist_id == playlist['id']).first()
+                if course is None:
+                    course = Course(title=playlist['title'], description=f"Imported from YouTube: {playlist['title']}",
+                                    playlist_id=playlist['id'])
+                    db.add(course)
+                    db.commit()
+                    page_cache.bump()
+                known = {youtube_id for (youtube_id,) in db.query(Video.youtube_id).filter(Video.course_id == course.id)}
+
+            rows = []
+            for v in videos:
+                if v['youtube_id'] not in known:
+                    known.add(v['youtube_id'])
+                    rows.append({"course_id": course.id, "youtube_id": v['youtube_id'], "title": v['title'],
+                                 "order": position, "duration": v['duration']})
+                position += 1
+            if rows:
+                db.execute(insert(Video), rows)
+                db.commit()
+                page_cache.bump(course.id)
+                if not added:
+                    _prefetch_transcripts(db, course.id)
+                added += len(rows)
+            if ctx:
+                ctx.progress(message=f"{course.title}: {position} videos read, {added} added",
+                             detail={"course_id": course.id, "videos": position, "added": added})
+        print(f"[INGEST] {course.title}: {added} of {position} videos added", flush=True)
+        return {"course_id": course.id, "videos": position, "added": added}
+    finally:
+        db.close()
+
+
+def _prefetch_transcripts(db, course_id: int):
+    """Queues transcript fetches for the first videos of a course, which learners open first."""
+    first = (
+        db.query(Video.id).filter(Video.course_id == course_id)
+        .order_by(Video.order).limit(INGEST_PREFETCH_TRANSCRIPTS).all()
+    )
+    for (video_id,) in first:
+        enqueue("fetch_transcript", {"video_id": video_id}, dedupe_key=f"fetch_transcript:{video_id}",
+                priority=5, max_attempts=1)
+
+
+def _ensure_transcripts(db, video: Video) -> List[Transcript]:
+    """The video's stored transcript segments, fetched from YouTube first if there are none."""
+    from .youtube import get_video_transcript
+
+    transcripts = db.query(Transcript).filter(Transcript.video_id == video.id).all()
+    if transcripts or not video.youtube_id:
+        return transcripts
+    segments = get_video_transcript(video.youtube_id) or []
+    # Another job may have stored it while this one was fetching
+    if segments and not db.query(Transcript.id).filter(Transcript.video_id == video.id).first():
+        for t in segments:
+            db.add(Transcript(video_id=video.id, text=t['text'], start_time=t['start'], duration=t['duration']))
+        db.commit()
+    return db.query(Transcript).filter(Transcript.video_id == video.id).all()
+
+
+def fetch_video_transcript(video_id: int) -> int:
+    """Stores the video's transcript if it isn't stored yet. Returns the segment count."""
+    db = SessionLocal()
+    try:
+        video = db.get(Video, video_id)
+        return len(_ensure_transcripts(db, video)) if video else 0
+    finally:
+        db.close()
+
+
+def generate_video_quiz(video_id: int) -> int:
+    """Fetches the transcript if needed and stores generated questions. Returns the question count."""
+    from .ai_tutor import generate_questions
+
+    db = SessionLocal()
+    try:
+        video = db.get(Video, video_id)
+        if not video:
+            return 0
+        existing = db.query(Question).filter(Question.video_id == video_id).count()
+        if existing:
+            return existing
+
+        transcripts = _ensure_transcripts(db, video)
+        if transcripts:
+            full_text = " ".join(t.text for t in transcripts)
+        else:
+            full_text = f"Title: {video.title}. Use this title as context."
+
+        generated = generate_questions(full_text)
+        for q in generated:
+            db.add(Question(video_id=video_id, text=q['question'], kind='text',
+                            correct_answer_summary=q.get('context', '')))
+        db.commit()
+        return len(generated)
+    finally:
+        db.close()
+
+
+@handler("download_video", queue="downloads")
+def _download_video_job(ctx: JobContext, payload: Dict):
+    return download_course_video(payload["video_id"], ctx)
+
+
+@handler("thumbnail")
+def _thumbnail_job(ctx: JobContext, payload: Dict):
+    return {"thumbnail": generate_course_thumbnail(payload["course_id"])}
+
+
+@handler("generate_quiz")
+def _generate_quiz_job(ctx: JobContext, payload: Dict):
+    return {"questions": generate_video_quiz(payload["video_id"])}
+
+
+@handler("ingest_playlist")
+def _ingest_playlist_job(ctx: JobContext, payload: Dict):
+    return ingest_playlist(payload["playlist_url"], ctx)
+
+
+@handler("fetch_transcript")
+def _fetch_transcript_job(ctx: JobContext, payload: Dict):
+    return {"segments": fetch_video_transcript(payload["video_id"])}
+
+
+def main():
+    import argparse
+
+    from .. import migrations
+    from . import sync_scheduler  # noqa: F401  registers the sync job type
+
+    parser = argparse.ArgumentParser(description="Run or inspect background jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    work = sub.add_parser("worker", help="Run job workers in the foreground")
+    work.add_argument("--workers", default=None, help="Threads per queue, e.g. 'default=2,downloads=1,sync=1' (default: JOB_WORKERS)")
+    listing = sub.add_parser("list", help="Show recent jobs")
+    listing.add_argument("--status")
+    listing.add_argument("--limit", type=int, default=30)
+    args = parser.parse_args()
+
+    migrations.run(engine)
+    if args.command == "worker":
+        # A dedicated worker still runs when the web processes are set to enqueue only
+        spec = args.workers or (DEFAULT_WORKERS if JOB_WORKERS.strip() == "0" else JOB_WORKERS)
+        if not start_workers(spec):
+            raise SystemExit("No workers configured.")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            stop_workers()
+    else:
+        for job in list_jobs(status=args.status, limit=args.limit):
+            print(f"#{job['id']:<6} {job['status']:<8} {job['kind']:<16} {job['attempts']}/{job['max_attempts']}  "
+                  f"{job['created_at'][:19]}  {job['error'] or job['message'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Ledger of every Groq call: which function made it, model, token usage,
+audio seconds, latency, retry number and outcome.
+
+record() only appends to an in-memory queue; a writer thread flushes the
+queue to the llm_calls table in batches, so request paths never wait on the
+insert. report() aggregates the table for the admin endpoint.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.orm import Session
+
+from ..database import engine
+from ..models import LLMCall
+
+LEDGER_FLUSH_SECONDS = float(os.getenv("LLM_LEDGER_FLUSH_SECONDS", "2"))
+LEDGER_BATCH_SIZE = int(os.getenv("LLM_LEDGER_BATCH_SIZE", "200"))
+
+# Bounded so a stuck writer can't grow memory; overflow is counted and dropped
+_queue: "queue.Queue[Dict]" = queue.Queue(maxsize=10000)
+_writer_started = False
+_writer_lock = threading.Lock()
+dropped = 0
+
+
+def _usage_value(usage, name: str) -> Optional[int]:
+    if usage is None:
+        return None
+    value = getattr(usage, name, None)
+    if value is None and isinstance(usage, dict):
+        value = usage.get(name)
+    return value
+
+
+def record(function: str, kind: str, model: str, latency: float, outcome: str = "ok",
+           usage=None, prompt_chars: Optional[int] = None, audio_seconds: Optional[float] = None,
+           retries: int = 0, error: Optional[str] = None):
+    """Queues one call for the ledger. Never raises and never blocks."""
+    global dropped
+    details = _usage_value(usage, "prompt_tokens_details")
+    entry = {
+        "created_at": datetime.utcnow(),
+        "function": function,
+        "kind": kind,
+        "model": model,
+        "prompt_tokens": _usage_value(usage, "prompt_tokens"),
+        "completion_tokens": _usage_value(usage, "completion_tokens"),
+        "cached_tokens": _usage_value(details, "cached_tokens"),
+        "prompt_chars": prompt_chars,
+        "audio_seconds": audio_seconds,
+        "latency_ms": int(latency * 1000),
+        "retries": retries,
+        "outcome": outcome,
+        "error": error[:255] if error else None,
+    }
+    _ensure_writer()
+    try:
+        _queue.put_nowait(entry)
+    except queue.Full:
+        dropped += 1
+
+
+def flush() -> int:
+    """Writes everything queued so far. Returns the number of rows written."""
+    rows: List[Dict] = []
+    while True:
+        try:
+            rows.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    if not rows:
+        return 0
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(LLMCall), rows)
+    except Exception as e:
+        print(f"[LLM LEDGER] Failed to write {len(rows)} entries: {e}", flush=True)
+        return 0
+    return len(rows)
+
+
+def _writer_loop():
+    while True:
+        # Wake early when a full batch is waiting
+        deadline = time.monotonic() + LEDGER_FLUSH_SECONDS
+        while _queue.qsize() < LEDGER_BATCH_SIZE and time.monotonic() < deadline:
+            time.sleep(0.1)
+        flush()
+
+
+def _ensure_writer():
+    global _writer_started
+    if _writer_started:
+        return
+    with _writer_lock:
+        if _writer_started:
+            return
+        _writer_started = True
+        threading.Thread(target=_writer_loop, name="llm-ledger", daemon=True).start()
+        # The writer is a daemon thread; don't lose the last batch on shutdown
+        atexit.register(flush)
+
+
+def report(db: Session, days: int = 7, top: int = 10) -> Dict:
+    """
+    Per function/model totals over the last `days` days, plus the `top`
+    largest individual prompts, which are the first candidates for trimming.
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    stmt = (
+        select(
+            LLMCall.function,
+            LLMCall.model,
+            func.count().label("calls"),
+            func.sum(case((LLMCall.outcome != "ok", 1), else_=0)).label("errors"),
+            func.sum(case((LLMCall.retries > 0, 1), else_=0)).label("retried_calls"),
+            func.coalesce(func.sum(LLMCall.prompt_tokens), 0).label("prompt_tokens"),
+            func.coalesce(func.sum(LLMCall.completion_tokens), 0).label("completion_tokens"),
+            func.coalesce(func.sum(LLMCall.cached_tokens), 0).label("cached_tokens"),
+            func.avg(LLMCall.prompt_tokens).label("avg_prompt_tokens"),
+            func.max(LLMCall.prompt_tokens).label("max_prompt_tokens"),
+            func.coalesce(func.sum(LLMCall.audio_seconds), 0).label("audio_seconds"),
+            func.avg(LLMCall.latency_ms).label("avg_latency_ms"),
+            func.max(LLMCall.latency_ms).label("max_latency_ms"),
+            func.sum(LLMCall.latency_ms).label("total_latency_ms"),
+        )
+        .where(LLMCall.created_at >= since)
+        .group_by(LLMCall.function, LLMCall.model)
+        .order_by(func.coalesce(func.sum(LLMCall.prompt_tokens), 0).desc())
+    )
+    by_function = []
+    for r in db.execute(stmt).mappings():
+        row = dict(r)
+        for key in ("avg_prompt_tokens", "avg_latency_ms"):
+            row[key] = round(row[key], 1) if row[key] is not None else None
+        by_function.append(row)
+
+    largest = db.execute(
+        select(LLMCall.id, LLMCall.created_at, LLMCall.function, LLMCall.prompt_tokens,
+               LLMCall.prompt_chars, LLMCall.completion_tokens, LLMCall.latency_ms)
+        .where(LLMCall.created_at >= since, LLMCall.prompt_tokens.isnot(None))
+        .order_by(LLMCall.prompt_tokens.desc())
+        .limit(top)
+    ).mappings()
+
+    return {
+        "since": since.isoformat(),
+        "by_function": by_function,
+        "largest_prompts": [dict(r) for r in largest],
+        "pending": _queue.qsize(),
+        "dropped": dropped,
+    }
@@ -13,6 +13,8 @@ import re
 import subprocess
 from typing import List, Dict, Optional
 
+from . import metrics
+
 VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.avi', '.webm', '.mov', '.m4v'}
 SUBTITLE_EXTENSIONS = {'.srt', '.vtt', '.ass', '.ssa'}
 
@@ -25,7 +27,7 @@ def _natural_sort_key(s: str):
 def _get_video_duration(filepath: str) -> int:
     """Get video duration in seconds using ffprobe."""
     try:
-        result = subprocess.run(
+        result = metrics.run_subprocess(
             ['ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
              '-of', 'default=noprint_wrappers=1:nokey=1', filepath],
             capture_output=True, text=True, timeout=10
@@ -35,6 +37,21 @@ def _get_video_duration(filepath: str) -> int:
         return 0
 
 
+def extract_thumbnail(video_path: str, thumb_path: str, duration: int = 0) -> bool:
+    """Grabs one frame, 30s in (or a third of the way into shorter videos), as a 320px JPEG."""
+    offset = min(30, duration // 3) if duration else 30
+    try:
+        metrics.run_subprocess(
+            ['ffmpeg', '-ss', str(offset), '-i', video_path,
+             '-vframes', '1', '-vf', 'scale=320:-1', '-q:v', '5',
+             '-y', thumb_path],
+            capture_output=True, timeout=15,
+        )
+    except Exception:
+        pass
+    return os.path.exists(thumb_path)
+
+
 def _clean_title(filename: str) -> str:
     """Extract a clean title from a video filename."""
     name = os.path.splitext(filename)[0]
@@ -0,0 +1,288 @@
+"""
+In-process metrics with a Prometheus text exposition at /metrics.
+
+Records latency histograms and counters for HTTP routes, SQL statements,
+external tools (ffmpeg/ffprobe/yt-dlp) and Groq calls. Everything is kept in
+module-level dicts under one lock; recording a sample is a dict lookup, a
+bisect and a few additions, cheap enough to leave on in production.
+"""
+import bisect
+import os
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+_POSIX = os.name == "posix"
+
+# Seconds; spans fast SQL up to multi-minute downloads
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+DESCRIPTIONS = {
+    "http_request_duration_seconds": "HTTP request latency by route template and method",
+    "http_requests_total": "HTTP responses by route template, method and status code",
+    "db_query_duration_seconds": "SQL statement execution time by database and statement type",
+    "subprocess_duration_seconds": "External tool run time by command and outcome",
+    "llm_request_duration_seconds": "Groq API call latency by calling function, kind and outcome",
+    "ytdlp_extract_duration_seconds": "In-process yt-dlp playlist metadata extraction time",
+}
+
+_lock = threading.Lock()
+# { (name, labels): [bucket counts..., +Inf count], sum }
+_histograms: Dict[Tuple[str, Tuple], list] = {}
+_counters: Dict[Tuple[str, Tuple], float] = {}
+
+# Processes started by stream_subprocess, by the thread reading their output
+_processes: Dict[int, subprocess.Popen] = {}
+
+_SQL_VERBS = {"SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH", "PRAGMA", "CREATE", "ALTER", "DROP", "BEGIN", "COMMIT", "SET"}
+_sqlalchemy_instrumented = False
+
+
+def observe(name: str, seconds: float, **labels):
+    """Adds one sample to histogram `name` with the given labels."""
+    if not METRICS_ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    index = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        entry[0][index] += 1
+        entry[1] += seconds
+
+
+def inc(name: str, amount: float = 1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+@contextmanager
+def timed(name: str, **labels):
+    """
+    Times the block into histogram `name`. Adds outcome="ok"/"error" unless
+    an outcome label is given.
+    """
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        labels.setdefault("outcome", outcome)
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def run_subprocess(args: List[str], **kwargs) -> subprocess.CompletedProcess:
+    """subprocess.run() timed into subprocess_duration_seconds, labeled by executable name."""
+    command = os.path.basename(str(args[0]))
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        result = subprocess.run(args, **kwargs)
+        if result.returncode != 0:
+            outcome = "exit_nonzero"
+        return result
+    except subprocess.TimeoutExpired:
+        outcome = "timeout"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        observe("subprocess_duration_seconds", time.perf_counter() - start, command=command, outcome=outcome)
+
+
+def stream_subprocess(args: List[str], on_line: Callable[[str], None], timeout: float) -> int:
+    """
+    Runs a command, calling on_line() for each line of its combined output as
+    it is printed. Returns the exit code. Kills the process and raises
+    subprocess.TimeoutExpired after `timeout` seconds. Timed like run_subprocess().
+    """
+    command = os.path.basename(str(args[0]))
+    start = time.perf_counter()
+    outcome = "ok"
+    timed_out = threading.Event()
+    try:
+        # Own process group, so children (yt-dlp's ffmpeg) holding the pipe are killed too
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   text=True, errors="replace", bufsize=1, start_new_session=_POSIX)
+        with _lock:
+            _processes[threading.get_ident()] = process
+
+        def _timeout():
+            timed_out.set()
+            _kill(process)
+
+        # Reading blocks until the next line, so a timer enforces the deadline
+        watchdog = threading.Timer(timeout, _timeout)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            for line in process.stdout:
+                on_line(line.rstrip("\r\n"))
+        except BaseException:
+            _kill(process)
+            raise
+        finally:
+            watchdog.cancel()
+            process.wait()
+            process.stdout.close()
+            with _lock:
+                _processes.pop(threading.get_ident(), None)
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(args, timeout)
+        if process.returncode != 0:
+            outcome = "exit_nonzero"
+        return process.returncode
+    except subprocess.TimeoutExpired:
+        outcome = "timeout"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        observe("subprocess_duration_seconds", time.perf_counter() - start, command=command, outcome=outcome)
+
+
+def _kill(process: subprocess.Popen):
+    if _POSIX:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+            return
+        except ProcessLookupError:
+            pass
+    process.kill()
+
+
+def kill_subprocesses(threads) -> int:
+    """
+    Kills what stream_subprocess is running on the given threads, with its
+    whole process group. The reading thread then sees the output end and
+    returns. Returns the number of processes killed.
+    """
+    with _lock:
+        processes = [_processes[t] for t in threads if t in _processes]
+    for process in processes:
+        _kill(process)
+    return len(processes)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple, extra: Tuple = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def render() -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        histograms = {k: ([*v[0]], v[1]) for k, v in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    seen = set()
+    for (name, labels), (counts, total) in sorted(histograms.items()):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS, counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {cumulative}")
+        cumulative += counts[-1]
+        lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency and status per route template
+    (e.g. /course/{course_id}), so ids don't explode label cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router fills in the matched route on the shared scope; mounts
+            # (static files, videos) only extend root_path
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope.get("root_path") or "unmatched"
+            method = scope.get("method", "GET")
+            observe("http_request_duration_seconds", time.perf_counter() - start, route=path, method=method)
+            inc("http_requests_total", route=path, method=method, status=str(status))
+
+
+def instrument_sqlalchemy():
+    """Times every statement on every Engine (local SQLite and the remote mirror)."""
+    global _sqlalchemy_instrumented
+    if not METRICS_ENABLED or _sqlalchemy_instrumented:
+        return
+    _sqlalchemy_instrumented = True
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_metrics_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        words = statement.split(None, 1)
+        verb = words[0].upper() if words else ""
+        if verb not in _SQL_VERBS:
+            verb = "OTHER"
+        observe("db_query_duration_seconds", elapsed, db=conn.engine.dialect.name, statement=verb)
+
+    @event.listens_for(Engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("_metrics_start"):
+            conn.info["_metrics_start"].pop()
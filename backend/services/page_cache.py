@@ -0,0 +1,146 @@
+"""
+Rendered-page cache for the dashboard and player.
+
+Pages are keyed by version counters instead of being re-queried: every
+handler that changes what a page shows calls bump() for the affected course
+(or bump() with no course for library-wide changes like ingestion).
+Progress is per learner, so pages are cached per user and a learner's own
+progress only bumps their version, leaving everyone else's pages cached.
+The ETag is derived from the same versions, so a browser revalidating an
+unchanged page gets a 304 without rendering anything.
+
+Counters live in the page_versions table, so every server process (uvicorn
+--workers) and the job workers see each other's bumps. Each process keeps a
+copy and re-reads the (small) table only when SQLite's data_version says
+another connection has committed since. Rendered bodies are cached per
+process. Writes made without a bump (the Streamlit dashboard, CLI
+sync/restore) only show up after the next bump.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import HTMLResponse
+from ..database import SQLITE_BUSY_TIMEOUT_MS, engine
+
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "256"))
+
+
+def _release_id() -> str:
+    """Changes whenever the code or templates do; identical in every process of one deploy."""
+    digest = hashlib.sha1()
+    root = os.path.dirname(os.path.dirname(__file__))
+    for dirpath, dirnames, filenames in sorted(os.walk(root)):
+        dirnames[:] = sorted(d for d in dirnames if d not in ("__pycache__", "static", "videos"))
+        for name in sorted(filenames):
+            if name.endswith((".py", ".html")):
+                st = os.stat(os.path.join(dirpath, name))
+                digest.update(f"{dirpath}/{name}:{st.st_mtime_ns}:{st.st_size}".encode())
+    return digest.hexdigest()[:8]
+
+
+# Pages rendered by older code must not be revalidated as current
+_RELEASE_ID = _release_id()
+
+_lock = threading.Lock()
+_pages: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (etag, body)
+
+_versions_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_seen_data_version = None
+_current: Dict[str, int] = {}  # scope -> version, as of _seen_data_version
+
+
+def _connection() -> sqlite3.Connection:
+    # Dedicated connection: PRAGMA data_version on it changes only when some
+    # other connection (in any process) commits, which makes it a cheap
+    # "did anything change?" check before re-reading the counters
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(engine.url.database, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+                                isolation_level=None, check_same_thread=False)
+    return _conn
+
+
+def bump(course_id: Optional[int] = None, user_id: Optional[str] = None):
+    """
+    Invalidates pages showing `course_id` (and the dashboard); None invalidates
+    everything. With `user_id`, only that learner's pages are invalidated
+    (their progress changed, the course itself did not).
+    """
+    if user_id is not None:
+        scopes = [f"user:{user_id}"]
+    elif course_id is None:
+        scopes = ["library", "dashboard"]
+    else:
+        scopes = [f"course:{course_id}", "dashboard"]
+    # Written through the engine's pool, so waiting for the write lock never holds up
+    # readers; the commit moves data_version on the dedicated connection
+    with engine.begin() as conn:
+        for scope in scopes:
+            conn.exec_driver_sql(
+                "INSERT INTO page_versions (scope, version) VALUES (?, 1) "
+                "ON CONFLICT (scope) DO UPDATE SET version = version + 1",
+                (scope,),
+            )
+
+
+def _versions(*scopes: str) -> list:
+    global _seen_data_version, _current
+    with _versions_lock:
+        conn = _connection()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != _seen_data_version:
+            _current = dict(conn.execute("SELECT scope, version FROM page_versions"))
+            _seen_data_version = data_version
+        return [_current.get(scope, 0) for scope in scopes]
+
+
+def dashboard_etag(user_id: str) -> str:
+    library, dashboard, user = _versions("library", "dashboard", f"user:{user_id}")
+    return f'"{_RELEASE_ID}-{library}-d{dashboard}-u{user_id}.{user}"'
+
+
+def course_etag(course_id: int, user_id: str, variant: str = "") -> str:
+    library, course, user = _versions("library", f"course:{course_id}", f"user:{user_id}")
+    return f'"{_RELEASE_ID}-{library}-c{course_id}.{course}-u{user_id}.{user}{variant}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+
+def cached_page(request: Request, key: str, etag: str, render: Callable[[], Response]) -> Response:
+    """
+    Serves `key` from the cache while `etag` is current, answering
+    conditional requests with 304. `render` is only called on a miss; any
+    response other than a 200 (redirects, errors) is passed through uncached.
+    """
+    # Pages differ per signed-in learner: never store them in shared caches
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Cookie"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    with _lock:
+        hit = _pages.get(key)
+        if hit and hit[0] == etag:
+            _pages.move_to_end(key)
+            return HTMLResponse(hit[1], headers=headers)
+
+    response = render()
+    if response.status_code != 200:
+        return response
+
+    with _lock:
+        _pages[key] = (etag, response.body)
+        _pages.move_to_end(key)
+        while len(_pages) > PAGE_CACHE_SIZE:
+            _pages.popitem(last=False)
+    return HTMLResponse(response.body, headers=headers)
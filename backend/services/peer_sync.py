@@ -0,0 +1,554 @@
+"""
+Direct instance-to-instance sync over gzip-compressed NDJSON.
+
+One instance exports the rows changed since a changelog id the other
+instance has already applied; the other side imports them with bulk
+upserts. Uses the same table mapping and changelog as the remote SyncService,
+so no MySQL server is needed in the middle.
+
+The peer endpoints only answer requests carrying the shared
+SYNC_PEER_SECRET in an X-Sync-Secret header, and an instance only talks to
+the peer configured in SYNC_PEER_URL.
+
+Stream format, one JSON object per line:
+    {"type": "header", "format": 2, "node": ..., "since": ..., "high_water": ..., "full": bool}
+    {"type": "row", "table": "videos", "uid": "<node id>:7", "data": {...}}
+    {"type": "delete", "table": "videos", "uid": "<node id>:7"}
+    {"type": "end", "rows": N, "deletes": M}
+
+Ids are only unique within one instance, so rows travel under a uid: the
+node id of the instance that created the row (random, kept in the sync
+state) and the row's id there. Foreign keys are sent as uids too. The
+importer maps other instances' uids to local ids through sync_keys and
+gives rows it has not seen before a fresh local id, so rows created
+independently on two instances never overwrite each other. When both
+instances edit the same row, the last import wins.
+
+A row seen for the first time is matched to an existing local row with the
+same natural key (a course's playlist, a video within its course, a
+learner's progress on a video), or, for instances that exchanged rows by id
+before uids existed, to an identical row with the same id. Accounts are not
+exchanged; a learner needs an account with the same username on each
+instance.
+"""
+import hmac
+import json
+import os
+import socket
+import uuid
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from sqlalchemy import DateTime, bindparam, func, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from fastapi import HTTPException, Request
+
+from ..database import SessionLocal
+from ..models import SyncChange, SyncKey
+from . import page_cache
+from .sync_service import SYNC_MAPPING, PEER_LOCAL_TABLES, CHANGE_ID_CHUNK, get_sync_service
+
+NODE_NAME = os.getenv("SYNC_NODE_NAME") or socket.gethostname()
+PEER_TIMEOUT = int(os.getenv("SYNC_PEER_TIMEOUT", "300"))
+
+# Shared by both instances; peer sync is off on an instance without it
+PEER_SECRET = os.getenv("SYNC_PEER_SECRET", "")
+PEER_SECRET_HEADER = "X-Sync-Secret"
+
+# The instance to exchange changes with, e.g. http://other-host:8000
+PEER_URL = os.getenv("SYNC_PEER_URL", "")
+
+# Streams of an older or newer format are refused rather than misapplied
+EXPORT_FORMAT = 2
+
+_TABLES = {name: model_cls.__table__ for model_cls, name in SYNC_MAPPING if name not in PEER_LOCAL_TABLES}
+
+# Columns sent as uids: column -> referenced table
+_REFERENCES = {
+    name: {fk.parent.name: fk.column.table.name for fk in table.foreign_keys}
+    for name, table in _TABLES.items()
+}
+_REFERENCES["questions"]["follow_up_to_id"] = "questions"  # no declared foreign key
+
+# References that are dropped (set to NULL) when the target isn't known here.
+# A row whose other references don't resolve is skipped: its parent was deleted.
+_OPTIONAL_REFERENCES = {("questions", "follow_up_to_id")}
+
+# The same thing created separately on two instances; a row seen for the
+# first time adopts the local row with its natural key
+_NATURAL_KEYS = {
+    "courses": ("playlist_id",),
+    "videos": ("course_id", "youtube_id"),
+    "video_progress": ("user_id", "video_id"),
+}
+
+# Natural keys with a unique index: a local row holding the key under another
+# id is replaced by the imported row
+_UNIQUE_KEYS = {
+    "video_progress": ("user_id", "video_id"),
+}
+
+
+def require_peer(request: Request):
+    """Dependency for the peer endpoints: the caller must present PEER_SECRET."""
+    if not PEER_SECRET:
+        raise HTTPException(status_code=403, detail="Peer sync is disabled (SYNC_PEER_SECRET is not set).")
+    presented = request.headers.get(PEER_SECRET_HEADER, "")
+    if not hmac.compare_digest(presented.encode(), PEER_SECRET.encode()):
+        raise HTTPException(status_code=401, detail="Invalid peer secret")
+
+
+def _peer_headers() -> Dict[str, str]:
+    return {PEER_SECRET_HEADER: PEER_SECRET}
+
+
+def node_id() -> str:
+    """
+    This instance's peer sync identity, kept in the sync state. Created by
+    the startup migration, so all processes of one instance agree on it.
+    """
+    service = get_sync_service()
+    value = service._get_state().get("node_id")
+    if not value:
+        value = uuid.uuid4().hex
+        service._save_state({"node_id": value})
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value)}")
+
+
+def _line(record: Dict) -> bytes:
+    return (json.dumps(record, default=_json_default, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _chunks(values: List, size: int = CHANGE_ID_CHUNK) -> Iterator[List]:
+    for offset in range(0, len(values), size):
+        yield values[offset:offset + size]
+
+
+def _uids(db: Session, name: str, ids: Iterable[Optional[int]], node: str) -> Dict[int, str]:
+    """uid of each local row id: the first one recorded in sync_keys, else one of ours."""
+    ids = list({i for i in ids if i is not None})
+    recorded: Dict[int, str] = {}
+    for chunk in _chunks(ids):
+        stmt = (
+            select(SyncKey.row_id, SyncKey.uid)
+            .where(SyncKey.table_name == name, SyncKey.row_id.in_(chunk))
+            .order_by(SyncKey.id.desc())
+        )
+        for row_id, uid in db.execute(stmt):
+            recorded[row_id] = uid
+    return {i: recorded.get(i) or f"{node}:{i}" for i in ids}
+
+
+def _export_records(db: Session, name: str, rows: List[Dict], node: str) -> List[Dict]:
+    """Row records with the row's id and its references replaced by uids."""
+    refs = _REFERENCES[name]
+    uids: Dict[str, Dict[int, str]] = {name: _uids(db, name, [r["id"] for r in rows], node)}
+    for col, target in refs.items():
+        uids.setdefault(target, {}).update(_uids(db, target, [r[col] for r in rows], node))
+
+    records = []
+    for row in rows:
+        data = {col: value for col, value in row.items() if col != "id"}
+        for col, target in refs.items():
+            if data[col] is not None:
+                data[col] = uids[target][data[col]]
+        records.append({"type": "row", "table": name, "uid": uids[name][row["id"]], "data": data})
+    return records
+
+
+def build_export(since: Optional[int], requester: Optional[str]) -> Tuple[Dict, Iterator[bytes]]:
+    """
+    Returns the stream header and a generator of gzip-compressed NDJSON chunks
+    with every row changed after changelog id `since`. Falls back to a full
+    export when `since` is missing or older than the pruned changelog.
+    The `since` value is recorded as `requester`'s acknowledgement, which lets
+    the changelog be pruned up to that point. A full export carries no deletes,
+    so rows removed here while the peer was out of range stay on the peer.
+    """
+    service = get_sync_service()
+    state = service._get_state()
+    node = node_id()
+    db = SessionLocal()
+    # Right after a restore the changelog is empty; its ids continue from pruned_through
+    high_water = db.execute(select(func.max(SyncChange.id))).scalar() or state.get("pruned_through", 0)
+    full = since is None or since < state.get("pruned_through", 0)
+    header = {"type": "header", "format": EXPORT_FORMAT, "node": NODE_NAME, "since": since,
+              "high_water": high_water, "full": full}
+
+    if requester:
+        # A first (full) pull acks 0, which holds pruning until the peer comes back with its high water
+        acks = state.get("peer_acks", {})
+        acks[requester] = since or 0
+        service._save_state({"peer_acks": acks})
+
+    def _generate():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+        rows = 0
+        deleted: Dict[str, List[int]] = {}
+        try:
+            yield compressor.compress(_line(header))
+            for _, name in SYNC_MAPPING:
+                if name not in _TABLES:
+                    continue
+                table = _TABLES[name]
+                if full:
+                    for chunk in service._stream_rows(db, table):
+                        records = _export_records(db, name, chunk, node)
+                        yield compressor.compress(b"".join(_line(r) for r in records))
+                        rows += len(records)
+                    continue
+
+                changed = service._changed_row_ids(db, name, since, high_water, exclude_origin=requester)
+                for id_chunk in _chunks(changed):
+                    chunk = [dict(r) for r in db.execute(select(table).where(table.c.id.in_(id_chunk))).mappings()]
+                    present = {r["id"] for r in chunk}
+                    deleted.setdefault(name, []).extend(i for i in id_chunk if i not in present)
+                    records = _export_records(db, name, chunk, node)
+                    yield compressor.compress(b"".join(_line(r) for r in records))
+                    rows += len(records)
+
+            # Deletes go children-first, after every upsert. A deleted row's
+            # sync_keys entry outlives it, so the peer gets the uid it knows.
+            deletes = 0
+            for _, name in reversed(SYNC_MAPPING):
+                uids = _uids(db, name, deleted.get(name, []), node)
+                for row_id in deleted.get(name, []):
+                    yield compressor.compress(_line({"type": "delete", "table": name, "uid": uids[row_id]}))
+                    deletes += 1
+            yield compressor.compress(_line({"type": "end", "rows": rows, "deletes": deletes}))
+            yield compressor.flush()
+        finally:
+            db.close()
+
+    return header, _generate()
+
+
+def _iter_records(chunks: Iterable[bytes]) -> Iterator[Dict]:
+    """Decompresses a gzip (or zlib) byte stream and yields one dict per NDJSON line."""
+    decompressor = zlib.decompressobj(47)  # wbits=47: auto-detect gzip/zlib header
+    pending = b""
+    for chunk in chunks:
+        pending += decompressor.decompress(chunk)
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    pending += decompressor.flush()
+    if pending.strip():
+        yield json.loads(pending)
+
+
+def _local_ids(db: Session, name: str, uids: Iterable[Optional[str]], node: str, cache: Dict) -> Dict[str, int]:
+    """
+    Local ids of the uids known here: our own rows that still exist, and
+    rows imported before (sync_keys). Results are kept in `cache`.
+    """
+    known = cache.setdefault(name, {})
+    missing = {u for u in uids if u and u not in known}
+    own: Dict[int, str] = {}
+    for uid in missing:
+        origin, _, row_id = uid.rpartition(":")
+        if origin == node and row_id.isdigit():
+            own[int(row_id)] = uid
+    table = _TABLES[name]
+    for chunk in _chunks(list(own)):
+        for (row_id,) in db.execute(select(table.c.id).where(table.c.id.in_(chunk))):
+            known[own[row_id]] = row_id
+    foreign = [u for u in missing if u not in known and u.rpartition(":")[0] != node]
+    for chunk in _chunks(foreign):
+        stmt = select(SyncKey.uid, SyncKey.row_id).where(SyncKey.table_name == name, SyncKey.uid.in_(chunk))
+        for uid, row_id in db.execute(stmt):
+            known[uid] = row_id
+    return {u: known[u] for u in uids if u in known}
+
+
+def _match_existing(db: Session, name: str, new: List[Tuple[str, Dict]], node: str) -> Dict[str, int]:
+    """
+    Local rows that rows seen for the first time should become: the row with
+    the same natural key, else (peers that synced by id before uids existed)
+    the row with the same id whose values are identical.
+    """
+    table = _TABLES[name]
+    matched: Dict[str, int] = {}
+    key = _NATURAL_KEYS.get(name)
+    if key:
+        wanted: Dict[tuple, List[str]] = {}
+        for uid, data in new:
+            value = tuple(data.get(col) for col in key)
+            if None not in value:
+                wanted.setdefault(value, []).append(uid)
+        columns = [table.c[col] for col in key]
+        for chunk in _chunks(list(wanted)):
+            stmt = select(table.c.id, *columns).where(tuple_(*columns).in_(chunk)).order_by(table.c.id)
+            for row in db.execute(stmt):
+                for uid in wanted.get(tuple(row[1:]), []):
+                    matched.setdefault(uid, row[0])
+
+    legacy = {}
+    for uid, data in new:
+        origin, _, row_id = uid.rpartition(":")
+        if uid not in matched and origin != node and row_id.isdigit():
+            legacy[int(row_id)] = (uid, data)
+    for chunk in _chunks(list(legacy)):
+        for row in db.execute(select(table).where(table.c.id.in_(chunk))).mappings():
+            uid, data = legacy[row["id"]]
+            if all(row[col] == value for col, value in data.items()):
+                matched[uid] = row["id"]
+    return matched
+
+
+def _apply_rows(db: Session, name: str, records: List[Dict], node: str, cache: Dict, counts: Dict) -> List[int]:
+    """Upserts one table's batch of row records; returns the local ids written."""
+    table = _TABLES[name]
+    refs = _REFERENCES[name]
+    for target in set(refs.values()):
+        _local_ids(db, target, [r["data"].get(col) for r in records for col, t in refs.items() if t == target],
+                   node, cache)
+
+    rows: List[Tuple[str, Dict]] = []
+    for record in records:
+        data = record["data"]
+        for col in table.columns:
+            if isinstance(col.type, DateTime) and isinstance(data.get(col.name), str):
+                data[col.name] = datetime.fromisoformat(data[col.name])
+        resolved = True
+        for col, target in refs.items():
+            if data.get(col) is None:
+                continue
+            data[col] = cache[target].get(data[col])
+            if data[col] is None and (name, col) not in _OPTIONAL_REFERENCES:
+                resolved = False
+        if resolved:
+            rows.append((record["uid"], data))
+        else:
+            counts["skipped"] += 1
+
+    local = _local_ids(db, name, [uid for uid, _ in rows], node, cache)
+    known: List[Dict] = []
+    new: List[Tuple[str, Dict]] = []
+    for uid, data in rows:
+        if uid in local:
+            known.append({**data, "id": local[uid]})
+        elif uid.rpartition(":")[0] == node:
+            # Ours, deleted here since; the delete reaches the peer with our next push
+            counts["skipped"] += 1
+        else:
+            new.append((uid, data))
+
+    mapped: Dict[str, int] = {}
+    inserted: List[int] = []
+    if new:
+        mapped = _match_existing(db, name, new, node)
+        key = _NATURAL_KEYS.get(name)
+        fresh: List[Tuple[str, Dict]] = []
+        aliases: List[Tuple[str, tuple]] = []
+        first_by_key: Dict[tuple, str] = {}
+        for uid, data in new:
+            if uid in mapped:
+                known.append({**data, "id": mapped[uid]})
+                continue
+            value = tuple(data.get(col) for col in key) if key else None
+            if value is not None and None not in value:
+                if value in first_by_key:
+                    # Same natural key twice in one batch: one local row
+                    aliases.append((uid, value))
+                    continue
+                first_by_key[value] = uid
+            fresh.append((uid, data))
+        if fresh:
+            inserted = db.execute(
+                table.insert().returning(table.c.id, sort_by_parameter_order=True), [data for _, data in fresh]
+            ).scalars().all()
+            mapped.update((uid, row_id) for (uid, _), row_id in zip(fresh, inserted))
+        for uid, value in aliases:
+            mapped[uid] = mapped[first_by_key[value]]
+        db.execute(SyncKey.__table__.insert(), [
+            {"table_name": name, "row_id": row_id, "uid": uid} for uid, row_id in mapped.items()
+        ])
+        cache[name].update(mapped)
+
+    if known:
+        unique = _UNIQUE_KEYS.get(name)
+        if unique:
+            clash = table.delete().where(
+                table.c.id != bindparam("k_id"), *[table.c[col] == bindparam(f"k_{col}") for col in unique]
+            )
+            db.execute(clash, [{f"k_{col}": row[col] for col in ("id",) + unique} for row in known])
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={c.name: stmt.excluded[c.name] for c in table.columns if not c.primary_key},
+        )
+        db.execute(stmt, known)
+
+    counts["rows"] += len(known) + len(inserted)
+    return [row["id"] for row in known] + inserted
+
+
+def import_changes(chunks: Iterable[bytes], peer: Optional[str] = None) -> Dict:
+    """
+    Applies an export stream to the local database as it arrives, with
+    batched upserts and deletes. Each batch is committed on its own, so
+    local writers only wait for one batch at a time, never for the whole
+    transfer. Changelog entries produced by the import are tagged with the
+    sending node's name so they are not exported straight back to it.
+
+    A stream that breaks off leaves its committed batches applied, and the
+    caller keeps its cursor: the next exchange sends those rows again, and
+    applying them twice changes nothing.
+    """
+    service = get_sync_service()
+    node = node_id()
+    db = SessionLocal()
+    header: Dict = {}
+    origin = peer
+    batch: List[Dict] = []
+    batch_table: Optional[str] = None
+    touched: Dict[str, List[int]] = {}
+    cache: Dict[str, Dict[str, int]] = {}
+    counts = {"rows": 0, "deletes": 0, "skipped": 0, "complete": False}
+    pending = 0  # deletes since the last commit
+    before: Optional[int] = None  # changelog high water when the open transaction began
+
+    def _begin():
+        nonlocal before
+        if before is None:
+            before = db.execute(select(func.max(SyncChange.id))).scalar() or 0
+
+    def _commit():
+        nonlocal before, touched, pending
+        if origin:
+            for name, ids in touched.items():
+                for chunk in _chunks(ids):
+                    db.execute(
+                        SyncChange.__table__.update()
+                        .where(
+                            SyncChange.id > before,
+                            SyncChange.table_name == name,
+                            SyncChange.row_id.in_(chunk),
+                        )
+                        .values(origin=origin)
+                    )
+        db.commit()
+        before, touched, pending = None, {}, 0
+
+    def _flush():
+        nonlocal batch, batch_table
+        if batch:
+            _begin()
+            touched.setdefault(batch_table, []).extend(_apply_rows(db, batch_table, batch, node, cache, counts))
+            _commit()
+        batch, batch_table = [], None
+
+    try:
+        for record in _iter_records(chunks):
+            kind = record.get("type")
+            if kind == "header":
+                header = record
+                if header.get("format") != EXPORT_FORMAT:
+                    raise ValueError(
+                        f"Peer sends export format {header.get('format', 1)}, this instance reads "
+                        f"{EXPORT_FORMAT}; update both instances to the same version."
+                    )
+                origin = header.get("node") or peer
+            elif kind == "row":
+                name = record["table"]
+                if name not in _TABLES:
+                    continue
+                if batch_table != name or len(batch) >= service.batch_size:
+                    _flush()
+                    batch_table = name
+                batch.append(record)
+            elif kind == "delete":
+                _flush()
+                name = record["table"]
+                if name in _TABLES:
+                    _begin()
+                    row_id = _local_ids(db, name, [record["uid"]], node, cache).get(record["uid"])
+                    if row_id is not None:
+                        table = _TABLES[name]
+                        db.execute(table.delete().where(table.c.id == row_id))
+                        touched.setdefault(name, []).append(row_id)
+                        counts["deletes"] += 1
+                        pending += 1
+                        if pending >= service.batch_size:
+                            _commit()
+            elif kind == "end":
+                counts["complete"] = True
+        _flush()
+        _commit()
+
+        if not counts["complete"]:
+            return {"status": "error", "message": "Export stream ended early; the rest follows with the next exchange.",
+                    **counts}
+        return {"status": "success", "high_water": header.get("high_water"), "node": origin, **counts}
+    except Exception as e:
+        db.rollback()
+        return {"status": "error", "message": str(e), **counts}
+    finally:
+        db.close()
+        if counts["rows"] or counts["deletes"]:
+            page_cache.bump()
+
+
+def _peer_state(peer_url: str) -> Dict:
+    return get_sync_service()._get_state().get("peers", {}).get(peer_url, {})
+
+
+def _save_peer_state(peer_url: str, **values):
+    service = get_sync_service()
+    peers = service._get_state().get("peers", {})
+    peers.setdefault(peer_url, {}).update(values)
+    service._save_state({"peers": peers})
+
+
+def pull_from_peer(peer_url: str) -> Dict:
+    """Imports everything the peer changed since our last pull from it."""
+    peer_url = peer_url.rstrip("/")
+    params = {"peer": NODE_NAME}
+    since = _peer_state(peer_url).get("pulled")
+    if since is not None:
+        params["since"] = since
+
+    with requests.get(f"{peer_url}/api/sync/peer/export", params=params, headers=_peer_headers(),
+                      stream=True, timeout=PEER_TIMEOUT) as resp:
+        resp.raise_for_status()
+        result = import_changes(resp.raw.stream(65536, decode_content=False))
+
+    if result["status"] == "success":
+        _save_peer_state(peer_url, pulled=result["high_water"], node=result["node"],
+                         last_pull=datetime.now().isoformat())
+    return result
+
+
+def push_to_peer(peer_url: str) -> Dict:
+    """Sends the peer everything we changed since our last successful push to it."""
+    peer_url = peer_url.rstrip("/")
+    info = requests.get(f"{peer_url}/api/sync/peer/info", headers=_peer_headers(), timeout=PEER_TIMEOUT)
+    info.raise_for_status()
+    peer_node = info.json()["node"]
+
+    header, body = build_export(_peer_state(peer_url).get("pushed"), requester=peer_node)
+    resp = requests.post(
+        f"{peer_url}/api/sync/peer/import",
+        params={"peer": NODE_NAME},
+        data=body,
+        headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip", **_peer_headers()},
+        timeout=PEER_TIMEOUT,
+    )
+    resp.raise_for_status()
+    result = resp.json()
+    if result.get("status") == "success":
+        _save_peer_state(peer_url, pushed=header["high_water"], node=peer_node,
+                         last_push=datetime.now().isoformat())
+    return result
@@ -0,0 +1,243 @@
+"""
+Opt-in profiling of individual requests in a running server.
+
+A request is profiled when it carries the PROFILE_TOKEN, either as an
+`X-Profile-Token` header or a `_profile=<token>` query parameter, or when it
+is picked by PROFILE_SAMPLE_RATE (0.01 = one request in a hundred). Without a
+token and with the rate at 0, which is the default, the only cost per request
+is a contextvar lookup.
+
+Route handlers run in a threadpool, out of reach of a profiler started in
+middleware, so the middleware only marks the request and ProfiledRoute
+profiles the endpoint call itself, in whatever thread it runs. pyinstrument
+is used when installed (HTML flame view); otherwise cProfile, saved as a
+text report sorted by cumulative time.
+
+Profiles go to PROFILE_DIR (default `profiles/`); only the newest
+PROFILE_KEEP (default 50) are kept. They are listed on /admin.
+"""
+import contextvars
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+PROFILE_HEADER = "x-profile-token"
+PROFILE_QUERY_PARAM = "_profile"
+PROFILE_SUFFIXES = (".html", ".txt")
+
+# Set by the middleware for requests that should be profiled; holds the
+# endpoint's report once ProfiledRoute has run
+_current: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("profile_request", default=None)
+
+# One cProfile session at a time (on Python 3.12+ it is process-wide); a
+# request marked while another is being profiled just runs unprofiled
+_cprofile_lock = threading.Lock()
+
+
+def _token_matches(scope) -> bool:
+    if not PROFILE_TOKEN:
+        return False
+    supplied = None
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER.encode():
+            supplied = value.decode("latin-1")
+            break
+    if supplied is None and scope.get("query_string"):
+        values = parse_qs(scope["query_string"].decode("latin-1")).get(PROFILE_QUERY_PARAM)
+        supplied = values[0] if values else None
+    return supplied is not None and hmac.compare_digest(supplied, PROFILE_TOKEN)
+
+
+def _should_profile(scope) -> Optional[str]:
+    """'token', 'sampled' or None."""
+    if _token_matches(scope):
+        return "token"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+class _Session:
+    """One profiler run around an endpoint call."""
+
+    def __init__(self, is_async: bool):
+        self.profiler = None
+        self.cprofile = None
+        if Profiler is not None:
+            # For coroutines, only sample while this request's task is running
+            self.profiler = Profiler(interval=0.001, async_mode="enabled" if is_async else "disabled")
+            self.profiler.start()
+        elif _cprofile_lock.acquire(blocking=False):
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def stop(self, holder: Dict):
+        if self.profiler is not None:
+            self.profiler.stop()
+            holder["report"] = self.profiler.output_html()
+            holder["format"] = "html"
+        elif self.cprofile is not None:
+            self.cprofile.disable()
+            _cprofile_lock.release()
+            out = io.StringIO()
+            pstats.Stats(self.cprofile, stream=out).sort_stats("cumulative").print_stats(60)
+            holder["report"] = out.getvalue()
+            holder["format"] = "txt"
+
+
+def _wrap_endpoint(call):
+    """Profiles `call` when the current request is marked; otherwise calls it directly."""
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def wrapper(*args, **kwargs):
+            holder = _current.get()
+            if holder is None or "report" in holder:
+                return await call(*args, **kwargs)
+            session = _Session(is_async=True)
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                session.stop(holder)
+        return wrapper
+
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        holder = _current.get()
+        if holder is None or "report" in holder:
+            return call(*args, **kwargs)
+        session = _Session(is_async=False)
+        try:
+            return call(*args, **kwargs)
+        finally:
+            session.stop(holder)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint can be profiled per request; use as an APIRouter route_class."""
+
+    def get_route_handler(self):
+        self.dependant.call = _wrap_endpoint(self.dependant.call)
+        return super().get_route_handler()
+
+
+def _slug(path: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:60] or "root"
+
+
+def _rotate():
+    for name in [p["name"] for p in list_profiles()][PROFILE_KEEP:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except FileNotFoundError:
+            pass
+
+
+def _save(holder: Dict) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    name = (f"{stamp}-{holder['method']}-{_slug(holder['path'])}"
+            f"-{holder['status']}-{holder['elapsed_ms']}ms-{holder['trigger']}.{holder['format']}")
+    tmp = os.path.join(PROFILE_DIR, name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(holder["report"])
+    os.replace(tmp, os.path.join(PROFILE_DIR, name))
+    _rotate()
+    print(f"[PROFILE] {holder['method']} {holder['path']} {holder['elapsed_ms']}ms -> {name}", flush=True)
+    return name
+
+
+def list_profiles() -> List[Dict]:
+    """Stored profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if not name.endswith(PROFILE_SUFFIXES):
+            continue
+        st = os.stat(os.path.join(PROFILE_DIR, name))
+        parts = name.rsplit(".", 1)[0].split("-")
+        profiles.append({
+            "name": name,
+            "bytes": st.st_size,
+            "created_at": datetime.fromtimestamp(st.st_mtime).isoformat(timespec="seconds"),
+            "method": parts[3] if len(parts) > 3 else "",
+            "path": parts[4] if len(parts) > 4 else "",
+            "status": parts[5] if len(parts) > 5 else "",
+            "elapsed": parts[6] if len(parts) > 6 else "",
+            "trigger": parts[7] if len(parts) > 7 else "",
+        })
+    profiles.sort(key=lambda p: p["name"], reverse=True)
+    return profiles
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Full path of a stored profile, or None for unknown names (no path traversal)."""
+    if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIXES):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware deciding which requests get profiled. The endpoint
+    report is written to PROFILE_DIR once the response has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = _should_profile(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        holder = {"method": scope.get("method", "GET"), "path": scope["path"], "trigger": trigger, "status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                holder["status"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        token = _current.set(holder)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            holder["elapsed_ms"] = int((time.perf_counter() - start) * 1000)
+            # Nothing to save when the request didn't reach a ProfiledRoute (static files, 404s)
+            if "report" in holder:
+                try:
+                    await run_in_threadpool(_save, holder)
+                except OSError as e:
+                    print(f"[PROFILE] Failed to save profile: {e}", flush=True)
@@ -0,0 +1,263 @@
+"""
+Consistent, compressed snapshots of learning.db.
+
+Uses the SQLite online backup API, which copies the database page by page
+and restarts if a writer commits mid-copy, so the result is never a torn
+file. The copy is taken in small steps so writers can get in between them,
+then compressed (zstd if the `zstandard` package is installed, gzip
+otherwise) and old snapshots are rotated out.
+
+Every server process (uvicorn --workers) runs the periodic scheduler. A
+lock file in SNAPSHOT_DIR lets one of them in at a time, and the unchanged
+check and the spacing between runs go by what is on disk, not by one
+process's memory, so N processes still take one snapshot per interval.
+
+CLI:
+    python -m backend.services.snapshots create
+    python -m backend.services.snapshots list
+"""
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, one scheduler per host is assumed
+    fcntl = None
+
+from ..database import engine
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "backups")
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "24"))
+
+# Periodic snapshots (0 disables). Runs are skipped when the database is unchanged.
+SNAPSHOT_INTERVAL_MINUTES = float(os.getenv("SNAPSHOT_INTERVAL_MINUTES", "0"))
+
+# Pages copied per backup step; between steps the source is unlocked for writers
+SNAPSHOT_STEP_PAGES = int(os.getenv("SNAPSHOT_STEP_PAGES", "1024"))
+
+SNAPSHOT_PREFIX = "learning-"
+SNAPSHOT_SUFFIXES = (".db.zst", ".db.gz")
+
+# Source signature of the newest snapshot, shared by every process writing to SNAPSHOT_DIR
+SIGNATURE_FILE = ".last-source.json"
+# Held by the process whose scheduler is taking a snapshot
+SCHEDULER_LOCK_FILE = ".scheduler.lock"
+
+_snapshot_lock = threading.Lock()
+_scheduler_started = False
+
+
+def _source_path() -> str:
+    return os.path.abspath(engine.url.database)
+
+
+def _source_signature(path: str):
+    """(size, mtime) of the db file and its WAL; unchanged means nothing to snapshot."""
+    signature = []
+    for p in (path, path + "-wal"):
+        try:
+            st = os.stat(p)
+            signature.append((st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _last_source_signature():
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, SIGNATURE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_source_signature(signature):
+    # Write-then-rename, so a concurrent reader never sees a half-written file
+    path = os.path.join(SNAPSHOT_DIR, SIGNATURE_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(signature, f)
+    os.replace(tmp_path, path)
+
+
+def _compress(src: str, dest: str) -> str:
+    if zstandard is not None:
+        with open(src, "rb") as fin, open(dest, "wb") as fout:
+            zstandard.ZstdCompressor(level=3, threads=-1).copy_stream(fin, fout)
+        return "zstd"
+    with open(src, "rb") as fin, gzip.open(dest, "wb", compresslevel=6) as fout:
+        shutil.copyfileobj(fin, fout, 1024 * 1024)
+    return "gzip"
+
+
+def _publish(part_path: str, base: str, suffix: str) -> str:
+    """
+    Moves a finished snapshot to base + suffix without ever replacing an
+    existing one: os.link fails if the name is taken, so a counter is added.
+    """
+    candidate, n = base + suffix, 1
+    while True:
+        try:
+            os.link(part_path, candidate)
+            return candidate
+        except FileExistsError:
+            candidate = f"{base}-{n}{suffix}"
+            n += 1
+
+
+def _snapshot_info(path: str) -> Dict:
+    st = os.stat(path)
+    return {
+        "name": os.path.basename(path),
+        "path": path,
+        "bytes": st.st_size,
+        "created_at": datetime.fromtimestamp(st.st_mtime).isoformat(),
+    }
+
+
+def list_snapshots() -> List[Dict]:
+    """Snapshots in SNAPSHOT_DIR, newest first."""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    names = [
+        n for n in os.listdir(SNAPSHOT_DIR)
+        if n.startswith(SNAPSHOT_PREFIX) and n.endswith(SNAPSHOT_SUFFIXES)
+    ]
+    # Timestamped names sort chronologically
+    return [_snapshot_info(os.path.join(SNAPSHOT_DIR, n)) for n in sorted(names, reverse=True)]
+
+
+def prune_snapshots(keep: int = SNAPSHOT_KEEP) -> List[str]:
+    """Deletes all but the newest `keep` snapshots; returns the removed names."""
+    removed = []
+    for snap in list_snapshots()[keep:]:
+        os.remove(snap["path"])
+        removed.append(snap["name"])
+    return removed
+
+
+def create_snapshot(skip_unchanged: bool = False) -> Dict:
+    """
+    Writes a compressed snapshot of the live database and applies retention.
+    With skip_unchanged, returns status "skipped" if the database file hasn't
+    changed since the last snapshot, whichever process took it.
+    """
+    if not _snapshot_lock.acquire(blocking=False):
+        return {"status": "skipped", "message": "A snapshot is already in progress."}
+
+    try:
+        source = _source_path()
+        # As JSON sees it, so it compares equal to the saved one
+        signature = json.loads(json.dumps(_source_signature(source)))
+        if skip_unchanged and signature == _last_source_signature():
+            return {"status": "skipped", "message": "Database unchanged since the last snapshot."}
+
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        # Microseconds keep names apart within a second; the pid keeps the
+        # work files of concurrent processes (CLI and server) apart
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        raw_path = os.path.join(SNAPSHOT_DIR, f".{SNAPSHOT_PREFIX}{stamp}-{os.getpid()}.db.tmp")
+        suffix = ".db.zst" if zstandard is not None else ".db.gz"
+        base = os.path.join(SNAPSHOT_DIR, f"{SNAPSHOT_PREFIX}{stamp}")
+        part_path = raw_path[:-len(".db.tmp")] + suffix + ".part"
+
+        start = time.time()
+        src = sqlite3.connect(source, timeout=30)
+        dest = sqlite3.connect(raw_path)
+        try:
+            src.backup(dest, pages=SNAPSHOT_STEP_PAGES, sleep=0.005)
+        finally:
+            dest.close()
+            src.close()
+        copied = time.time()
+
+        try:
+            codec = _compress(raw_path, part_path)
+            final_path = _publish(part_path, base, suffix)
+        finally:
+            for leftover in (raw_path, part_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+        _save_source_signature(signature)
+        removed = prune_snapshots()
+        info = _snapshot_info(final_path)
+        print(f"[SNAPSHOT] {info['name']} ({info['bytes']} bytes, {codec}) in {time.time() - start:.2f}s", flush=True)
+        return {
+            "status": "success",
+            **info,
+            "codec": codec,
+            "source_bytes": os.path.getsize(source),
+            "copy_seconds": round(copied - start, 3),
+            "total_seconds": round(time.time() - start, 3),
+            "pruned": removed,
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    finally:
+        _snapshot_lock.release()
+
+
+def scheduled_snapshot(interval_seconds: float) -> Dict:
+    """
+    One scheduler tick. Skipped while another process's tick holds the lock,
+    and when any process took a snapshot within the last half interval, so
+    the schedulers of several processes share one snapshot per interval.
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, SCHEDULER_LOCK_FILE), "a") as lock:
+        if fcntl is not None:
+            try:
+                # Released when the file is closed, or when the process dies
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return {"status": "skipped", "message": "Another process is taking the snapshot."}
+        newest = list_snapshots()[:1]
+        if newest and time.time() - os.stat(newest[0]["path"]).st_mtime < interval_seconds / 2:
+            return {"status": "skipped", "message": "A snapshot was taken recently."}
+        return create_snapshot(skip_unchanged=True)
+
+
+def _scheduler_loop(interval_seconds: float):
+    while True:
+        time.sleep(interval_seconds)
+        result = scheduled_snapshot(interval_seconds)
+        if result["status"] == "error":
+            print(f"[SNAPSHOT] Scheduled snapshot failed: {result['message']}", flush=True)
+
+
+def start_snapshot_scheduler():
+    """Starts the periodic snapshot thread once per process (no-op if disabled)."""
+    global _scheduler_started
+    if _scheduler_started or SNAPSHOT_INTERVAL_MINUTES <= 0:
+        return
+    _scheduler_started = True
+    threading.Thread(
+        target=_scheduler_loop, args=(SNAPSHOT_INTERVAL_MINUTES * 60,), name="snapshot-scheduler", daemon=True
+    ).start()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create or list learning.db snapshots")
+    parser.add_argument("command", choices=["create", "list"])
+    args = parser.parse_args()
+
+    if args.command == "create":
+        print(json.dumps(create_snapshot(), indent=2))
+    else:
+        for snap in list_snapshots():
+            print(f"{snap['created_at']}  {snap['bytes']:>12}  {snap['name']}")
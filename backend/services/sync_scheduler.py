@@ -0,0 +1,162 @@
+"""
+Background sync worker.
+
+Sync runs off the request path: triggers get a job ID back immediately and
+poll /api/sync/jobs/{id}. Runs are "sync" jobs in the durable jobs table,
+on their own queue, so every server process (uvicorn --workers) and
+`python -m backend.services.jobs worker` share them: one dedupe key covers
+every mode, so at most one sync, verify, repair or restore is queued or
+running at a time, and any process can report on it. A scheduler thread
+queues a regular sync every SYNC_INTERVAL_MINUTES (0 disables it).
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import select
+
+from ..database import SessionLocal, engine
+from ..models import Job
+from . import jobs, page_cache
+from .sync_service import get_sync_service
+
+SYNC_INTERVAL_MINUTES = float(os.getenv("SYNC_INTERVAL_MINUTES", "360"))
+
+# Every mode shares it: a restore must not run alongside a sync either
+SYNC_DEDUPE_KEY = "sync"
+
+# How often a running job copies its per-table progress onto the job row
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+_scheduler_started = False
+
+
+def start_sync_job(mode: str = "sync", force: bool = False, reset: bool = False, trigger: str = "manual") -> Dict:
+    """
+    Queues a sync/verify/repair/restore run.
+    Returns {"status": "started"|"already_running", "job_id": ...}.
+    """
+    job_id, created = jobs.enqueue(
+        "sync", {"mode": mode, "force": force, "reset": reset, "trigger": trigger},
+        dedupe_key=SYNC_DEDUPE_KEY, max_attempts=1,
+    )
+    return {"status": "started" if created else "already_running", "job_id": job_id}
+
+
+@jobs.handler("sync", queue="sync")
+def _sync_job(ctx: jobs.JobContext, payload: Dict):
+    service = get_sync_service()
+    mode = payload.get("mode", "sync")
+    service.reset_progress()
+
+    # The service keeps progress in this process's memory; the job row makes it visible to all
+    done = threading.Event()
+
+    def _report():
+        while not done.wait(PROGRESS_INTERVAL_SECONDS):
+            ctx.progress(detail={"tables": service.get_progress()}, force=True)
+
+    reporter = threading.Thread(target=_report, name=f"sync-progress-{ctx.job_id}", daemon=True)
+    reporter.start()
+    try:
+        if mode == "sync":
+            result = service.run_sync(force=payload.get("force", False), reset=payload.get("reset", False))
+        elif mode == "restore":
+            result = service.restore()
+            page_cache.bump()
+        else:
+            result = service.reconcile(repair=(mode == "repair"))
+    except Exception as e:
+        result = {"status": "error", "message": str(e)}
+    finally:
+        done.set()
+        reporter.join()
+    print(f"[SYNC] Job {ctx.job_id} ({mode}) finished: {result.get('status', 'error')}", flush=True)
+    # Freeze this run's progress; the shared service moves on to the next job
+    return {"result": result, "tables": service.get_progress()}
+
+
+def get_job(job_id: int) -> Optional[Dict]:
+    """Job record plus per-table progress, throughput and ETA."""
+    job = jobs.get_job(job_id)
+    if not job or job["kind"] != "sync":
+        return None
+
+    if job["status"] == "done":
+        result = job["result"]["result"]
+        status = result.get("status", "error")
+        progress = job["result"]["tables"]
+    elif job["status"] == "failed":
+        result = {"status": "error", "message": job["error"]}
+        status, progress = "error", (job["detail"] or {}).get("tables", {})
+    else:
+        result, status = None, job["status"]
+        progress = (job["detail"] or {}).get("tables", {})
+    rows_done = sum(t["rows"] for t in progress.values())
+    expected = [t.get("expected") for t in progress.values()]
+    rows_total = sum(expected) if expected and None not in expected else None
+
+    elapsed = 0.0
+    if job["started_at"]:
+        end = datetime.fromisoformat(job["finished_at"]) if job["finished_at"] else datetime.utcnow()
+        elapsed = (end - datetime.fromisoformat(job["started_at"])).total_seconds()
+    rate = rows_done / elapsed if elapsed > 0 else 0.0
+    eta = None
+    if status == "running" and rows_total is not None and rate > 0:
+        eta = max(rows_total - rows_done, 0) / rate
+
+    return {
+        "id": job["id"],
+        **job["payload"],
+        "status": status,
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "result": result,
+        "elapsed_seconds": round(elapsed, 1),
+        "rows_done": rows_done,
+        "rows_total": rows_total,
+        "rows_per_second": round(rate, 1),
+        "eta_seconds": round(eta, 1) if eta is not None else None,
+        "tables": progress,
+    }
+
+
+def current_job_id() -> Optional[int]:
+    """The queued or running sync job, in any process."""
+    with engine.connect() as conn:
+        return conn.execute(
+            select(Job.id).where(Job.dedupe_key == SYNC_DEDUPE_KEY, Job.status.in_(jobs.ACTIVE_STATUSES))
+        ).scalar()
+
+
+def _scheduler_loop(interval_seconds: float):
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            # Non-forced: SyncService.can_sync still enforces the 6 hour spacing,
+            # so the schedulers of several processes start one run between them
+            outcome = start_sync_job(trigger="scheduled")
+            if outcome["status"] == "already_running":
+                print("[SYNC] Scheduled run skipped, a job is already running.", flush=True)
+            # Keeps the changelog bounded even when the remote sync is skipped or unconfigured
+            db = SessionLocal()
+            try:
+                get_sync_service().prune_changelog(db)
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"[SYNC] Scheduler error: {e}", flush=True)
+
+
+def start_scheduler():
+    """Starts the periodic sync thread once per process (no-op if disabled)."""
+    global _scheduler_started
+    if _scheduler_started or SYNC_INTERVAL_MINUTES <= 0:
+        return
+    _scheduler_started = True
+    threading.Thread(
+        target=_scheduler_loop, args=(SYNC_INTERVAL_MINUTES * 60,), name="sync-scheduler", daemon=True
+    ).start()
@@ -1,20 +1,133 @@
 import os
 import json
-import hashlib
+import sqlite3
+import zlib
+import queue
+import threading
+import time
+import math
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
-from sqlalchemy import create_engine, inspect, text, MetaData, Table, Column, ForeignKey
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from sqlalchemy import create_engine, inspect, text, func, select, cast, literal, or_, MetaData, Table, Column, ForeignKey
+from sqlalchemy import Integer, Float, Boolean, DateTime, String
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import Session
-from ..database import SessionLocal
-from ..models import Base, Course, Video, Question, Answer, VideoProgress, Transcript
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateTable, CreateIndex
+from ..database import SQLITE_BUSY_TIMEOUT_MS, SessionLocal, engine as local_engine
+from ..models import (Base, User, Course, Video, Question, ExamAttempt, Answer, VideoProgress, Transcript, SyncChange,
+                      SyncKey, PageVersion, Job)
 
 # Path to store sync state
-SYNC_STATE_FILE = "backend/sync_state.json"
+SYNC_STATE_FILE = os.getenv("SYNC_STATE_FILE", "backend/sync_state.json")
 REMOTE_PREFIX = "learning_system_"
 
+# Rows per multi-row upsert statement sent to the remote
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "1000"))
+
+# Concurrent table/partition workers, each with its own remote connection
+SYNC_PARALLELISM = int(os.getenv("SYNC_PARALLELISM", "4"))
+
+# Tables with more rows than this are split into id-range partitions
+SYNC_PARTITION_ROWS = int(os.getenv("SYNC_PARTITION_ROWS", "200000"))
+
+# Remote pool tuning: recycle before MySQL's wait_timeout drops idle connections
+SYNC_POOL_RECYCLE = int(os.getenv("SYNC_POOL_RECYCLE", "1800"))
+SYNC_CONNECT_TIMEOUT = int(os.getenv("SYNC_CONNECT_TIMEOUT", "5"))
+
+# How often the background monitor refreshes the cached remote health
+SYNC_HEALTH_INTERVAL = float(os.getenv("SYNC_HEALTH_INTERVAL", "60"))
+
+# Changelog entries kept for a consumer that has fallen behind (e.g. a remote
+# that has never synced); past this the log is dropped and it gets a full transfer
+SYNC_CHANGELOG_MAX_ROWS = int(os.getenv("SYNC_CHANGELOG_MAX_ROWS", "500000"))
+
+# Remote dialects with a native multi-row upsert; others use the row-by-row path
+UPSERT_DIALECTS = ("mysql", "sqlite", "postgresql")
+
+# Map Models to their original table names explicitly to find the prefixed version.
+# Order matters: parents before children so remote FKs are satisfied.
+# Accounts hold password hashes and stay local: they are neither mirrored nor
+# sent to peers (other tables refer to learners by username, not by id).
+SYNC_MAPPING = [
+    (Course, "courses"),
+    (Video, "videos"),
+    (Transcript, "transcripts"),
+    (Question, "questions"),
+    (ExamAttempt, "exam_attempts"),
+    (Answer, "answers"),
+    (VideoProgress, "video_progress"),
+    (SyncKey, "sync_keys"),
+]
+
+# Peer sync's id map; mirrored so a restore keeps it, but never exchanged with peers
+PEER_LOCAL_TABLES = ("sync_keys",)
+
+# Mirrored by earlier versions; dropped from the remote on the next sync
+RETIRED_REMOTE_TABLES = ("users",)
+
+# Max ids per IN (...) clause when fetching or deleting changed rows
+CHANGE_ID_CHUNK = 500
+
+# Max id ranges OR-ed into a single checksum query
+RANGE_QUERY_CHUNK = 200
+
+
+def _sqlite_crc32(value):
+    return zlib.crc32(value.encode("utf-8")) if value is not None else None
+
+
+def install_change_tracking(bind):
+    """
+    Creates SQLite triggers that append every INSERT/UPDATE/DELETE on a synced
+    table to sync_changelog. Idempotent; called from the startup migration.
+    `bind` is an Engine, or a Connection whose transaction the triggers join.
+    """
+    if bind.dialect.name != "sqlite":
+        return
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            install_change_tracking(conn)
+        return
+    changelog = SyncChange.__tablename__
+    for _, table in SYNC_MAPPING:
+        for event, op, ref in (("INSERT", "I", "NEW"), ("UPDATE", "U", "NEW"), ("DELETE", "D", "OLD")):
+            bind.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS trg_sync_{table}_{op.lower()} "
+                f"AFTER {event} ON {table} BEGIN "
+                f"INSERT INTO {changelog} (table_name, row_id, op, changed_at) "
+                f"VALUES ('{table}', {ref}.id, '{op}', CURRENT_TIMESTAMP); END"
+            ))
+        if table not in PEER_LOCAL_TABLES:
+            # A deleted row keeps its peer uid so the delete can be sent; SQLite
+            # may hand its id to a new row, which must not inherit that uid
+            bind.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS trg_sync_{table}_k "
+                f"AFTER INSERT ON {table} BEGIN "
+                f"DELETE FROM {SyncKey.__tablename__} WHERE table_name = '{table}' AND row_id = NEW.id; END"
+            ))
+
 class SyncService:
-    def __init__(self, remote_url: Optional[str] = None):
+    def __init__(self, remote_url: Optional[str] = None, batch_size: Optional[int] = None,
+                 parallelism: Optional[int] = None, partition_rows: Optional[int] = None):
         self.remote_url = remote_url
+        self.batch_size = batch_size or SYNC_BATCH_SIZE
+        self.parallelism = max(1, parallelism or SYNC_PARALLELISM)
+        self.partition_rows = partition_rows or SYNC_PARTITION_ROWS
+
+        # Per-table / per-partition progress of the current run
+        self.progress: Dict[str, Dict] = {}
+        self._progress_lock = threading.Lock()
+
+        # Cached remote reachability, refreshed by the health monitor
+        self.health: Dict[str, Any] = {"reachable": None, "error": None, "checked_at": None}
+        self._health_thread: Optional[threading.Thread] = None
+
+        # sync_state.json cache, re-read only when the file's mtime changes
+        self._state_cache: Optional[Dict] = None
+        self._state_mtime: Optional[float] = None
         
         # If no explicit URL, try to build from env vars
         if not self.remote_url:
@@ -33,7 +146,19 @@ class SyncService:
         
         if self.remote_url:
             try:
-                self.remote_engine = create_engine(self.remote_url)
+                # One pooled connection per worker, plus the planner's.
+                # pre_ping drops connections the server closed while idle.
+                connect_args = {}
+                if make_url(self.remote_url).get_backend_name() == "mysql":
+                    connect_args["connect_timeout"] = SYNC_CONNECT_TIMEOUT
+                self.remote_engine = create_engine(
+                    self.remote_url,
+                    pool_size=self.parallelism + 1,
+                    max_overflow=2,
+                    pool_pre_ping=True,
+                    pool_recycle=SYNC_POOL_RECYCLE,
+                    connect_args=connect_args,
+                )
                 self._prepare_remote_metadata()
             except Exception as e:
                 print(f"Sync Init Error: {e}")
@@ -47,7 +172,11 @@ class SyncService:
         
         # We must process in dependency order or just simple iteration?
         # Metadata.sorted_tables gives dependency order.
+        # Local-only tables (e.g. the changelog) are never mirrored.
+        synced_names = {name for _, name in SYNC_MAPPING}
         for original_table in Base.metadata.sorted_tables:
+            if original_table.name not in synced_names:
+                continue
             new_name = f"{REMOTE_PREFIX}{original_table.name}"
             
             new_columns = []
@@ -79,27 +208,74 @@ class SyncService:
             Table(new_name, self.remote_metadata, *new_columns)
 
     def _get_state(self) -> Dict:
-        if os.path.exists(SYNC_STATE_FILE):
+        try:
+            mtime = os.stat(SYNC_STATE_FILE).st_mtime
+        except OSError:
+            return {"last_sync": None}
+        if self._state_cache is None or mtime != self._state_mtime:
             try:
                 with open(SYNC_STATE_FILE, 'r') as f:
-                    return json.load(f)
+                    self._state_cache = json.load(f)
+                self._state_mtime = mtime
             except:
-                pass
-        return {"last_sync": None}
+                return {"last_sync": None}
+        return dict(self._state_cache)
 
     def _save_state(self, state: Dict):
-        with open(SYNC_STATE_FILE, 'w') as f:
-            json.dump(state, f)
+        # Merge so keys owned by other features (e.g. watermarks) survive
+        merged = self._get_state()
+        merged.update(state)
+        # Write-then-rename, so a concurrent reader never sees a half-written file
+        tmp_path = f"{SYNC_STATE_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(merged, f)
+        os.replace(tmp_path, SYNC_STATE_FILE)
+        self._state_cache = None
+
+    def _remote_fingerprint(self) -> str:
+        """Identifies the remote without the password, so watermarks reset if it changes."""
+        return make_url(self.remote_url).render_as_string(hide_password=True)
 
-    def can_sync(self, force: bool = False) -> Dict:
+    def refresh_health(self) -> Dict:
+        """Live SELECT 1 against the remote; updates and returns the cached health."""
+        if not self.remote_engine:
+            health = {"reachable": False, "error": "No REMOTE_DB_URL configured.", "checked_at": datetime.now().isoformat()}
+        else:
+            try:
+                with self.remote_engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                health = {"reachable": True, "error": None, "checked_at": datetime.now().isoformat()}
+            except Exception as e:
+                health = {"reachable": False, "error": str(e), "checked_at": datetime.now().isoformat()}
+        self.health = health
+        return health
+
+    def start_health_monitor(self, interval: float = SYNC_HEALTH_INTERVAL):
+        """Refreshes the cached health on a daemon thread so status calls never block on the remote."""
+        if self._health_thread or not self.remote_engine:
+            return
+
+        def _loop():
+            while True:
+                self.refresh_health()
+                time.sleep(interval)
+
+        self._health_thread = threading.Thread(target=_loop, name="sync-health", daemon=True)
+        self._health_thread.start()
+
+    def can_sync(self, force: bool = False, live: bool = False) -> Dict:
+        """
+        live=False answers from the cached health (status polling); live=True
+        checks the remote first (before actually syncing).
+        """
         if not self.remote_url:
             return {"allowed": False, "reason": "No REMOTE_DB_URL configured."}
 
-        try:
-            with self.remote_engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
-        except Exception as e:
-            return {"allowed": False, "reason": f"Remote DB unreachable: {str(e)}"}
+        health = self.refresh_health() if live else self.health
+        if health["reachable"] is None:
+            return {"allowed": False, "reason": "Remote health check pending."}
+        if not health["reachable"]:
+            return {"allowed": False, "reason": f"Remote DB unreachable: {health['error']}"}
 
         if force:
             return {"allowed": True, "reason": "Force sync requested."}
@@ -113,30 +289,282 @@ class SyncService:
         
         return {"allowed": True, "reason": "Ready to sync."}
 
-    def _calculate_checksum(self, row: Base) -> str:
-        data_str = ""
-        inst = inspect(row)
-        for attr in inst.mapper.column_attrs:
-            val = getattr(row, attr.key)
-            data_str += str(val)
-        return hashlib.sha256(data_str.encode('utf-8')).hexdigest()
-
-    def _calculate_row_checksum(self, row_dict: Dict, table: Table) -> str:
-        """Calc checksum from a dictionary (for remote verification)."""
-        # We need to sort by column order to match internal logic
-        data_str = ""
-        # This naive implementation assumes keys match column names and order might vary
-        # Better to rely on sorted columns
-        # For simplicity, we assume we just check integrity by attempting update
-        # But to be consistent with _calculate_checksum(Base), we need strict ordering.
-        # Let's Skip CHECKING remote checksum for now and rely on Upsert (Update if PK exists)
-        return ""
-
-    def _sync_table_core(self, model_class, remote_table_name, local_db: Session) -> Dict:
-        """
-        Syncs using Core SQL.
-        """
-        local_rows = local_db.query(model_class).all()
+    def _canonical_column(self, col, dialect: str):
+        """
+        SQL expression rendering one column as text identically on SQLite and
+        MySQL. Floats are compared in tenths (the remote stores FLOAT as single
+        precision) and datetimes at whole seconds (MySQL DATETIME rounds away
+        the fraction), so type-level storage differences don't count as drift.
+        """
+        col_type = col.type
+        if isinstance(col_type, DateTime):
+            if dialect == "mysql":
+                expr = func.date_format(col, '%Y-%m-%d %H:%i:%s')
+            else:
+                expr = func.strftime('%Y-%m-%d %H:%M:%S', col, '+0.5 seconds')
+        elif isinstance(col_type, Float):
+            expr = cast(cast(func.round(col * 10), Integer), String)
+        elif isinstance(col_type, (Integer, Boolean)):
+            expr = cast(cast(col, Integer), String)
+        else:
+            expr = cast(col, String)
+        return func.coalesce(expr, '\\N')
+
+    def _row_checksum_expr(self, table: Table, dialect: str):
+        """CRC32 over the canonical '|'-joined row, computed server-side."""
+        row_expr = None
+        for col in table.columns:
+            part = self._canonical_column(col, dialect)
+            row_expr = part if row_expr is None else row_expr + literal('|') + part
+        return func.crc32(row_expr)
+
+    def _bucket_digests(self, conn, table: Table, ranges: List[Tuple[int, int]], width: int) -> Dict[int, Tuple[int, int]]:
+        """
+        One round trip per RANGE_QUERY_CHUNK ranges: {bucket_start: (row_count, checksum_sum)}
+        for buckets of `width` ids (aligned to multiples of width) inside `ranges`.
+        """
+        dialect = conn.dialect.name
+        if dialect == "sqlite":
+            # SQLite has no CRC32; register one matching MySQL's (zlib, UTF-8 bytes)
+            conn.connection.driver_connection.create_function("crc32", 1, _sqlite_crc32, deterministic=True)
+
+        bucket = (table.c.id - table.c.id % width).label("bucket")
+        digests = {}
+        for offset in range(0, len(ranges), RANGE_QUERY_CHUNK):
+            chunk = ranges[offset:offset + RANGE_QUERY_CHUNK]
+            stmt = (
+                select(bucket, func.count(), func.sum(self._row_checksum_expr(table, dialect)))
+                .where(or_(*[table.c.id.between(lo, hi) for lo, hi in chunk]))
+                .group_by(bucket)
+            )
+            for bucket_start, count, checksum in conn.execute(stmt):
+                digests[int(bucket_start)] = (int(count), int(checksum or 0))
+        return digests
+
+    def _find_differing_ranges(self, local_conn, remote_conn, local_table: Table, remote_table: Table,
+                               fanout: int, leaf_size: int) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Walks a hash tree over id ranges top-down, descending only into buckets
+        whose (count, checksum) differ. Returns the differing leaf ranges and the
+        number of digest round trips (per side) it took.
+        """
+        bounds = [
+            conn.execute(select(func.min(t.c.id), func.max(t.c.id))).first()
+            for conn, t in ((local_conn, local_table), (remote_conn, remote_table))
+        ]
+        lows = [b[0] for b in bounds if b[0] is not None]
+        highs = [b[1] for b in bounds if b[1] is not None]
+        if not lows:
+            return [], 0
+
+        # Bucket widths are leaf_size * fanout^k so every child aligns inside its parent
+        width = leaf_size
+        while width * fanout <= max(highs):
+            width *= fanout
+        ranges = [(min(lows) - min(lows) % width, max(highs))]
+
+        round_trips = 0
+        while True:
+            local = self._bucket_digests(local_conn, local_table, ranges, width)
+            remote = self._bucket_digests(remote_conn, remote_table, ranges, width)
+            round_trips += 1
+            differing = sorted(b for b in set(local) | set(remote) if local.get(b) != remote.get(b))
+            ranges = [(b, b + width - 1) for b in differing]
+            if not ranges or width <= leaf_size:
+                return ranges, round_trips
+            width //= fanout
+
+    def reconcile(self, repair: bool = False, fanout: int = 16, leaf_size: int = 256) -> Dict:
+        """
+        Compares local and remote with range checksums instead of a full
+        transfer. With repair=True, re-sends local rows in every differing leaf
+        range and deletes remote rows that no longer exist locally.
+        """
+        check = self.can_sync(force=True, live=True)
+        if not check['allowed']:
+            return {"status": "skipped", "message": check['reason']}
+        if self.remote_engine.dialect.name not in ("mysql", "sqlite"):
+            return {"status": "error", "message": f"Verify is not supported for '{self.remote_engine.dialect.name}' remotes."}
+
+        self.remote_metadata.create_all(bind=self.remote_engine)
+        local_db = SessionLocal()
+        results = {}
+        pending_deletes = {}
+        try:
+            local_conn = local_db.connection()
+            with self.remote_engine.connect() as remote_conn:
+                for model_cls, orig_name in SYNC_MAPPING:
+                    remote_name = f"{REMOTE_PREFIX}{orig_name}"
+                    local_table = model_cls.__table__
+                    remote_table = self.remote_metadata.tables[remote_name]
+                    ranges, round_trips = self._find_differing_ranges(
+                        local_conn, remote_conn, local_table, remote_table, fanout, leaf_size
+                    )
+                    table_result = {"differing_ranges": ranges, "round_trips": round_trips}
+
+                    if repair and ranges:
+                        resent = 0
+                        stale_ids = []
+                        upsert = self._upsert_statement(remote_table)
+                        for lo, hi in ranges:
+                            rows = [dict(r) for r in local_conn.execute(
+                                select(local_table).where(local_table.c.id.between(lo, hi))
+                            ).mappings()]
+                            local_ids = {r["id"] for r in rows}
+                            remote_ids = remote_conn.execute(
+                                select(remote_table.c.id).where(remote_table.c.id.between(lo, hi))
+                            ).scalars()
+                            stale_ids.extend(i for i in remote_ids if i not in local_ids)
+                            if rows:
+                                remote_conn.execute(upsert, rows)
+                                resent += len(rows)
+                        remote_conn.commit()
+                        pending_deletes[remote_name] = stale_ids
+                        table_result.update({"resent": resent, "deleted": len(stale_ids)})
+
+                    results[model_cls.__name__] = table_result
+
+            # Deletes run children-first so remote FKs never dangle
+            for _, orig_name in reversed(SYNC_MAPPING):
+                remote_name = f"{REMOTE_PREFIX}{orig_name}"
+                if pending_deletes.get(remote_name):
+                    self._delete_remote_rows(remote_name, pending_deletes[remote_name])
+
+            in_sync = all(not r["differing_ranges"] for r in results.values())
+            return {"status": "success", "mode": "repair" if repair else "verify", "in_sync": in_sync, "details": results}
+
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+        finally:
+            local_db.close()
+
+    def _upsert_statement(self, table: Table):
+        """
+        Builds an upsert for the remote dialect, keyed on the primary key.
+        Executed with a list of row dicts, the driver sends it as multi-row
+        batches (pymysql rewrites it into one INSERT ... VALUES (...), (...)
+        ON DUPLICATE KEY UPDATE per chunk).
+        """
+        dialect = self.remote_engine.dialect.name
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            stmt = mysql_insert(table)
+            return stmt.on_duplicate_key_update(
+                {c.name: stmt.inserted[c.name] for c in table.columns if not c.primary_key}
+            )
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            stmt = dialect_insert(table)
+            return stmt.on_conflict_do_update(
+                index_elements=[c.name for c in table.primary_key.columns],
+                set_={c.name: stmt.excluded[c.name] for c in table.columns if not c.primary_key}
+            )
+        raise ValueError(f"No native upsert for dialect '{dialect}'")
+
+    def _sync_table_core(self, model_class, remote_table_name, local_db: Session,
+                         id_range: Optional[Tuple[int, int]] = None,
+                         on_batch: Optional[Callable[[int], None]] = None) -> Dict:
+        """
+        Syncs using Core SQL, sending chunked multi-row upserts.
+        With id_range, only that inclusive slice of ids (one partition) is sent.
+        """
+        remote_table = self.remote_metadata.tables[remote_table_name]
+        if self.remote_engine.dialect.name not in UPSERT_DIALECTS:
+            return self._sync_table_rowwise(model_class, remote_table_name, local_db, id_range, on_batch)
+
+        local_table = model_class.__table__
+        where = local_table.c.id.between(*id_range) if id_range else None
+        upsert = self._upsert_statement(remote_table)
+
+        upserted = 0
+        batches = 0
+        with self.remote_engine.connect() as conn:
+            for chunk in self._pipelined(self._stream_rows(local_db, local_table, where)):
+                conn.execute(upsert, chunk)
+                # Commit per batch: upserts are idempotent, and the remote
+                # never holds a whole-table transaction open
+                conn.commit()
+                upserted += len(chunk)
+                batches += 1
+                if on_batch:
+                    on_batch(len(chunk))
+
+        return {"upserted": upserted, "batches": batches, "total": upserted}
+
+    def _stream_rows(self, local_db: Session, table: Table, where=None):
+        """
+        Yields the table as lists of row dicts, batch_size at a time, from a
+        server-side cursor. Never materialises ORM objects or the whole table.
+        """
+        stmt = select(table).order_by(table.c.id)
+        if where is not None:
+            stmt = stmt.where(where)
+        result = local_db.execute(stmt.execution_options(yield_per=self.batch_size))
+        for partition in result.mappings().partitions(self.batch_size):
+            yield [dict(row) for row in partition]
+
+    def _pipelined(self, chunks, depth: int = 2):
+        """
+        Runs a chunk iterator on a reader thread so the next local batch is
+        fetched while the current one is being written to the remote. The
+        bounded queue keeps at most `depth` batches in memory.
+        """
+        buffer = queue.Queue(maxsize=depth)
+        stop = threading.Event()
+        done = object()
+
+        def _put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def _produce():
+            try:
+                for chunk in chunks:
+                    if not _put(chunk):
+                        return
+                _put(done)
+            except BaseException as e:
+                _put(e)
+            finally:
+                # Release the server-side cursor even when stopped early
+                if hasattr(chunks, "close"):
+                    chunks.close()
+
+        reader = threading.Thread(target=_produce, daemon=True)
+        reader.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Let the reader exit if the consumer stopped early (e.g. remote error)
+            stop.set()
+            reader.join()
+
+    def _sync_table_rowwise(self, model_class, remote_table_name, local_db: Session,
+                            id_range: Optional[Tuple[int, int]] = None,
+                            on_batch: Optional[Callable[[int], None]] = None) -> Dict:
+        """
+        Row-by-row SELECT then INSERT/UPDATE. Fallback for remotes without a
+        native upsert, and the baseline the bulk path is benchmarked against.
+        Honours id_range like the Core path, so each partition sends only its slice.
+        """
+        query = local_db.query(model_class)
+        if id_range:
+            query = query.filter(model_class.id.between(*id_range))
+        local_rows = query.all()
         remote_table = self.remote_metadata.tables[remote_table_name]
         
         synced = 0
@@ -164,28 +592,470 @@ class SyncService:
                     updated += 1
             
             conn.commit()
+        if on_batch and local_rows:
+            on_batch(len(local_rows))
         
         return {"synced": synced, "updated": updated, "total": len(local_rows)}
 
+    def _changed_row_ids(self, local_db: Session, table_name: str, after_id: int, upto_id: int,
+                         exclude_origin: Optional[str] = None) -> List[int]:
+        stmt = (
+            select(SyncChange.row_id)
+            .where(SyncChange.table_name == table_name, SyncChange.id > after_id, SyncChange.id <= upto_id)
+            .distinct()
+        )
+        if exclude_origin:
+            # Skip changes that were imported from this peer, so they aren't echoed back
+            stmt = stmt.where(or_(SyncChange.origin.is_(None), SyncChange.origin != exclude_origin))
+        return [row_id for (row_id,) in local_db.execute(stmt)]
+
+    def prune_changelog(self, local_db: Session):
+        """
+        Drops changelog entries every consumer has seen: the remote (via its
+        watermarks) and each peer (via the last `since` it acknowledged).
+        With no consumers configured nothing needs the history, so it is
+        cleared; a consumer added later starts with a full transfer.
+        Past SYNC_CHANGELOG_MAX_ROWS entries the whole log is dropped
+        regardless, and the consumers still behind get a full transfer next.
+        """
+        state = self._get_state()
+        high = local_db.execute(select(func.max(SyncChange.id))).scalar() or 0
+        if local_db.execute(select(func.count()).select_from(SyncChange)).scalar() > SYNC_CHANGELOG_MAX_ROWS:
+            print(f"[SYNC] Changelog passed {SYNC_CHANGELOG_MAX_ROWS} entries; dropping it, next sync is a full one.", flush=True)
+            local_db.execute(SyncChange.__table__.delete().where(SyncChange.id <= high))
+            local_db.commit()
+            # Peers whose `since` is now below pruned_through get a full transfer too
+            self._save_state({"pruned_through": max(high, state.get("pruned_through", 0)), "watermarks": {}})
+            return
+
+        limits = list(state.get("peer_acks", {}).values())
+        if self.remote_url:
+            watermarks = state.get("watermarks")
+            if not watermarks or state.get("remote") != self._remote_fingerprint():
+                return
+            limits.append(min(watermarks.values()))
+        if not limits:
+            limits.append(high)
+
+        limit = min(limits)
+        local_db.execute(SyncChange.__table__.delete().where(SyncChange.id <= limit))
+        local_db.commit()
+        if limit > state.get("pruned_through", 0):
+            self._save_state({"pruned_through": limit})
+
+    def _sync_table_changes(self, model_class, remote_table_name, local_db: Session, after_id: int, upto_id: int):
+        """
+        Pushes only rows touched in the changelog window (after_id, upto_id].
+        Returns the stats and the ids that no longer exist locally, which the
+        caller deletes remotely once every table has been upserted.
+        """
+        local_table = model_class.__table__
+        remote_table = self.remote_metadata.tables[remote_table_name]
+        changed_ids = self._changed_row_ids(local_db, local_table.name, after_id, upto_id)
+
+        upserted = 0
+        deleted_ids = []
+        if changed_ids:
+            upsert = self._upsert_statement(remote_table)
+            with self.remote_engine.connect() as conn:
+                for offset in range(0, len(changed_ids), CHANGE_ID_CHUNK):
+                    id_chunk = changed_ids[offset:offset + CHANGE_ID_CHUNK]
+                    rows = [dict(r) for r in local_db.execute(
+                        select(local_table).where(local_table.c.id.in_(id_chunk))
+                    ).mappings()]
+                    present = {r["id"] for r in rows}
+                    deleted_ids.extend(i for i in id_chunk if i not in present)
+                    if rows:
+                        conn.execute(upsert, rows)
+                        upserted += len(rows)
+                conn.commit()
+
+        return {"upserted": upserted, "deleted": len(deleted_ids), "total": len(changed_ids), "incremental": True}, deleted_ids
+
+    def _delete_remote_rows(self, remote_table_name: str, ids: List[int]):
+        remote_table = self.remote_metadata.tables[remote_table_name]
+        with self.remote_engine.connect() as conn:
+            for offset in range(0, len(ids), CHANGE_ID_CHUNK):
+                conn.execute(remote_table.delete().where(remote_table.c.id.in_(ids[offset:offset + CHANGE_ID_CHUNK])))
+            conn.commit()
+
+    def _table_dependencies(self) -> Dict[str, set]:
+        """FK graph from the remote schema: {table: {parent tables}} (unprefixed names)."""
+        strip = len(REMOTE_PREFIX)
+        deps = {}
+        for table in self.remote_metadata.sorted_tables:
+            deps[table.name[strip:]] = {
+                fk.column.table.name[strip:] for fk in table.foreign_keys if fk.column.table is not table
+            }
+        return deps
+
+    def _partition_ranges(self, local_db: Session, table: Table) -> Tuple[List[Optional[Tuple[int, int]]], int]:
+        """
+        Splits a big table into roughly partition_rows-sized id ranges; [None]
+        means whole table. Also returns the row count, used for ETAs.
+        """
+        low, high, count = local_db.execute(
+            select(func.min(table.c.id), func.max(table.c.id), func.count())
+        ).first()
+        if not count or count <= self.partition_rows:
+            return [None], count or 0
+        parts = math.ceil(count / self.partition_rows)
+        step = math.ceil((high - low + 1) / parts)
+        return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)], count
+
+    def _record_progress(self, table_name: str, part: str, rows: int = 0, status: Optional[str] = None):
+        with self._progress_lock:
+            table_progress = self.progress.setdefault(
+                table_name, {"status": "pending", "rows": 0, "expected": None, "partitions": {}}
+            )
+            part_progress = table_progress["partitions"].setdefault(part, {"status": "pending", "rows": 0})
+            part_progress["rows"] += rows
+            table_progress["rows"] += rows
+            if status:
+                part_progress["status"] = status
+                states = {p["status"] for p in table_progress["partitions"].values()}
+                table_progress["status"] = (
+                    "done" if states == {"done"} else "error" if "error" in states else "running"
+                )
+
+    def reset_progress(self):
+        with self._progress_lock:
+            self.progress = {}
+
+    def get_progress(self) -> Dict[str, Dict]:
+        """Thread-safe snapshot of per-table progress for the current or last run."""
+        with self._progress_lock:
+            return json.loads(json.dumps(self.progress))
+
+    def _run_partition(self, model_cls, orig_name: str, part: str, id_range, after_id, high_water):
+        """Worker body: one table partition (full) or one table's changes (incremental)."""
+        remote_name = f"{REMOTE_PREFIX}{orig_name}"
+        local_db = SessionLocal()
+        self._record_progress(orig_name, part, status="running")
+        try:
+            if after_id is None:
+                result = self._sync_table_core(
+                    model_cls, remote_name, local_db, id_range=id_range,
+                    on_batch=lambda n: self._record_progress(orig_name, part, rows=n),
+                )
+                deleted_ids = []
+            else:
+                result, deleted_ids = self._sync_table_changes(model_cls, remote_name, local_db, after_id, high_water)
+                self._record_progress(orig_name, part, rows=result["total"])
+            self._record_progress(orig_name, part, status="done")
+            return result, deleted_ids
+        except Exception:
+            self._record_progress(orig_name, part, status="error")
+            raise
+        finally:
+            local_db.close()
+
+    def _sync_tables_parallel(self, watermarks: Dict, high_water: int) -> Tuple[Dict, Dict]:
+        """
+        Syncs every mapped table over up to `parallelism` connections. A table
+        starts once all tables it references are done; big tables run as
+        concurrent id-range partitions. Returns (results, pending deletes).
+        """
+        models = {name: model_cls for model_cls, name in SYNC_MAPPING}
+        deps = self._table_dependencies()
+        waiting = {name: deps.get(name, set()) & set(models) for name in models}
+        finished = set()
+        open_parts: Dict[str, int] = {}
+        part_results: Dict[str, List] = {name: [] for name in models}
+        pending_deletes: Dict[str, List[int]] = {}
+        futures = {}
+
+        with self._progress_lock:
+            self.progress = {
+                name: {"status": "pending", "rows": 0, "expected": None, "partitions": {}} for name in models
+            }
+
+        pool = ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="sync")
+        planner_db = SessionLocal()
+        try:
+            def _submit_ready():
+                for name in [n for n, parents in waiting.items() if parents <= finished]:
+                    del waiting[name]
+                    after_id = watermarks.get(name)
+                    if after_id is None:
+                        ranges, expected = self._partition_ranges(planner_db, models[name].__table__)
+                    else:
+                        ranges = [None]
+                        expected = len(self._changed_row_ids(planner_db, name, after_id, high_water))
+                    with self._progress_lock:
+                        self.progress[name]["expected"] = expected
+                    open_parts[name] = len(ranges)
+                    for id_range in ranges:
+                        part = f"{id_range[0]}-{id_range[1]}" if id_range else "all"
+                        self._record_progress(name, part)
+                        fut = pool.submit(self._run_partition, models[name], name, part, id_range, after_id, high_water)
+                        futures[fut] = name
+
+            _submit_ready()
+            while futures:
+                done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = futures.pop(fut)
+                    result, deleted_ids = fut.result()
+                    part_results[name].append(result)
+                    if deleted_ids:
+                        pending_deletes.setdefault(f"{REMOTE_PREFIX}{name}", []).extend(deleted_ids)
+                    open_parts[name] -= 1
+                    if open_parts[name] == 0:
+                        finished.add(name)
+                _submit_ready()
+        finally:
+            planner_db.close()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        results = {}
+        for name, model_cls in models.items():
+            parts = part_results[name]
+            merged = {}
+            for part in parts:
+                for key, value in part.items():
+                    if isinstance(value, bool) or not isinstance(value, int):
+                        merged[key] = value
+                    else:
+                        merged[key] = merged.get(key, 0) + value
+            merged["partitions"] = len(parts)
+            results[model_cls.__name__] = merged
+        return results, pending_deletes
+
+    def restore(self, target_path: Optional[str] = None) -> Dict:
+        """
+        Rebuilds the local SQLite database from the remote mirror.
+
+        Remote tables are streamed into a fresh file next to the target with
+        journaling and fsync off and indexes are created after the load. The
+        file is then copied into the live database with SQLite's online
+        backup in a single step, which holds the write lock for the whole
+        copy: every open connection, in this process or another --workers
+        process, sees either the old or the restored database, and nothing
+        is left writing to a replaced file. The previous contents are kept
+        as <db>.pre-restore-<timestamp>.
+
+        The restored file starts with an empty changelog whose sequence
+        continues past the previous file's, so data_version never goes back.
+        Peer cursors point into the old changelog and are reset: every peer
+        gets a full transfer on its next exchange.
+        """
+        check = self.can_sync(force=True, live=True)
+        if not check['allowed']:
+            return {"status": "skipped", "message": check['reason']}
+
+        target_path = os.path.abspath(target_path or local_engine.url.database)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        tmp_path = f"{target_path}.restore-{stamp}.tmp"
+        models = {name: model_cls for model_cls, name in SYNC_MAPPING}
+        results = {}
+        started = time.perf_counter()
+
+        self.reset_progress()
+        tmp_engine = create_engine(f"sqlite:///{tmp_path}", poolclass=NullPool)
+        try:
+            with tmp_engine.connect() as tmp_conn, self.remote_engine.connect() as remote_conn:
+                # A backup into a WAL database needs matching page sizes
+                tmp_conn.exec_driver_sql(f"PRAGMA page_size = {self._page_size(target_path)}")
+                # Bulk-load settings: a crash mid-restore just leaves a discardable temp file
+                for pragma in ("journal_mode = OFF", "synchronous = OFF", "locking_mode = EXCLUSIVE",
+                               "temp_store = MEMORY", "cache_size = -200000"):
+                    tmp_conn.exec_driver_sql(f"PRAGMA {pragma}")
+
+                # Tables (all of them, local-only ones stay empty) without their indexes
+                for table in Base.metadata.sorted_tables:
+                    tmp_conn.execute(CreateTable(table))
+
+                streaming = remote_conn.execution_options(stream_results=True, yield_per=self.batch_size)
+                for table in Base.metadata.sorted_tables:
+                    if table.name not in models:
+                        continue
+                    remote_table = self.remote_metadata.tables[f"{REMOTE_PREFIX}{table.name}"]
+                    expected = remote_conn.execute(select(func.count()).select_from(remote_table)).scalar()
+                    with self._progress_lock:
+                        self.progress[table.name] = {"status": "running", "rows": 0, "expected": expected, "partitions": {}}
+                    self._record_progress(table.name, "all", status="running")
+
+                    loaded = 0
+                    insert_stmt = table.insert()
+                    result = streaming.execute(select(remote_table))
+                    for partition in result.mappings().partitions(self.batch_size):
+                        rows = [dict(r) for r in partition]
+                        tmp_conn.execute(insert_stmt, rows)
+                        loaded += len(rows)
+                        self._record_progress(table.name, "all", rows=len(rows))
+                    self._record_progress(table.name, "all", status="done")
+                    results[models[table.name].__name__] = {"restored": loaded}
+
+                # Deferred index creation: one sorted build per index instead of per-row updates
+                for table in Base.metadata.sorted_tables:
+                    for index in table.indexes:
+                        tmp_conn.execute(CreateIndex(index))
+                tmp_conn.exec_driver_sql("PRAGMA journal_mode = DELETE")
+                tmp_conn.commit()
+
+                integrity = tmp_conn.exec_driver_sql("PRAGMA quick_check").scalar()
+                if integrity != "ok":
+                    raise RuntimeError(f"Restored file failed quick_check: {integrity}")
+
+            # Triggers go in last so the load itself doesn't fill the changelog
+            install_change_tracking(tmp_engine)
+
+            backup_path = None
+            with closing(sqlite3.connect(target_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)) as live:
+                if os.path.getsize(target_path):
+                    backup_path = f"{target_path}.pre-restore-{stamp}"
+                    with closing(sqlite3.connect(backup_path)) as saved:
+                        live.backup(saved)
+
+                # Read as late as possible: what the live file holds now is what is kept
+                previous = self._carried_over(target_path)
+                changelog_start = self._carry_over(tmp_engine, previous)
+                results["User"] = {"kept": len(previous["accounts"])}
+                tmp_engine.dispose()
+
+                # pages=-1: one step, under one write lock
+                with closing(sqlite3.connect(tmp_path)) as restored:
+                    restored.backup(live, pages=-1)
+        except Exception as e:
+            return {"status": "error", "message": f"Restore failed: {str(e)}"}
+        finally:
+            tmp_engine.dispose()
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        # Local now mirrors the remote: the next sync can be incremental. Peers
+        # start over with a full transfer in both directions.
+        state = self._get_state()
+        peers = {url: {**peer, "pulled": None, "pushed": None} for url, peer in state.get("peers", {}).items()}
+        self._save_state({
+            "remote": self._remote_fingerprint(),
+            "watermarks": {name: 0 for _, name in SYNC_MAPPING},
+            "pruned_through": changelog_start,
+            "peer_acks": {},
+            "peers": peers,
+        })
+        return {
+            "status": "success",
+            "details": results,
+            "path": target_path,
+            "backup": backup_path,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+
+    def _page_size(self, path: str) -> int:
+        if not os.path.exists(path):
+            return 4096
+        with closing(sqlite3.connect(path)) as conn:
+            return conn.execute("PRAGMA page_size").fetchone()[0]
+
+    def _carry_over(self, tmp_engine, previous: Dict) -> int:
+        """
+        Writes what a restore keeps into the restored file. Returns the
+        changelog id the restored file continues from.
+        """
+        with tmp_engine.begin() as conn:
+            # Accounts aren't mirrored: keep the ones in the file being replaced
+            if previous["accounts"]:
+                conn.execute(User.__table__.insert(), previous["accounts"])
+            # The job queue is local too, and includes the restore's own job
+            if previous["jobs"]:
+                conn.execute(Job.__table__.insert(), previous["jobs"])
+            # Page versions move forward, so no page cached before the restore stays current
+            if previous["page_versions"]:
+                conn.execute(PageVersion.__table__.insert(), [
+                    {"scope": row["scope"], "version": row["version"] + 1} for row in previous["page_versions"]
+                ])
+            # One id past the old changelog: anything that read the old one (data_version,
+            # peer `since` values) sees the jump, and every old cursor falls below pruned_through
+            changelog_start = max(previous["changelog_seq"], self._get_state().get("pruned_through", 0)) + 1
+            conn.execute(
+                text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                {"name": SyncChange.__tablename__, "seq": changelog_start},
+            )
+        return changelog_start
+
+    def _carried_over(self, path: str) -> Dict:
+        """
+        What a restore keeps from the SQLite file at path: its accounts, its
+        job queue, its page versions and the last changelog id it handed out.
+        """
+        previous = {"accounts": [], "jobs": [], "page_versions": [], "changelog_seq": 0}
+        if not os.path.exists(path):
+            return previous
+        source = create_engine(f"sqlite:///{path}", poolclass=NullPool)
+        try:
+            with source.connect() as conn:
+                inspector = inspect(conn)
+                for key, table in (("accounts", User.__table__), ("jobs", Job.__table__)):
+                    if inspector.has_table(table.name):
+                        present = {c["name"] for c in inspector.get_columns(table.name)}
+                        columns = [c for c in table.columns if c.name in present]
+                        previous[key] = [dict(r) for r in conn.execute(select(*columns)).mappings()]
+                if inspector.has_table("page_versions"):
+                    previous["page_versions"] = [dict(r) for r in conn.execute(select(PageVersion.__table__)).mappings()]
+                if inspector.has_table(SyncChange.__tablename__):
+                    previous["changelog_seq"] = max(
+                        conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :name"),
+                                     {"name": SyncChange.__tablename__}).scalar() or 0,
+                        conn.execute(select(func.max(SyncChange.id))).scalar() or 0,
+                    )
+        finally:
+            source.dispose()
+        return previous
+
+    def _drop_retired_remote_tables(self, conn):
+        inspector = inspect(conn)
+        for name in RETIRED_REMOTE_TABLES:
+            remote_name = f"{REMOTE_PREFIX}{name}"
+            if inspector.has_table(remote_name):
+                print(f"[SYNC] Dropping {remote_name} from remote; it is no longer mirrored", flush=True)
+                conn.execute(text(f"DROP TABLE {conn.dialect.identifier_preparer.quote(remote_name)}"))
+
+    def _ensure_remote_schema(self):
+        """
+        Creates missing remote tables and adds columns introduced locally since
+        the remote tables were created (nullable, without FK constraints), so
+        schema additions don't require a Reset Remote.
+        """
+        self.remote_metadata.create_all(bind=self.remote_engine)
+        inspector = inspect(self.remote_engine)
+        dialect = self.remote_engine.dialect
+        with self.remote_engine.begin() as conn:
+            self._drop_retired_remote_tables(conn)
+            for table in self.remote_metadata.sorted_tables:
+                existing = {c["name"] for c in inspector.get_columns(table.name)}
+                for col in table.columns:
+                    if col.name not in existing:
+                        print(f"[SYNC] Adding column {table.name}.{col.name} to remote", flush=True)
+                        conn.execute(text(
+                            f"ALTER TABLE {dialect.identifier_preparer.quote(table.name)} "
+                            f"ADD COLUMN {dialect.identifier_preparer.quote(col.name)} {col.type.compile(dialect=dialect)}"
+                        ))
+
     def run_sync(self, force: bool = False, reset: bool = False) -> Dict:
-        check = self.can_sync(force)
+        check = self.can_sync(force, live=True)
         if not check['allowed']:
             return {"status": "skipped", "message": check['reason']}
 
         if reset:
             try:
+                is_mysql = self.remote_engine.dialect.name == "mysql"
                 with self.remote_engine.connect() as conn:
                     # Disable FK checks on THIS connection
-                    conn.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+                    if is_mysql:
+                        conn.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
                     
                     # Drop all using THIS connection
                     self.remote_metadata.drop_all(bind=conn)
+                    self._drop_retired_remote_tables(conn)
                     
                     # Re-create all using THIS connection (immediately after drop)
                     self.remote_metadata.create_all(bind=conn)
                     
                     # Re-enable FK checks
-                    conn.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+                    if is_mysql:
+                        conn.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
                     conn.commit()
                     print("Reset: Remote DB wiped and re-created successfully.")
             except Exception as e:
@@ -195,33 +1065,77 @@ class SyncService:
 
         # Ensure Remote Schema Exists (if not reset, we still check)
         if not reset:
-             self.remote_metadata.create_all(bind=self.remote_engine)
+             self._ensure_remote_schema()
         
         local_db = SessionLocal()
-        results = {}
         
         try:
-            # Sync in order. 
-            # Note: _prepare_remote_metadata uses sorted_tables, but we need to map Model -> RemoteTable
-            
-            # Map Models to their original table names explicitly to find the prefixed version
-            mapping = [
-                (Course, "courses"),
-                (Video, "videos"),
-                (Transcript, "transcripts"),
-                (Question, "questions"),
-                (Answer, "answers"),
-                (VideoProgress, "video_progress")
-            ]
-            
-            for model_cls, orig_name in mapping:
+            state = self._get_state()
+            watermarks = state.get("watermarks", {})
+            if reset or state.get("remote") != self._remote_fingerprint():
+                watermarks = {}
+
+            # Everything up to this changelog id is covered by this run;
+            # later writes are picked up next time.
+            high_water = local_db.execute(select(func.max(SyncChange.id))).scalar() or 0
+
+            # Parents before children, independent tables and partitions in parallel.
+            # Note: _prepare_remote_metadata uses sorted_tables, which is where the FK graph comes from
+            results, pending_deletes = self._sync_tables_parallel(watermarks, high_water)
+
+            # Deletes run children-first so remote FKs never dangle
+            for _, orig_name in reversed(SYNC_MAPPING):
                 remote_name = f"{REMOTE_PREFIX}{orig_name}"
-                results[model_cls.__name__] = self._sync_table_core(model_cls, remote_name, local_db)
-            
-            self._save_state({"last_sync": datetime.now().isoformat()})
+                if pending_deletes.get(remote_name):
+                    self._delete_remote_rows(remote_name, pending_deletes[remote_name])
+
+            self._save_state({
+                "last_sync": datetime.now().isoformat(),
+                "remote": self._remote_fingerprint(),
+                "watermarks": {name: high_water for _, name in SYNC_MAPPING},
+            })
+
+            # Entries at or below the watermark are now on the remote
+            self.prune_changelog(local_db)
             return {"status": "success", "details": results}
 
         except Exception as e:
             return {"status": "error", "message": str(e)}
         finally:
             local_db.close()
+
+
+_shared_service: Optional[SyncService] = None
+_shared_lock = threading.Lock()
+
+
+def get_sync_service() -> SyncService:
+    """
+    Process-wide SyncService: one pooled remote engine and one copy of the
+    remote metadata, shared by the status endpoint and the sync worker.
+    """
+    global _shared_service
+    if _shared_service is None:
+        with _shared_lock:
+            if _shared_service is None:
+                _shared_service = SyncService()
+    return _shared_service
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Remote sync maintenance")
+    parser.add_argument("command", choices=["sync", "verify", "repair", "restore"])
+    parser.add_argument("--force", action="store_true", help="Ignore the 6 hour spacing (sync)")
+    parser.add_argument("--target", help="SQLite file to restore into (default: the app database)")
+    args = parser.parse_args()
+
+    service = get_sync_service()
+    if args.command == "sync":
+        outcome = service.run_sync(force=args.force)
+    elif args.command == "restore":
+        outcome = service.restore(target_path=args.target)
+    else:
+        outcome = service.reconcile(repair=(args.command == "repair"))
+    print(json.dumps(outcome, indent=2, default=str))
@@ -1,15 +1,36 @@
 import yt_dlp
 from youtube_transcript_api import YouTubeTranscriptApi
-from typing import List, Dict, Optional
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 import os
 import re
 import subprocess
+from . import metrics
 
 VIDEOS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "videos")
 
-# Find yt-dlp binary: prefer venv, fall back to system
+# Find yt-dlp binary: YTDLP_BIN env (e.g. the benchmark stub), then venv, then system
 _VENV_YTDLP = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "venv", "bin", "yt-dlp")
-YTDLP_BIN = _VENV_YTDLP if os.path.exists(_VENV_YTDLP) else "yt-dlp"
+YTDLP_BIN = os.getenv("YTDLP_BIN") or (_VENV_YTDLP if os.path.exists(_VENV_YTDLP) else "yt-dlp")
+
+def _entry_video(entry: Optional[Dict]) -> Optional[Dict]:
+    """A flat playlist entry as {'youtube_id', 'title', 'duration', 'url'}, or None for unusable entries."""
+    if not entry or 'id' not in entry:
+        return None
+
+    vid_id = entry['id']
+    # Extra safety: if ID contains '&', strip it. 
+    # (yt-dlp usually handles this, but some raw entries might not)
+    if '&' in vid_id:
+        vid_id = vid_id.split('&')[0]
+    if '?' in vid_id:
+         vid_id = vid_id.split('?')[0]
+
+    return {
+        'youtube_id': vid_id,
+        'title': entry.get('title', 'Untitled Video'),
+        'duration': entry.get('duration', 0),
+        'url': entry.get('url', f"https://www.youtube.com/watch?v={vid_id}")
+    }
 
 def get_playlist_info(playlist_url: str) -> Dict:
     """
@@ -21,29 +42,11 @@ def get_playlist_info(playlist_url: str) -> Dict:
         'quiet': True,
     }
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl, metrics.timed("ytdlp_extract_duration_seconds"):
             result = ydl.extract_info(playlist_url, download=False)
             
             if 'entries' in result:
-                videos = []
-                for entry in result['entries']:
-                    if not entry or 'id' not in entry:
-                        continue
-
-                    vid_id = entry['id']
-                    # Extra safety: if ID contains '&', strip it. 
-                    # (yt-dlp usually handles this, but some raw entries might not)
-                    if '&' in vid_id:
-                        vid_id = vid_id.split('&')[0]
-                    if '?' in vid_id:
-                         vid_id = vid_id.split('?')[0]
-
-                    videos.append({
-                        'youtube_id': vid_id,
-                        'title': entry.get('title', 'Untitled Video'),
-                        'duration': entry.get('duration', 0),
-                        'url': entry.get('url', f"https://www.youtube.com/watch?v={vid_id}")
-                    })
+                videos = [v for v in map(_entry_video, result['entries']) if v]
                 return {
                     'id': result.get('id'),
                     'title': result.get('title'),
@@ -54,6 +57,45 @@ def get_playlist_info(playlist_url: str) -> Dict:
         print(f"Error fetching playlist info for {playlist_url}: {e}")
         return {}
 
+def iter_playlist_pages(playlist_url: str, page_size: int = 50) -> Iterator[Tuple[Dict, List[Dict]]]:
+    """
+    Reads a playlist lazily, yielding (playlist, videos) for every `page_size`
+    entries. `playlist` has 'id' and 'title'; videos are shaped like
+    get_playlist_info()'s. yt-dlp fetches further pages from YouTube only as
+    entries are consumed, so the first videos are known long before a large
+    playlist is fully read. Raises ValueError if the URL isn't a playlist and
+    lets yt-dlp errors through.
+    """
+    ydl_opts = {
+        'extract_flat': True, # Don't download videos
+        'lazy_playlist': True,
+        'quiet': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with metrics.timed("ytdlp_extract_duration_seconds"):
+            # process=False keeps 'entries' as the extractor's lazy generator
+            result = ydl.extract_info(playlist_url, download=False, process=False)
+            # A watch URL with &list= first resolves to the playlist URL
+            for _ in range(3):
+                if not result or result.get('_type') not in ('url', 'url_transparent'):
+                    break
+                result = ydl.extract_info(result['url'], download=False, process=False)
+        if not result or 'entries' not in result:
+            raise ValueError(f"Not a playlist: {playlist_url}")
+
+        playlist = {'id': result.get('id'), 'title': result.get('title')}
+        page: List[Dict] = []
+        yielded = False
+        for entry in result['entries']:
+            video = _entry_video(entry)
+            if video:
+                page.append(video)
+            if len(page) >= page_size:
+                yield playlist, page
+                page, yielded = [], True
+        if page or not yielded:
+            yield playlist, page
+
 def _sanitize_filename(name: str) -> str:
     """Remove characters that are problematic in filenames."""
     name = re.sub(r'[<>:"/\\|?*]', '', name)
@@ -61,11 +103,55 @@ def _sanitize_filename(name: str) -> str:
     return name
 
 
-def download_video(youtube_id: str, course_title: str = "", video_title: str = "", video_order: int = 0) -> Optional[str]:
+# "[download]  42.0% of ~  12.34MiB at    1.21MiB/s ETA 00:08 (frag 3/9)", one per line with --newline
+_PROGRESS_RE = re.compile(
+    r"^\[download\]\s+(?P<percent>[\d.]+)% of\s+~?\s*(?P<total>[\d.]+[KMGT]?i?B)"
+    r"(?:\s+at\s+(?P<speed>[\d.]+[KMGT]?i?B)/s)?(?:\s+ETA\s+(?P<eta>[\d:]+))?"
+)
+_UNITS = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3, "TiB": 1024 ** 4,
+          "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4}
+
+
+def _size_bytes(value: str) -> Optional[int]:
+    match = re.match(r"([\d.]+)(\D+)$", value)
+    if not match or match.group(2) not in _UNITS:
+        return None
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+
+def parse_progress(line: str) -> Optional[Dict]:
+    """
+    Parses a yt-dlp progress line into percent, downloaded_bytes, total_bytes,
+    speed (bytes/s) and eta (seconds). Returns None for any other output.
+    Speed and ETA are None while yt-dlp reports them as Unknown.
+    """
+    match = _PROGRESS_RE.match(line)
+    if not match:
+        return None
+    percent = float(match.group("percent"))
+    total = _size_bytes(match.group("total"))
+    eta = None
+    if match.group("eta"):
+        eta = 0
+        for part in match.group("eta").split(":"):
+            eta = eta * 60 + int(part)
+    return {
+        "percent": percent,
+        "downloaded_bytes": int(total * percent / 100) if total else None,
+        "total_bytes": total,
+        "speed": _size_bytes(match.group("speed")) if match.group("speed") else None,
+        "eta": eta,
+    }
+
+
+def download_video(youtube_id: str, course_title: str = "", video_title: str = "", video_order: int = 0,
+                   on_progress: Optional[Callable[[Dict], None]] = None) -> Optional[str]:
     """
     Downloads a YouTube video to a course subfolder within the videos directory.
     Files are named: {order:02d} - {video_title}.mp4
     Returns the relative path (course_folder/filename) on success, None on failure.
+    on_progress, if given, is called with each parse_progress() result while
+    yt-dlp downloads.
     """
     # Build course subfolder
     if course_title:
@@ -98,33 +184,31 @@ def download_video(youtube_id: str, course_title: str = "", video_title: str = "
 
     output_template = os.path.join(course_dir, f"{video_order + 1:02d} - {safe_title}.%(ext)s")
 
-    # Use subprocess so yt-dlp definitively blocks until done
+    # --newline prints each progress update on its own line, so it can be read as it arrives
     cmd = [
         YTDLP_BIN,
+        '--newline',
         '--format', 'best[height<=720][ext=mp4]/bestvideo[height<=720][ext=mp4]+bestaudio[ext=m4a]/best[height<=720]',
         '--output', output_template,
         '--merge-output-format', 'mp4',
         '--no-playlist',
         f'https://www.youtube.com/watch?v={youtube_id}',
     ]
+
+    def on_line(line: str):
+        progress = parse_progress(line)
+        if progress is None:
+            if line.strip():
+                print(f"  [yt-dlp] {line}", flush=True)
+        elif on_progress:
+            on_progress(progress)
+
     try:
         print(f"[DOWNLOAD START] {filename}", flush=True)
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=1800,  # 30 min max per video
-        )
-        # Log yt-dlp output for debugging
-        if result.stdout:
-            for line in result.stdout.strip().splitlines():
-                print(f"  [yt-dlp] {line}", flush=True)
-        if result.stderr:
-            for line in result.stderr.strip().splitlines():
-                print(f"  [yt-dlp ERR] {line}", flush=True)
+        returncode = metrics.stream_subprocess(cmd, on_line, timeout=1800)  # 30 min max per video
 
-        if result.returncode != 0:
-            print(f"[DOWNLOAD FAILED] {filename} (exit code {result.returncode})", flush=True)
+        if returncode != 0:
+            print(f"[DOWNLOAD FAILED] {filename} (exit code {returncode})", flush=True)
             return None
 
         if os.path.exists(full_path):
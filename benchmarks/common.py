@@ -0,0 +1,87 @@
+"""Shared helpers for benchmark scripts: latency summaries and JSON results."""
+import json
+import math
+import os
+import platform
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values: List[float], error_count: int = 0, duration: Optional[float] = None) -> Dict:
+    """Count, errors, p50/p95/p99/mean/max in ms for samples in seconds; rps when a duration is given."""
+    values = sorted(values)
+    ms = lambda v: round(v * 1000, 2)
+    summary = {"requests": len(values), "errors": error_count}
+    if duration is not None:
+        summary["rps"] = round(len(values) / duration, 1) if duration else 0
+    summary.update({
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "mean_ms": ms(sum(values) / len(values)) if values else 0,
+        "max_ms": ms(values[-1]) if values else 0,
+    })
+    return summary
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def result_header(benchmark: str, config: Dict) -> Dict:
+    return {
+        "benchmark": benchmark,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": config,
+    }
+
+
+def print_table(results: Dict, previous: Optional[Dict] = None, label: str = "scenario"):
+    """Prints results["scenarios"] (and results["total"] if present), with deltas against `previous`."""
+    keys = [k for k in ("rps", "p50_ms", "p95_ms", "p99_ms") if k in results.get("total", next(iter(results["scenarios"].values()), {}))]
+    header = f"{label:<14} {'count':>7} {'err':>5}" + "".join(f" {k:>9}" for k in keys)
+    print(header)
+    print("-" * len(header))
+    rows = list(results["scenarios"].items())
+    if "total" in results:
+        rows.append(("total", results["total"]))
+    for name, s in rows:
+        print(f"{name:<14} {s['requests']:>7} {s['errors']:>5}" + "".join(f" {s[k]:>9.2f}" for k in keys))
+        if previous:
+            old = previous.get("total") if name == "total" else previous.get("scenarios", {}).get(name)
+            if old:
+                deltas = [f"{k} {(s[k] - old[k]) / old[k] * 100:+.1f}%" for k in keys if old.get(k)]
+                print(f"{'':<14} vs {previous.get('git_commit') or 'previous'}: {', '.join(deltas)}")
+
+
+def load_previous(path: Optional[str]) -> Optional[Dict]:
+    if not path:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(results: Dict, out_dir: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{results['benchmark']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path
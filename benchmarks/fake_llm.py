@@ -0,0 +1,96 @@
+"""
+Stand-in for the Groq API so benchmarks never hit the network or spend tokens.
+
+Answers chat completions (question generation, answer and exam grading) and
+Whisper transcriptions with canned JSON after a configurable delay. Point
+the app at it with GROQ_BASE_URL; the Groq SDK reads that variable itself.
+
+Usage:
+    python -m benchmarks.fake_llm --port 8765 --latency-ms 800
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=bench uvicorn backend.main:app
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUESTIONS = {"questions": [
+    {"question": "Explain the main idea of this video in your own words.", "context": "Overview"},
+    {"question": "How would you apply the technique shown to a different problem?", "context": "Application"},
+    {"question": "What trade-off does the presenter point out, and why does it matter?", "context": "Trade-offs"},
+]}
+
+GRADE = {
+    "rating": 82, "is_correct": True, "feedback": "Good answer covering the key points.",
+    "answered_question_ids": [], "individual_scores": {}, "overall_score": 82, "passed": True,
+}
+
+
+def _completion(content: dict, model: str, prompt_chars: int) -> dict:
+    text = json.dumps(content)
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(text) // 4,
+                  "total_tokens": prompt_chars // 4 + len(text) // 4},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.latency)
+
+        if self.path.endswith("/chat/completions"):
+            request = json.loads(body or b"{}")
+            prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+            content = QUESTIONS if "OPEN-ENDED" in prompt else GRADE
+            payload = _completion(content, request.get("model", "fake"), len(prompt))
+        elif self.path.endswith("/audio/transcriptions"):
+            payload = {"text": "1. The video explains the main idea. 2. I would apply it elsewhere. 3. The trade-off is speed."}
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port: int = 0, latency_ms: float = 0) -> ThreadingHTTPServer:
+    """Serves in a daemon thread; the bound port is server.server_address[1]."""
+    handler = type("FakeLLMHandler", (_Handler,), {"latency": latency_ms / 1000})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=800, help="Delay before each response")
+    args = parser.parse_args()
+    server = start(args.port, args.latency_ms)
+    print(f"Fake Groq API on http://127.0.0.1:{server.server_address[1]} ({args.latency_ms:.0f}ms per call)", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Synthetic library generator for benchmarks.
+
+Fills a fresh SQLite database with courses, videos, transcript lines,
+questions, exam attempts, answers and progress at realistic ratios: one
+caption line per ~4s of video, 3 questions on most videos, learners part way
+through each course with 1-2 attempts per completed video. Learner accounts
+are named learner01, learner02, ... and all use the password "bench". A few dummy media
+files are written next to the database and attached to a share of the
+videos so /stream can be exercised.
+
+Usage:
+    python -m benchmarks.generate_library --db bench.db --courses 20 --videos 25
+    LEARNING_DB_URL=sqlite:///./bench.db uvicorn backend.main:app
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+
+from backend.models import Base, User, Course, Video, Transcript, Question, ExamAttempt, Answer, VideoProgress
+from backend.services.auth import hash_password
+
+WORDS = (
+    "gradient model layer training loss data network function value memory process thread "
+    "request cache index query latency throughput vector matrix signal system design pattern "
+    "the a of to and in is that for it with as on this we can"
+).split()
+
+BATCH = 5000
+
+
+def _sentence(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _write_media(media_dir: str, count: int, size_mb: float, rng: random.Random):
+    os.makedirs(media_dir, exist_ok=True)
+    paths = []
+    block = rng.randbytes(1024 * 1024)
+    for i in range(count):
+        path = os.path.join(media_dir, f"bench_{i}.mp4")
+        with open(path, "wb") as f:
+            remaining = int(size_mb * 1024 * 1024)
+            while remaining > 0:
+                f.write(block[:remaining])
+                remaining -= len(block)
+        paths.append(os.path.abspath(path))
+    return paths
+
+
+class _Batcher:
+    """Buffers rows per model and bulk-inserts them BATCH at a time."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = {}
+        self.counts = {}
+
+    def add(self, model, row):
+        rows = self.rows.setdefault(model, [])
+        rows.append(row)
+        self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + 1
+        if len(rows) >= BATCH:
+            self.flush(model)
+
+    def flush(self, model=None):
+        for m in [model] if model else list(self.rows):
+            if self.rows.get(m):
+                self.conn.execute(insert(m), self.rows[m])
+                self.rows[m] = []
+
+
+LEARNER_PASSWORD = "bench"
+
+
+def learner_names(users: int) -> list:
+    return [f"learner{u:02d}" for u in range(1, users + 1)]
+
+
+def generate(db_path: str, courses: int, videos: int, quizzed: float, media_files: int,
+             media_mb: float, local_ratio: float, seed: int, users: int = 1) -> dict:
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+
+    media_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), "bench_media")
+    media = _write_media(media_dir, media_files, media_mb, rng) if media_files else []
+
+    now = datetime.utcnow()
+    ids = {"video": 0, "transcript": 0, "question": 0, "attempt": 0, "answer": 0, "progress": 0}
+    learners = learner_names(users)
+    # One hash shared by every account; PBKDF2 is deliberately slow
+    password_hash = hash_password(LEARNER_PASSWORD)
+    with engine.begin() as conn:
+        batch = _Batcher(conn)
+        for u, name in enumerate(learners, start=1):
+            batch.add(User, {"id": u, "username": name, "password_hash": password_hash, "created_at": now})
+        for c in range(1, courses + 1):
+            batch.add(Course, {
+                "id": c, "title": f"Course {c}: {_sentence(rng, 2, 5)}", "playlist_id": f"BENCH{c:05d}",
+                "description": _sentence(rng, 10, 30), "is_hidden": False, "created_at": now - timedelta(days=rng.randint(1, 365)),
+            })
+            course_videos = max(1, int(videos * rng.uniform(0.5, 1.5)))
+            # Learners work through a course in order: a completed prefix, one in progress
+            completed_upto = {name: rng.randint(0, course_videos) for name in learners}
+            for order in range(course_videos):
+                ids["video"] += 1
+                vid = ids["video"]
+                duration = rng.randint(240, 2400)
+                local = media[vid % len(media)] if media and rng.random() < local_ratio else None
+                batch.add(Video, {
+                    "id": vid, "course_id": c, "youtube_id": f"bv{vid:09d}", "title": _sentence(rng, 3, 8),
+                    "order": order, "duration": duration, "local_filename": local,
+                })
+
+                t = 0.0
+                while t < duration:
+                    ids["transcript"] += 1
+                    line = rng.uniform(2.0, 6.0)
+                    batch.add(Transcript, {"id": ids["transcript"], "video_id": vid, "text": _sentence(rng, 5, 14),
+                                           "start_time": round(t, 2), "duration": round(line, 2)})
+                    t += line
+
+                question_ids = []
+                if rng.random() < quizzed:
+                    for _ in range(3):
+                        ids["question"] += 1
+                        question_ids.append(ids["question"])
+                        batch.add(Question, {"id": ids["question"], "video_id": vid, "text": _sentence(rng, 8, 16) + "?",
+                                             "kind": "text", "correct_answer_summary": _sentence(rng, 10, 20)})
+
+                for name in learners:
+                    completed = order < completed_upto[name]
+                    if completed or order == completed_upto[name]:
+                        ids["progress"] += 1
+                        batch.add(VideoProgress, {
+                            "id": ids["progress"], "video_id": vid, "user_id": name, "completed": completed,
+                            "score": rng.randint(70, 100) if completed else 0,
+                            "last_watched_timestamp": float(duration if completed else rng.randint(0, duration)),
+                            "updated_at": now - timedelta(minutes=rng.randint(1, 60 * 24 * 90)),
+                        })
+
+                    if completed and question_ids:
+                        attempts = rng.choice((1, 1, 2))
+                        for a in range(attempts):
+                            passed = a == attempts - 1
+                            ids["attempt"] += 1
+                            created = now - timedelta(minutes=rng.randint(1, 60 * 24 * 90))
+                            score = rng.randint(70, 100) if passed else rng.randint(20, 69)
+                            batch.add(ExamAttempt, {
+                                "id": ids["attempt"], "video_id": vid, "user_id": name,
+                                "submission_text": " ".join(f"{i + 1}. {_sentence(rng, 20, 60)}" for i in range(3)),
+                                "source": rng.choice(("text", "audio")), "overall_score": float(score), "passed": passed,
+                                "feedback": _sentence(rng, 20, 50), "created_at": created,
+                            })
+                            for qid in question_ids:
+                                ids["answer"] += 1
+                                rating = max(0, min(100, score + rng.randint(-15, 15)))
+                                batch.add(Answer, {"id": ids["answer"], "question_id": qid, "attempt_id": ids["attempt"],
+                                                   "is_correct": rating >= 70, "rating": rating, "created_at": created})
+        batch.flush()
+    engine.dispose()
+    return batch.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench.db", help="Output SQLite file (replaced if it exists)")
+    parser.add_argument("--courses", type=int, default=20)
+    parser.add_argument("--videos", type=int, default=25, help="Average videos per course")
+    parser.add_argument("--quizzed", type=float, default=0.6, help="Share of videos that already have questions")
+    parser.add_argument("--media-files", type=int, default=4, help="Dummy media files to write for /stream")
+    parser.add_argument("--media-mb", type=float, default=8)
+    parser.add_argument("--local-ratio", type=float, default=0.2, help="Share of videos pointing at a media file")
+    parser.add_argument("--users", type=int, default=1, help="Learner accounts, each with their own progress")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate(args.db, args.courses, args.videos, args.quizzed, args.media_files,
+                      args.media_mb, args.local_ratio, args.seed, args.users)
+    elapsed = time.perf_counter() - start
+    for table, count in counts.items():
+        print(f"{table:<16} {count:>9}")
+    print(f"Wrote {args.db} ({os.path.getsize(args.db) / 1e6:.1f} MB) in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
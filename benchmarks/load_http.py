@@ -0,0 +1,248 @@
+"""
+HTTP load driver for the main app.
+
+Starts the fake Groq API and a uvicorn server on a private copy of a
+generated database (see benchmarks.generate_library), then runs a weighted mix
+of requests from concurrent workers, each signed in as one of the
+generated learners (round robin):
+
+    dashboard  GET  /
+    player     GET  /course/{id}  (sometimes with ?video_id=)
+    progress   POST /api/progress
+    stream     GET  /stream/{id}  with a 1MB Range header
+    quiz       GET  /api/videos/{id}/quiz  (videos without questions call the fake LLM)
+
+Prints p50/p95/p99 latency and throughput per endpoint and writes them as
+JSON to --out, so runs can be compared with --compare.
+
+Usage:
+    python -m benchmarks.generate_library --db bench.db
+    python -m benchmarks.load_http --db bench.db --workers 16 --duration 30
+    python -m benchmarks.load_http --db bench.db --compare benchmarks/results/http-20250101-120000.json
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from benchmarks import fake_llm
+from benchmarks.generate_library import LEARNER_PASSWORD
+from benchmarks.common import REPO_ROOT, RESULTS_DIR, summarize, result_header, print_table, load_previous, save_results
+
+DEFAULT_MIX = "dashboard=2,player=4,progress=3,stream=2,quiz=1"
+STREAM_CHUNK = 1024 * 1024
+
+
+class Library:
+    """Ids the workers pick from, read once from the database."""
+
+    def __init__(self, db_path: str):
+        conn = sqlite3.connect(db_path)
+        try:
+            self.videos = conn.execute("SELECT id, course_id FROM videos").fetchall()
+            self.course_ids = [r[0] for r in conn.execute("SELECT id FROM courses WHERE is_hidden = 0 OR is_hidden IS NULL")]
+            local = conn.execute("SELECT id, local_filename FROM videos WHERE local_filename IS NOT NULL").fetchall()
+            self.learners = [r[0] for r in conn.execute("SELECT username FROM users ORDER BY id")]
+        finally:
+            conn.close()
+        self.streamable = [(vid, os.path.getsize(path)) for vid, path in local if os.path.isfile(path)]
+
+
+def _request(session: requests.Session, base: str, scenario: str, lib: Library, rng: random.Random):
+    if scenario == "dashboard":
+        return session.get(f"{base}/")
+    if scenario == "player":
+        course_id = rng.choice(lib.course_ids)
+        if rng.random() < 0.3:
+            video_id = rng.choice(lib.videos)[0]
+            return session.get(f"{base}/course/{course_id}", params={"video_id": video_id})
+        return session.get(f"{base}/course/{course_id}")
+    if scenario == "progress":
+        video_id, course_id = rng.choice(lib.videos)
+        return session.post(f"{base}/api/progress", json={
+            "video_id": video_id, "course_id": course_id,
+            "timestamp": rng.uniform(0, 1800), "completed": rng.random() < 0.02,
+        })
+    if scenario == "stream":
+        video_id, size = rng.choice(lib.streamable)
+        start = rng.randrange(0, max(1, size - STREAM_CHUNK))
+        return session.get(f"{base}/stream/{video_id}", headers={"Range": f"bytes={start}-{start + STREAM_CHUNK - 1}"})
+    if scenario == "quiz":
+        return session.get(f"{base}/api/videos/{rng.choice(lib.videos)[0]}/quiz")
+    raise ValueError(scenario)
+
+
+def _login(session: requests.Session, base: str, username: str):
+    response = session.post(f"{base}/login", data={"username": username, "password": LEARNER_PASSWORD},
+                            allow_redirects=False)
+    if response.status_code != 303:
+        raise RuntimeError(f"Login as {username} failed with {response.status_code}")
+
+
+def _worker(base: str, lib: Library, mix: List, start_recording: float, deadline: float,
+            samples: Dict[str, List], errors: Dict[str, int], lock: threading.Lock, seed: int, learner: str):
+    rng = random.Random(seed)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    session = requests.Session()
+    _login(session, base, learner)
+    local_samples: Dict[str, List[float]] = {name: [] for name in names}
+    local_errors: Dict[str, int] = {name: 0 for name in names}
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        scenario = rng.choices(names, weights)[0]
+        try:
+            response = _request(session, base, scenario, lib, rng)
+            _ = response.content  # Include the body transfer
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - now
+        if now < start_recording:
+            continue
+        if ok:
+            local_samples[scenario].append(elapsed)
+        else:
+            local_errors[scenario] += 1
+    with lock:
+        for name in names:
+            samples[name].extend(local_samples[name])
+            errors[name] += local_errors[name]
+
+
+def _start_server(db_path: str, port: int, llm_url: str, log_path: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "LEARNING_DB_URL": f"sqlite:///{db_path}",
+        "GROQ_BASE_URL": llm_url,
+        "GROQ_API_KEY": "bench",
+        # Keep background work out of the measurements
+        "SYNC_INTERVAL_MINUTES": "0",
+        "SNAPSHOT_INTERVAL_MINUTES": "0",
+        "PROFILE_SAMPLE_RATE": "0",
+        "SESSION_SECRET": "bench",
+    })
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def _wait_ready(base: str, server: Optional[subprocess.Popen], timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if requests.get(f"{base}/", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server at {base} not ready after {timeout:.0f}s")
+
+
+def run(args) -> Dict:
+    mix = []
+    for item in args.mix.split(","):
+        name, _, weight = item.partition("=")
+        if float(weight or 1) > 0:
+            mix.append((name.strip(), float(weight or 1)))
+
+    tmp = tempfile.mkdtemp(prefix="bench-http-")
+    server = None
+    llm = None
+    try:
+        # Each run starts from the same data; progress posts write to the copy
+        db_path = os.path.join(tmp, "learning.db")
+        shutil.copyfile(args.db, db_path)
+        lib = Library(db_path)
+        if not lib.learners:
+            raise SystemExit("No learner accounts in the database; regenerate it with benchmarks.generate_library.")
+        if not lib.streamable:
+            mix = [(name, weight) for name, weight in mix if name != "stream"]
+            print("No local media files in the database; skipping stream.", flush=True)
+
+        if args.url:
+            base = args.url.rstrip("/")
+        else:
+            llm = fake_llm.start(latency_ms=args.llm_latency_ms)
+            llm_url = f"http://127.0.0.1:{llm.server_address[1]}"
+            server = _start_server(db_path, args.port, llm_url, os.path.join(tmp, "server.log"))
+            base = f"http://127.0.0.1:{args.port}"
+        _wait_ready(base, server)
+
+        samples: Dict[str, List[float]] = {name: [] for name, _ in mix}
+        errors: Dict[str, int] = {name: 0 for name, _ in mix}
+        lock = threading.Lock()
+        start = time.perf_counter()
+        start_recording = start + args.warmup
+        deadline = start_recording + args.duration
+        threads = [
+            threading.Thread(target=_worker, args=(base, lib, mix, start_recording, deadline, samples, errors, lock,
+                                                 args.seed + i, lib.learners[i % len(lib.learners)]))
+            for i in range(args.workers)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if llm is not None:
+            llm.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    all_samples = [v for values in samples.values() for v in values]
+    results = result_header("http", {
+        "db": os.path.basename(args.db), "workers": args.workers, "duration_s": args.duration,
+        "warmup_s": args.warmup, "mix": dict(mix), "llm_latency_ms": args.llm_latency_ms,
+        "courses": len(lib.course_ids), "videos": len(lib.videos), "learners": len(lib.learners),
+    })
+    results["scenarios"] = {name: summarize(samples[name], errors[name], args.duration) for name, _ in mix}
+    results["total"] = summarize(all_samples, sum(errors.values()), args.duration)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench.db", help="Database from benchmarks.generate_library")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="Recorded seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Unrecorded seconds before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. 'dashboard=1,stream=0'")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="Fake Groq response delay")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--url", help="Drive an already running server (serving a copy of --db) instead of starting one")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=RESULTS_DIR, help="Directory for the JSON result")
+    parser.add_argument("--compare", help="Earlier result JSON to print deltas against")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} not found; create it with python -m benchmarks.generate_library --db {args.db}")
+
+    results = run(args)
+    print_table(results, load_previous(args.compare))
+    print(f"Saved {save_results(results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Benchmark: local import, probing, thumbnailing and the download queue.
+
+Generates synthetic course trees from ffmpeg `lavfi` test sources:
+- codecs: H.264/MP4, HEVC/MKV, VP9/WebM, MPEG-4/AVI, MJPEG/MOV (whichever encoders the local ffmpeg has)
+- a range of durations
+- flat, sectioned and two-level nesting
+- .srt/.vtt sidecars on part of the videos
+
+Each distinct (codec, duration) clip is encoded once and hard-linked into the
+tree. The harness then times, against a throwaway database:
+
+    scan          scan_local_folder() per course (one ffprobe per video)
+    import        _import_single_folder() per course
+    thumbnail     generate_course_thumbnail() per course, cold (one ffmpeg frame grab)
+    batch         ingest_local_batch() over the whole tree
+    download      a download_course_start() batch over --download-videos videos,
+                  run by --download-workers in-process job workers, with
+                  benchmarks/stub_ytdlp.py as yt-dlp (no network)
+
+Needs ffmpeg and ffprobe on PATH.
+
+Usage:
+    python -m benchmarks.media_pipeline --courses 6 --videos 8 --durations 5,45,240
+    python -m benchmarks.media_pipeline --compare benchmarks/results/media-20250101-120000.json
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.common import RESULTS_DIR, summarize, result_header, print_table, load_previous, save_results
+
+STUB_YTDLP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_ytdlp.py")
+
+# (name, extension, encoder, video args, audio args)
+PROFILES = [
+    ("h264", ".mp4", "libx264", ["-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p"], ["-c:a", "aac"]),
+    ("hevc", ".mkv", "libx265", ["-c:v", "libx265", "-preset", "ultrafast", "-x265-params", "log-level=error"], ["-c:a", "aac"]),
+    ("vp9", ".webm", "libvpx-vp9", ["-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8"], ["-c:a", "libopus"]),
+    ("mpeg4", ".avi", "mpeg4", ["-c:v", "mpeg4", "-q:v", "8"], ["-c:a", "libmp3lame"]),
+    ("mjpeg", ".mov", "mjpeg", ["-c:v", "mjpeg", "-q:v", "10"], ["-c:a", "aac"]),
+]
+
+
+def _available_profiles() -> List[Tuple]:
+    encoders = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"], capture_output=True, text=True).stdout
+    names = {line.split()[1] for line in encoders.splitlines() if len(line.split()) > 1}
+    return [p for p in PROFILES if p[2] in names]
+
+
+def generate_samples(cache_dir: str, profiles: List[Tuple], durations: List[int], size: str) -> Dict[Tuple[str, int], str]:
+    """Encodes one test clip per (profile, duration) with lavfi testsrc2 video and a sine tone."""
+    os.makedirs(cache_dir, exist_ok=True)
+    samples = {}
+    for name, ext, _, video_args, audio_args in profiles:
+        for duration in durations:
+            path = os.path.join(cache_dir, f"{name}_{duration}s{ext}")
+            cmd = [
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=25:duration={duration}",
+                "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+                *video_args, *audio_args, "-shortest", path,
+            ]
+            start = time.perf_counter()
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"Skipping {name} {duration}s: {result.stderr.strip()[:200]}", flush=True)
+                continue
+            samples[(name, duration)] = path
+            print(f"Encoded {os.path.basename(path)} in {time.perf_counter() - start:.1f}s", flush=True)
+    return samples
+
+
+def _write_subtitle(path: str, duration: int):
+    vtt = path.endswith(".vtt")
+    sep = "." if vtt else ","
+    lines = ["WEBVTT", ""] if vtt else []
+    for i, t in enumerate(range(0, max(duration, 1), 4)):
+        lines += ([] if vtt else [str(i + 1)]) + [
+            f"00:{t // 60:02d}:{t % 60:02d}{sep}000 --> 00:{(t + 4) // 60:02d}:{(t + 4) % 60:02d}{sep}000",
+            f"Caption line {i + 1}", "",
+        ]
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+
+
+def build_tree(root: str, samples: Dict[Tuple[str, int], str], courses: int, videos: int,
+               max_depth: int, subtitle_ratio: float, rng: random.Random) -> int:
+    """
+    Course folders under `root`; course i uses nesting depth i % (max_depth + 1):
+    0 = flat, 1 = "Section N/", 2 = "Section N/Part M/". Returns the video count.
+    """
+    keys = sorted(samples)
+    total = 0
+    for c in range(courses):
+        course_dir = os.path.join(root, f"Course {c + 1:02d} - Synthetic")
+        depth = c % (max_depth + 1)
+        for v in range(videos):
+            parts = [course_dir]
+            if depth >= 1:
+                parts.append(f"Section {v // 4 + 1}")
+            if depth >= 2:
+                parts.append(f"Part {v // 2 % 2 + 1}")
+            folder = os.path.join(*parts)
+            os.makedirs(folder, exist_ok=True)
+            key = rng.choice(keys)
+            ext = os.path.splitext(samples[key])[1]
+            path = os.path.join(folder, f"{v + 1:02d} - Lesson {v + 1}{ext}")
+            try:
+                os.link(samples[key], path)
+            except OSError:
+                shutil.copyfile(samples[key], path)
+            if rng.random() < subtitle_ratio:
+                _write_subtitle(os.path.splitext(path)[0] + rng.choice((".srt", ".vtt")), key[1])
+            total += 1
+    return total
+
+
+def run(args) -> Dict:
+    for tool in ("ffmpeg", "ffprobe"):
+        if not shutil.which(tool):
+            sys.exit(f"{tool} not found on PATH")
+    profiles = _available_profiles()
+    if args.codecs:
+        profiles = [p for p in profiles if p[0] in args.codecs.split(",")]
+    durations = [int(d) for d in args.durations.split(",")]
+    rng = random.Random(args.seed)
+
+    tmp = tempfile.mkdtemp(prefix="bench-media-")
+    # Point the app at throwaway storage before its modules are imported
+    os.environ["LEARNING_DB_URL"] = f"sqlite:///{os.path.join(tmp, 'learning.db')}"
+    os.environ["YTDLP_BIN"] = STUB_YTDLP
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+
+    from backend.database import Base, engine, SessionLocal
+    from backend.models import Course, Video
+    from backend.routers import course as course_router
+    from backend.services import assets, jobs, youtube
+    from backend.services.local_import import scan_local_folder
+
+    assets.THUMBS_DIR = os.path.join(tmp, "thumbs")
+    youtube.VIDEOS_DIR = os.path.join(tmp, "downloads")
+    os.makedirs(youtube.VIDEOS_DIR, exist_ok=True)
+    Base.metadata.create_all(bind=engine)
+
+    def reset_db():
+        with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+        shutil.rmtree(assets.THUMBS_DIR, ignore_errors=True)
+
+    stages: Dict[str, List[float]] = {"scan": [], "import": [], "thumbnail": [], "batch": [], "download": []}
+    errors: Dict[str, int] = {name: 0 for name in stages}
+
+    try:
+        samples = generate_samples(args.sample_cache or os.path.join(tmp, "samples"), profiles, durations, args.size)
+        if not samples:
+            sys.exit("No test clips could be encoded")
+        tree = os.path.join(tmp, "library")
+        video_count = build_tree(tree, samples, args.courses, args.videos, args.max_depth, args.subtitle_ratio, rng)
+        course_dirs = sorted(os.path.join(tree, d) for d in os.listdir(tree))
+        print(f"Built {len(course_dirs)} courses / {video_count} videos from {len(samples)} clips", flush=True)
+
+        for _ in range(args.repeat):
+            for path in course_dirs:
+                start = time.perf_counter()
+                info = scan_local_folder(path)
+                stages["scan"].append(time.perf_counter() - start)
+                if not info or any(v["duration"] == 0 for v in info["videos"]):
+                    errors["scan"] += 1
+
+            reset_db()
+            db = SessionLocal()
+            try:
+                for path in course_dirs:
+                    start = time.perf_counter()
+                    new_course = course_router._import_single_folder(path, db)
+                    stages["import"].append(time.perf_counter() - start)
+                    if new_course is None:
+                        errors["import"] += 1
+
+                for c in db.query(Course).all():
+                    start = time.perf_counter()
+                    thumb = jobs.generate_course_thumbnail(c.id)
+                    stages["thumbnail"].append(time.perf_counter() - start)
+                    if thumb is None:
+                        errors["thumbnail"] += 1
+            finally:
+                db.close()
+
+            reset_db()
+            db = SessionLocal()
+            try:
+                start = time.perf_counter()
+                course_router.ingest_local_batch(folder_path=tree, db=db)
+                stages["batch"].append(time.perf_counter() - start)
+                if db.query(Course).count() != len(course_dirs):
+                    errors["batch"] += 1
+            finally:
+                db.close()
+
+            if args.download_videos:
+                reset_db()
+                shutil.rmtree(youtube.VIDEOS_DIR, ignore_errors=True)
+                os.makedirs(youtube.VIDEOS_DIR)
+                stub_sample = samples.get(("h264", durations[0])) or next(iter(samples.values()))
+                os.environ.update({"STUB_YTDLP_SAMPLE": stub_sample, "STUB_YTDLP_MBPS": str(args.download_mbps)})
+                jobs.start_workers(f"downloads={args.download_workers}")
+                db = SessionLocal()
+                try:
+                    queued = Course(title="Download Bench", playlist_id=f"bench-dl-{time.time_ns()}")
+                    db.add(queued)
+                    db.commit()
+                    db.add_all(Video(course_id=queued.id, youtube_id=f"stub{i:07d}", title=f"Lesson {i + 1}", order=i, duration=60)
+                               for i in range(args.download_videos))
+                    db.commit()
+                    start = time.perf_counter()
+                    course_router.download_course_start(queued.id, db)
+                    while True:
+                        job = course_router._download_summary(queued)
+                        if job["status"] != "running":
+                            break
+                        time.sleep(0.02)
+                    stages["download"].append(time.perf_counter() - start)
+                    errors["download"] += job["failed"]
+                finally:
+                    db.close()
+    finally:
+        if args.keep:
+            print(f"Kept {tmp}")
+        else:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    results = result_header("media", {
+        "courses": args.courses, "videos_per_course": args.videos, "durations_s": durations,
+        "codecs": sorted({k[0] for k in samples}), "max_depth": args.max_depth, "size": args.size,
+        "subtitle_ratio": args.subtitle_ratio, "repeat": args.repeat,
+        "download_videos": args.download_videos, "download_mbps": args.download_mbps,
+        "download_workers": args.download_workers,
+    })
+    results["scenarios"] = {name: summarize(values, errors[name]) for name, values in stages.items() if values}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=6)
+    parser.add_argument("--videos", type=int, default=8, help="Videos per course")
+    parser.add_argument("--durations", default="5,45,240", help="Clip lengths in seconds, comma separated")
+    parser.add_argument("--codecs", help="Subset of " + ",".join(p[0] for p in PROFILES))
+    parser.add_argument("--size", default="320x240", help="Test clip resolution")
+    parser.add_argument("--max-depth", type=int, default=2, choices=(0, 1, 2))
+    parser.add_argument("--subtitle-ratio", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over every stage")
+    parser.add_argument("--download-videos", type=int, default=5, help="Videos in the download queue job (0 skips it)")
+    parser.add_argument("--download-mbps", type=float, default=50, help="Stub yt-dlp bandwidth")
+    parser.add_argument("--download-workers", type=int, default=1, help="Job worker threads for the downloads queue")
+    parser.add_argument("--sample-cache", help="Directory to keep encoded clips in between runs")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated tree and database")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default=RESULTS_DIR, help="Directory for the JSON result")
+    parser.add_argument("--compare", help="Earlier result JSON to print deltas against")
+    args = parser.parse_args()
+
+    results = run(args)
+    print_table(results, load_previous(args.compare), label="stage")
+    print(f"Saved {save_results(results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the yt-dlp binary, for benchmarking the download queue.
+
+Accepts the arguments download_video() passes, "downloads" STUB_YTDLP_SAMPLE
+(a local media file) at STUB_YTDLP_MBPS, printing yt-dlp style --newline
+progress lines (percent, size, speed, ETA), then remuxes it into the
+--output path with ffmpeg, standing in for the merge/faststart
+post-processing. Without a sample it writes STUB_YTDLP_SIZE_MB of filler
+instead. STUB_YTDLP_FAIL_RATE makes a share of
+downloads exit non-zero.
+
+Usage:
+    YTDLP_BIN=benchmarks/stub_ytdlp.py STUB_YTDLP_SAMPLE=sample.mp4 uvicorn backend.main:app
+"""
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+CHUNK = 256 * 1024
+
+
+def _arg(argv, name, default=None):
+    if name in argv:
+        index = argv.index(name)
+        if index + 1 < len(argv):
+            return argv[index + 1]
+    return default
+
+
+def main(argv) -> int:
+    output = _arg(argv, "--output")
+    url = argv[-1] if argv else ""
+    if not output or not url.startswith("http"):
+        print("ERROR: stub yt-dlp needs --output and a URL", file=sys.stderr)
+        return 2
+    video_id = re.sub(r".*[?&]v=", "", url)
+
+    if random.random() < float(os.getenv("STUB_YTDLP_FAIL_RATE", "0")):
+        print(f"ERROR: [youtube] {video_id}: Video unavailable (stub failure)", file=sys.stderr)
+        return 1
+
+    sample = os.getenv("STUB_YTDLP_SAMPLE")
+    mbps = float(os.getenv("STUB_YTDLP_MBPS", "50"))
+    size = os.path.getsize(sample) if sample else int(float(os.getenv("STUB_YTDLP_SIZE_MB", "5")) * 1024 * 1024)
+    final_path = output.replace("%(ext)s", "mp4")
+    part_path = final_path + ".part"
+    print(f"[youtube] {video_id}: Downloading webpage", flush=True)
+    print(f"[download] Destination: {part_path}", flush=True)
+
+    start = time.monotonic()
+    written = 0
+    source = open(sample, "rb") if sample else None
+    try:
+        with open(part_path, "wb") as out:
+            while written < size:
+                data = source.read(CHUNK) if source else b"\0" * min(CHUNK, size - written)
+                if not data:
+                    break
+                out.write(data)
+                written += len(data)
+                # Throttle to the configured bandwidth
+                lag = written / (mbps * 1024 * 1024) - (time.monotonic() - start)
+                if lag > 0:
+                    time.sleep(lag)
+                elapsed = max(time.monotonic() - start, 1e-6)
+                speed = written / elapsed
+                eta = int((size - written) / speed)
+                print(f"[download] {written / size * 100:5.1f}% of {size / 1024 / 1024:10.2f}MiB "
+                      f"at {speed / 1024 / 1024:8.2f}MiB/s ETA {eta // 60:02d}:{eta % 60:02d}", flush=True)
+    finally:
+        if source:
+            source.close()
+
+    ffmpeg = shutil.which("ffmpeg")
+    if sample and ffmpeg:
+        print(f'[Merger] Merging formats into "{final_path}"', flush=True)
+        result = subprocess.run(
+            [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", part_path,
+             "-c", "copy", "-movflags", "+faststart", "-f", "mp4", final_path],
+            capture_output=True, text=True,
+        )
+        os.remove(part_path)
+        if result.returncode != 0:
+            print(f"ERROR: Postprocessing: {result.stderr.strip()}", file=sys.stderr)
+            return 1
+    else:
+        os.replace(part_path, final_path)
+    print(f"[download] 100% of {size / 1024 / 1024:.2f}MiB in {time.monotonic() - start:.2f}s", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
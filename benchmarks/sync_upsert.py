@@ -0,0 +1,71 @@
+"""
+Benchmark: bulk upsert vs. row-by-row remote sync.
+
+Builds a throwaway local SQLite database with N transcript rows, then pushes it
+to a second SQLite file standing in for the remote MySQL server, once with the
+legacy SELECT+INSERT/UPDATE loop and once with chunked multi-row upserts.
+
+Usage:
+    python -m benchmarks.sync_upsert --rows 200000 --batch-size 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from backend.models import Base, Course, Video, Transcript
+from backend.services.sync_service import SyncService, REMOTE_PREFIX
+
+
+def _build_local(path: str, rows: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Course), [{"id": 1, "title": "Bench", "playlist_id": "bench"}])
+        conn.execute(insert(Video), [{"id": 1, "course_id": 1, "youtube_id": "x", "title": "v", "order": 0, "duration": 600}])
+        conn.execute(insert(Transcript), [
+            {"id": i, "video_id": 1, "text": f"caption line {i}", "start_time": i * 2.5, "duration": 2.5}
+            for i in range(1, rows + 1)
+        ])
+    return sessionmaker(bind=engine)
+
+
+def _run(label: str, method_name: str, local_session, remote_path: str, batch_size: int, repeat: bool):
+    service = SyncService(remote_url=f"sqlite:///{remote_path}", batch_size=batch_size)
+    service.remote_metadata.create_all(bind=service.remote_engine)
+    method = getattr(service, method_name)
+    db = local_session()
+    try:
+        for model_cls, name in ((Course, "courses"), (Video, "videos")):
+            service._sync_table_core(model_cls, f"{REMOTE_PREFIX}{name}", db)
+        passes = ("insert", "update") if repeat else ("insert",)
+        for phase in passes:
+            start = time.perf_counter()
+            result = method(Transcript, f"{REMOTE_PREFIX}transcripts", db)
+            elapsed = time.perf_counter() - start
+            rate = result["total"] / elapsed if elapsed else 0
+            print(f"{label:<10} {phase:<7} {result['total']:>9} rows  {elapsed:8.2f}s  {rate:12,.0f} rows/s")
+    finally:
+        db.close()
+        service.remote_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--skip-rowwise", action="store_true", help="Only time the bulk path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        local_session = _build_local(os.path.join(tmp, "local.db"), args.rows)
+        if not args.skip_rowwise:
+            _run("rowwise", "_sync_table_rowwise", local_session, os.path.join(tmp, "remote_rowwise.db"), args.batch_size, True)
+        _run("bulk", "_sync_table_core", local_session, os.path.join(tmp, "remote_bulk.db"), args.batch_size, True)
+
+
+if __name__ == "__main__":
+    main()
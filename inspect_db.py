@@ -27,7 +27,8 @@ def inspect():
                     for q in v.questions:
                         print(f"        Q{q.id}: {q.text[:60]}... (Kind: {q.kind})")
                         for a in q.answers:
-                            print(f"          - Answer: {a.user_answer[:40]}... | Score: {a.rating} | Pass: {a.is_correct}")
+                            text = (a.attempt.submission_text if a.attempt else a.user_answer) or ""
+                            print(f"          - Answer: {text[:40]}... | Score: {a.rating} | Pass: {a.is_correct}")
 
     except Exception as e:
         print(f"Error inspecting DB: {e}")
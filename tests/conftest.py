@@ -0,0 +1,68 @@
+"""
+Shared setup: points the app at a throwaway database and state files before
+anything under backend/ is imported, and gives each test an empty database.
+Run from the repository root: python -m pytest -q tests
+"""
+import os
+import tempfile
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="learning-tests-")
+os.environ.update({
+    "LEARNING_DB_URL": f"sqlite:///{_TMP}/learning.db",
+    "SYNC_STATE_FILE": os.path.join(_TMP, "sync_state.json"),
+    "SNAPSHOT_DIR": os.path.join(_TMP, "backups"),
+    "PROFILE_DIR": os.path.join(_TMP, "profiles"),
+    "SESSION_SECRET": "test-secret",
+    "ADMIN_TOKEN": "test-admin-token",
+    "GROQ_API_KEY": "test",
+    "JOB_WORKERS": "0",
+    "SYNC_INTERVAL_MINUTES": "0",
+    "SNAPSHOT_INTERVAL_MINUTES": "0",
+})
+os.environ.pop("AUTH_ALLOW_SIGNUP", None)
+for var in ("sql_user", "sql_pwd", "sql_host", "sql_db"):
+    os.environ.pop(var, None)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend import migrations  # noqa: E402
+from backend.database import Base, SessionLocal, engine  # noqa: E402
+from backend.services import auth, page_cache  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """An empty, fully migrated database; the session is closed afterwards."""
+    migrations.run(engine)
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    # Page versions restart at 0 in the emptied database; don't serve pages from an earlier test
+    page_cache._pages.clear()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    from backend.main import app
+    with TestClient(app) as c:
+        yield c
+
+
+def sign_in(client, username, password="secret-pw"):
+    resp = client.post("/login", data={"username": username, "password": password}, follow_redirects=False)
+    assert resp.status_code == 303, resp.text
+    return resp
+
+
+@pytest.fixture
+def make_user(db):
+    def _make(username, password="secret-pw", is_admin=False):
+        return auth.create_user(db, username, password, is_admin=is_admin)
+    return _make
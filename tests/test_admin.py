@@ -0,0 +1,28 @@
+import os
+
+from backend.services import profiler
+
+from .conftest import sign_in
+
+
+def test_profiles_are_admin_only_and_sandboxed(client, make_user):
+    make_user("ann")
+    make_user("bob")
+    os.makedirs(profiler.PROFILE_DIR, exist_ok=True)
+    name = "20260101-000000-000001-GET-api_progress.html"
+    with open(os.path.join(profiler.PROFILE_DIR, name), "w") as f:
+        f.write("<html><script>fetch('/api/admin/jobs')</script></html>")
+
+    assert client.get(f"/api/admin/profiles/{name}").status_code == 401
+    assert client.get("/api/admin/profiles").status_code == 401
+
+    sign_in(client, "bob")
+    assert client.get(f"/api/admin/profiles/{name}").status_code == 403
+
+    client.cookies.clear()
+    sign_in(client, "ann")
+    assert name in [p["name"] for p in client.get("/api/admin/profiles").json()["profiles"]]
+    resp = client.get(f"/api/admin/profiles/{name}")
+    assert resp.status_code == 200
+    assert resp.headers["content-security-policy"] == "sandbox allow-scripts"
+    assert client.get("/api/admin/profiles/..%2Fsecret.html").status_code == 404
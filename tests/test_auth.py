@@ -0,0 +1,129 @@
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.models import Course, User
+from backend.services import auth
+
+from .conftest import sign_in
+
+
+def test_first_signup_creates_an_admin_then_closes(client, db):
+    resp = client.post("/signup", data={"username": "ann", "password": "secret-pw"}, follow_redirects=False)
+    assert resp.status_code == 303
+    assert auth.SESSION_COOKIE in resp.cookies
+    assert db.query(User).filter(User.username == "ann").one().is_admin
+
+    with TestClient(app) as other:
+        resp = other.post("/signup", data={"username": "bob", "password": "secret-pw"})
+        assert resp.status_code == 403
+    assert db.query(User).count() == 1
+
+
+def test_signup_stays_open_when_allowed(client, make_user, monkeypatch):
+    make_user("ann")
+    monkeypatch.setattr(auth, "AUTH_ALLOW_SIGNUP", True)
+    resp = client.post("/signup", data={"username": "bob", "password": "secret-pw"}, follow_redirects=False)
+    assert resp.status_code == 303
+    assert not auth.is_admin("bob")
+
+
+def test_login_sets_a_session(client, make_user):
+    make_user("ann")
+    assert client.get("/", follow_redirects=False).headers["location"] == "/login?next=/"
+    assert client.get("/api/progress/1").status_code == 401
+
+    resp = client.post("/login", data={"username": "ann", "password": "wrong-pw"})
+    assert resp.status_code == 401
+
+    sign_in(client, "ann")
+    assert client.get("/").status_code == 200
+    assert client.get("/api/progress/1").json()["timestamp"] == 0
+
+
+def test_forged_session_is_rejected(client, make_user):
+    make_user("ann")
+    value = auth.sign_session("ann")
+    client.cookies.set(auth.SESSION_COOKIE, value.replace("ann|", "bob|"))
+    assert client.get("/api/progress/1").status_code == 401
+
+
+def test_admin_routes_need_an_admin(client, db, make_user):
+    make_user("ann")
+    make_user("bob")
+    course = Course(title="Course", playlist_id="PL1")
+    db.add(course)
+    db.commit()
+
+    anonymous = [
+        ("get", "/api/admin/jobs"),
+        ("get", "/api/sync/status"),
+        ("post", "/api/sync/restore?confirm=true"),
+        ("post", f"/api/download_course/{course.id}"),
+        ("get", f"/api/events/download_course/{course.id}"),
+    ]
+    for method, url in anonymous:
+        assert getattr(client, method)(url).status_code == 401, url
+    assert client.post(f"/admin/toggle_course/{course.id}", data={"hide": "true"},
+                       follow_redirects=False).headers["location"].startswith("/login")
+    assert client.post("/ingest", data={"playlist_url": "x"}, follow_redirects=False).headers["location"].startswith("/login")
+
+    sign_in(client, "bob")
+    for method, url in anonymous:
+        assert getattr(client, method)(url).status_code == 403, url
+    assert client.get("/admin").status_code == 403
+    assert client.post("/ingest", data={"playlist_url": "https://youtube.com/playlist?list=PLx"}).status_code == 403
+    assert 'action="/ingest"' not in client.get("/").text
+    assert client.post(f"/admin/toggle_course/{course.id}", data={"hide": "true"}).status_code == 403
+    assert "/admin" not in client.get("/").text.split("<main")[0]
+
+    client.cookies.clear()
+    sign_in(client, "ann")
+    assert client.get("/api/admin/jobs").status_code == 200
+    assert client.get("/api/sync/status").status_code == 200
+    assert client.get("/admin").status_code == 200
+    assert 'action="/ingest"' in client.get("/").text
+    resp = client.post(f"/admin/toggle_course/{course.id}", data={"hide": "true"}, follow_redirects=False)
+    assert resp.status_code == 303
+    db.refresh(course)
+    assert course.is_hidden
+
+
+def test_admin_token_opens_admin_apis(client, make_user):
+    make_user("ann")
+    assert client.get("/api/admin/jobs", headers={auth.ADMIN_TOKEN_HEADER: "nope"}).status_code == 401
+    assert client.get("/api/admin/jobs", headers={auth.ADMIN_TOKEN_HEADER: auth.ADMIN_TOKEN}).status_code == 200
+    assert client.get("/api/sync/status", headers={auth.ADMIN_TOKEN_HEADER: auth.ADMIN_TOKEN}).status_code == 200
+    # Pages still need a signed-in admin
+    assert client.get("/admin", headers={auth.ADMIN_TOKEN_HEADER: auth.ADMIN_TOKEN},
+                      follow_redirects=False).status_code == 303
+
+
+def test_next_url_stays_on_this_site():
+    for url in ("/course/3?x=1", "/admin"):
+        assert auth.safe_next(url) == url
+    for url in (None, "", "https://evil.com", "//evil.com", "/\\evil.com", "/\t/evil.com", "\\\\evil.com",
+                "/\\/evil.com", "http:/evil.com"):
+        assert auth.safe_next(url) == "/", url
+
+
+def test_session_of_a_deleted_account_is_signed_out(client, db, make_user, monkeypatch):
+    monkeypatch.setattr(auth, "ACCOUNT_CHECK_SECONDS", 0)
+    make_user("ann")
+    sign_in(client, "ann")
+    assert client.get("/api/progress/1").status_code == 200
+
+    db.query(User).filter(User.username == "ann").update({"username": "anne"})
+    db.commit()
+    assert client.get("/api/progress/1").status_code == 401
+    assert client.get("/", follow_redirects=False).headers["location"] == "/login?next=/"
+
+
+def test_other_origins_get_no_credentialed_cors(client, make_user):
+    make_user("ann")
+    sign_in(client, "ann")
+    resp = client.get("/api/progress/1", headers={"Origin": "https://evil.example"})
+    # Without an allowed origin echoed back, the browser keeps the response from the page
+    assert "access-control-allow-origin" not in resp.headers
+    preflight = client.options("/api/submit_exam", headers={
+        "Origin": "https://evil.example", "Access-Control-Request-Method": "POST"})
+    assert preflight.status_code == 400
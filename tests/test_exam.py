@@ -0,0 +1,59 @@
+import threading
+
+from backend.models import Course, ExamAttempt, Question, Video
+from backend.services import ai_tutor
+
+from .conftest import sign_in
+
+
+def _video_with_questions(db):
+    db.add(Course(id=1, title="Course", playlist_id="PL1"))
+    db.add(Video(id=1, course_id=1, youtube_id="abc", title="Intro", order=0))
+    db.add_all([Question(id=1, video_id=1, text="Why?"), Question(id=2, video_id=1, text="How?")])
+    db.commit()
+
+
+def _must_not_grade(questions, text):
+    raise AssertionError("a partial transcript must not be graded")
+
+
+def test_spoken_answer_is_graded_off_the_event_loop(client, db, make_user, monkeypatch):
+    _video_with_questions(db)
+    make_user("ann")
+    sign_in(client, "ann")
+    seen = {}
+
+    def transcribe(content):
+        seen["transcribe"] = threading.get_ident()
+        return "Because. Like this."
+
+    def evaluate(questions, text):
+        seen["evaluate"] = threading.get_ident()
+        return {"answered_question_ids": [1, 2], "individual_scores": {"1": 90, "2": 80},
+                "overall_score": 85, "feedback": "Good"}
+
+    monkeypatch.setattr(ai_tutor, "transcribe_audio", transcribe)
+    monkeypatch.setattr(ai_tutor, "evaluate_exam", evaluate)
+    resp = client.post("/api/submit_exam", data={"video_id": "1"},
+                       files={"audio_file": ("answer.webm", b"audio", "audio/webm")})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["passed"] is True
+    # TestClient runs the app's event loop on a thread of its own; the slow calls ran elsewhere
+    loop_thread = client.portal.call(threading.get_ident)
+    assert loop_thread not in (seen["transcribe"], seen["evaluate"])
+
+
+def test_failed_transcription_is_not_graded(client, db, make_user, monkeypatch):
+    _video_with_questions(db)
+    make_user("ann")
+    sign_in(client, "ann")
+
+    def transcribe(content):
+        raise ai_tutor.TranscriptionError("chunk 2 failed")
+
+    monkeypatch.setattr(ai_tutor, "transcribe_audio", transcribe)
+    monkeypatch.setattr(ai_tutor, "evaluate_exam", _must_not_grade)
+    resp = client.post("/api/submit_exam", data={"video_id": "1"},
+                       files={"audio_file": ("answer.webm", b"audio", "audio/webm")})
+    assert resp.status_code == 502
+    assert db.query(ExamAttempt).count() == 0
@@ -0,0 +1,90 @@
+import threading
+
+from sqlalchemy import update
+
+from backend.database import engine
+from backend.models import Course, Job, Video
+from backend.services import jobs, metrics
+
+ADMIN = {"X-Admin-Token": "test-admin-token"}
+
+
+def _fail(job_id):
+    with engine.begin() as conn:
+        conn.execute(update(Job).where(Job.id == job_id).values(status="failed", error="boom"))
+
+
+def test_claim_takes_each_job_once_by_priority(db):
+    low, _ = jobs.enqueue("download_video", {"video_id": 1}, dedupe_key="download_video:1")
+    high, _ = jobs.enqueue("download_video", {"video_id": 2}, dedupe_key="download_video:2", priority=5)
+    assert jobs.enqueue("download_video", {"video_id": 1}, dedupe_key="download_video:1") == (low, False)
+
+    first = jobs._claim("downloads", "w1")
+    second = jobs._claim("downloads", "w2")
+    assert (first.id, second.id) == (high, low)
+    assert (first.status, first.worker, first.attempts) == ("running", "w1", 1)
+    assert jobs._claim("downloads", "w3") is None
+    assert jobs._claim("default", "w3") is None
+
+
+def test_retry_requeues_a_failed_job(db):
+    job_id, _ = jobs.enqueue("download_video", {"video_id": 1}, dedupe_key="download_video:1")
+    assert jobs.retry(job_id) is None  # still queued
+
+    jobs._claim("downloads", "w1")
+    _fail(job_id)
+    assert jobs.retry(job_id) == job_id
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["attempts"]) == ("queued", 0)
+
+
+def test_retry_returns_the_job_that_took_over_its_dedupe_key(db):
+    job_id, _ = jobs.enqueue("download_video", {"video_id": 1}, dedupe_key="download_video:1")
+    _fail(job_id)
+    newer, created = jobs.enqueue("download_video", {"video_id": 1}, dedupe_key="download_video:1")
+    assert created and newer != job_id
+
+    assert jobs.retry(job_id) == newer
+    assert jobs.get_job(job_id)["status"] == "failed"
+
+
+def test_download_video_is_queued_not_run_inline(client, db):
+    db.add(Course(id=1, title="Course", playlist_id="PL1"))
+    db.add(Video(id=1, course_id=1, youtube_id="abc", title="Intro", order=0))
+    db.commit()
+
+    resp = client.post("/api/download_video/1", headers=ADMIN)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["status"] == "queued"
+    assert jobs.get_job(body["job_id"])["kind"] == "download_video"
+    again = client.post("/api/download_video/1", headers=ADMIN).json()
+    assert again == {"status": "already_queued", "job_id": body["job_id"]}
+
+
+def test_stop_workers_kills_the_subprocesses_of_running_jobs(db, monkeypatch):
+    started = threading.Event()
+    returned = {}
+
+    def download(ctx, payload):
+        # The background sleep holds the output pipe, like ffmpeg under yt-dlp
+        returned["code"] = metrics.stream_subprocess(
+            ["sh", "-c", "sleep 60 & echo started; wait"], lambda line: started.set(), timeout=120
+        )
+        raise RuntimeError("download interrupted")
+
+    monkeypatch.setitem(jobs.HANDLERS, "slow_download", ("downloads", download))
+    job_id, _ = jobs.enqueue("slow_download", {})
+    job = jobs._claim("downloads", "w1")
+    runner = threading.Thread(target=jobs._run, args=(job, "w1"))
+    runner.start()
+    try:
+        assert started.wait(10)
+        jobs.stop_workers()
+        runner.join(10)
+        assert not runner.is_alive()
+    finally:
+        jobs._stop.clear()
+    assert returned["code"] != 0
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("queued", 0, "Worker shut down")
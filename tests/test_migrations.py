@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+
+from sqlalchemy import create_engine, text
+
+from backend import migrations
+
+# The schema before exam attempts, per-learner progress, roles and jobs
+LEGACY_SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(255) NOT NULL UNIQUE,
+                    password_hash VARCHAR(255) NOT NULL, created_at DATETIME);
+CREATE TABLE courses (id INTEGER PRIMARY KEY, title VARCHAR(255), description TEXT,
+                      playlist_id VARCHAR(255) UNIQUE, is_hidden BOOLEAN, created_at DATETIME);
+CREATE TABLE videos (id INTEGER PRIMARY KEY, course_id INTEGER REFERENCES courses(id), youtube_id VARCHAR(255),
+                     title VARCHAR(255), "order" INTEGER, duration INTEGER);
+CREATE TABLE questions (id INTEGER PRIMARY KEY, video_id INTEGER REFERENCES videos(id), text TEXT,
+                        kind VARCHAR(50), correct_answer_summary TEXT, timestamp_reference FLOAT,
+                        follow_up_to_id INTEGER);
+CREATE TABLE answers (id INTEGER PRIMARY KEY, question_id INTEGER REFERENCES questions(id), user_answer TEXT,
+                      is_correct BOOLEAN, rating INTEGER, feedback TEXT, created_at DATETIME);
+CREATE TABLE video_progress (id INTEGER PRIMARY KEY, video_id INTEGER REFERENCES videos(id), user_id VARCHAR(255),
+                             completed BOOLEAN, score INTEGER, last_watched_timestamp FLOAT, updated_at DATETIME);
+CREATE TABLE sync_changelog (id INTEGER PRIMARY KEY AUTOINCREMENT, table_name VARCHAR(64) NOT NULL,
+                             row_id INTEGER NOT NULL, op VARCHAR(1) NOT NULL, changed_at DATETIME);
+"""
+
+
+def _legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executescript("""
+        INSERT INTO users VALUES (1, 'ann', 'x', '2025-01-01'), (2, 'bob', 'x', '2025-01-02');
+        INSERT INTO courses VALUES (1, 'Course', NULL, 'PL1', 0, '2025-01-01');
+        INSERT INTO videos VALUES (1, 1, 'yt1', 'One', 0, 60);
+        INSERT INTO questions VALUES (1, 1, 'Q1', 'text', NULL, NULL, NULL), (2, 1, 'Q2', 'text', NULL, NULL, NULL);
+        -- Two submissions of two questions each, a day apart
+        INSERT INTO answers VALUES
+            (1, 1, 'first try', 1, 80, 'ok', '2025-01-01 10:00:00'),
+            (2, 2, 'first try', 1, 60, 'ok', '2025-01-01 10:00:01'),
+            (3, 1, 'second try', 1, 90, 'good', '2025-01-02 10:00:00'),
+            (4, 2, 'second try', 0, 40, 'good', '2025-01-02 10:00:02');
+        INSERT INTO video_progress VALUES
+            (1, 1, NULL, 0, 0, 10.0, '2025-01-01'),
+            (2, 1, NULL, 1, 0, 60.0, '2025-01-02'),
+            (3, 1, 'bob', 0, 0, 5.0, '2025-01-02');
+    """)
+    conn.commit()
+    conn.close()
+
+
+def test_upgrades_a_legacy_database(tmp_path):
+    path = tmp_path / "legacy.db"
+    _legacy_db(path)
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.run(engine)
+
+    with engine.connect() as conn:
+        attempts = conn.execute(text(
+            "SELECT submission_text, overall_score, passed FROM exam_attempts ORDER BY id")).fetchall()
+        assert [(a.submission_text, a.overall_score, bool(a.passed)) for a in attempts] == [
+            ("first try", 70.0, True), ("second try", 65.0, False)]
+        assert conn.execute(text("SELECT COUNT(*) FROM answers WHERE attempt_id IS NULL")).scalar() == 0
+
+        progress = conn.execute(text(
+            "SELECT user_id, completed FROM video_progress ORDER BY user_id")).fetchall()
+        assert [(p.user_id, bool(p.completed)) for p in progress] == [("bob", False), ("user", True)]
+
+        admins = conn.execute(text("SELECT username FROM users WHERE is_admin")).scalars().all()
+        assert admins == ["ann"]
+        for column in ("local_filename",):
+            assert column in [r[1] for r in conn.execute(text("PRAGMA table_info(videos)"))]
+        assert "detail" in [r[1] for r in conn.execute(text("PRAGMA table_info(jobs)"))]
+        triggers = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).scalars().all()
+        assert "trg_sync_answers_u" in triggers
+    engine.dispose()
+
+
+def test_concurrent_startups_migrate_once(tmp_path):
+    path = tmp_path / "legacy.db"
+    _legacy_db(path)
+    engines = [create_engine(f"sqlite:///{path}") for _ in range(4)]
+    errors = []
+    start = threading.Barrier(len(engines))
+
+    def _worker(engine):
+        try:
+            start.wait()
+            migrations.run(engine)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_worker, args=(e,)) for e in engines]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    with engines[0].connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM exam_attempts")).scalar() == 2
+        assert conn.execute(text("SELECT COUNT(*) FROM users WHERE is_admin")).scalar() == 1
+    for engine in engines:
+        engine.dispose()
+
+
+def test_migrating_twice_changes_nothing(tmp_path):
+    path = tmp_path / "legacy.db"
+    _legacy_db(path)
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.run(engine)
+    with engine.connect() as conn:
+        before = conn.execute(text("SELECT MAX(id) FROM sync_changelog")).scalar()
+    migrations.run(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM exam_attempts")).scalar() == 2
+        assert conn.execute(text("SELECT MAX(id) FROM sync_changelog")).scalar() == before
+    engine.dispose()
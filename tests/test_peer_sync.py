@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import zlib
+
+import pytest
+
+from backend.database import engine
+from backend.models import Course
+from backend.services import peer_sync
+
+SECRET = "peer-secret"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def peer_secret(monkeypatch):
+    monkeypatch.setattr(peer_sync, "PEER_SECRET", SECRET)
+    return {peer_sync.PEER_SECRET_HEADER: SECRET}
+
+
+def _export(client, headers, **params):
+    with client.stream("GET", "/api/sync/peer/export", params=params, headers=headers) as resp:
+        assert resp.status_code == 200
+        # The raw (still gzip-compressed) body, as a peer reads it
+        return list(peer_sync._iter_records(resp.iter_raw()))
+
+
+def test_peer_endpoints_need_the_secret(client, monkeypatch):
+    monkeypatch.setattr(peer_sync, "PEER_SECRET", "")
+    assert client.get("/api/sync/peer/info").status_code == 403
+
+    monkeypatch.setattr(peer_sync, "PEER_SECRET", SECRET)
+    for headers in ({}, {peer_sync.PEER_SECRET_HEADER: "wrong"}):
+        assert client.get("/api/sync/peer/info", headers=headers).status_code == 401
+        assert client.get("/api/sync/peer/export", headers=headers).status_code == 401
+        assert client.post("/api/sync/peer/import", content=b"", headers=headers).status_code == 401
+    assert client.post("/api/sync/peer/sync").status_code == 401
+    assert client.get("/api/sync/peer/info", headers={peer_sync.PEER_SECRET_HEADER: SECRET}).status_code == 200
+
+
+def test_export_carries_no_accounts(client, db, make_user, peer_secret):
+    make_user("ann")
+    db.add(Course(title="Course", playlist_id="PL1"))
+    db.commit()
+    records = _export(client, peer_secret)
+    assert {r["table"] for r in records if r["type"] == "row"} == {"courses"}
+    assert not any("password_hash" in r.get("data", {}) for r in records)
+    assert records[-1]["type"] == "end"
+
+
+# Runs one instance's side of an exchange in its own process, against its own database and state
+PEER_SCRIPT = """
+import json, sys
+from sqlalchemy import text
+from backend import migrations
+from backend.database import engine
+from backend.services import peer_sync
+
+migrations.run(engine)
+action, arg = sys.argv[1], (sys.argv[2:] or [None])[0]
+if action == "sql":
+    with engine.begin() as conn:
+        for stmt in arg.split(";"):
+            conn.execute(text(stmt))
+elif action == "export":
+    since = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    header, body = peer_sync.build_export(since, requester=None)
+    with open(arg, "wb") as f:
+        for chunk in body:
+            f.write(chunk)
+    print(json.dumps(header))
+elif action == "import":
+    with open(arg, "rb") as f:
+        print(json.dumps(peer_sync.import_changes([f.read()])))
+elif action == "dump":
+    with engine.connect() as conn:
+        print(json.dumps({
+            "courses": sorted(conn.execute(text(
+                "SELECT c.title, c.playlist_id, group_concat(v.youtube_id) FROM courses c "
+                "LEFT JOIN videos v ON v.course_id = c.id GROUP BY c.id")).all()),
+            "questions": sorted(conn.execute(text(
+                "SELECT v.youtube_id, q.text FROM questions q JOIN videos v ON v.id = q.video_id")).all()),
+            "progress": sorted(conn.execute(text(
+                "SELECT p.user_id, v.youtube_id FROM video_progress p JOIN videos v ON v.id = p.video_id")).all()),
+        }, default=list))
+"""
+
+
+class _Peer:
+    def __init__(self, tmp_path, name):
+        self.env = {
+            **os.environ,
+            "LEARNING_DB_URL": f"sqlite:///{tmp_path}/{name}.db",
+            "SYNC_STATE_FILE": str(tmp_path / f"{name}_state.json"),
+            "SYNC_NODE_NAME": name,
+        }
+        self.dir = tmp_path
+        self.name = name
+        self.high_water = None
+
+    def run(self, *args):
+        proc = subprocess.run([sys.executable, "-c", PEER_SCRIPT, *map(str, args)], env=self.env,
+                              cwd=ROOT, capture_output=True, text=True, timeout=120)
+        assert proc.returncode == 0, proc.stderr
+        return json.loads(proc.stdout.strip().splitlines()[-1]) if proc.stdout.strip() else None
+
+    def send_to(self, other, full=False):
+        path = self.dir / f"{self.name}.ndjson.gz"
+        since = [] if full or self.high_water is None else [self.high_water]
+        self.high_water = self.run("export", path, *since)["high_water"]
+        result = other.run("import", path)
+        assert result["status"] == "success", result
+        return result
+
+
+def _seed(peer, title, playlist):
+    # Both instances start numbering at 1; the shared playlist exists on both
+    peer.run("sql", ";".join([
+        f"INSERT INTO courses (title, playlist_id) VALUES ('{title}', '{playlist}')",
+        f"INSERT INTO videos (course_id, youtube_id, title) VALUES (1, '{playlist}-v1', 'Intro')",
+        f"INSERT INTO questions (video_id, text) VALUES (1, 'Question on {title}')",
+        "INSERT INTO courses (title, playlist_id) VALUES ('Shared', 'PL-S')",
+        "INSERT INTO videos (course_id, youtube_id, title) VALUES (2, 'S-v1', 'Shared intro')",
+        f"INSERT INTO video_progress (video_id, user_id, last_watched_timestamp) VALUES (2, 'ann', {len(title)})",
+    ]))
+
+
+def test_two_peers_keep_independently_created_rows(tmp_path):
+    a, b = _Peer(tmp_path, "a"), _Peer(tmp_path, "b")
+    _seed(a, "Alpha", "PL-A")
+    _seed(b, "Beta", "PL-B")
+
+    a.send_to(b)
+    b.send_to(a)
+    state = a.run("dump")
+    assert state == b.run("dump")
+    assert state["courses"] == [["Alpha", "PL-A", "PL-A-v1"], ["Beta", "PL-B", "PL-B-v1"], ["Shared", "PL-S", "S-v1"]]
+    assert state["questions"] == [["PL-A-v1", "Question on Alpha"], ["PL-B-v1", "Question on Beta"]]
+    assert state["progress"] == [["ann", "S-v1"]]
+
+    # Edits and deletes of rows created on the other side travel incrementally
+    b.run("sql", "UPDATE courses SET title = 'Alpha 2' WHERE playlist_id = 'PL-A'")
+    a.run("sql", "DELETE FROM questions WHERE text = 'Question on Beta'")
+    b.send_to(a)
+    a.send_to(b)
+    state = a.run("dump")
+    assert state == b.run("dump")
+    assert ["Alpha 2", "PL-A", "PL-A-v1"] in state["courses"]
+    assert state["questions"] == [["PL-A-v1", "Question on Alpha"]]
+
+    # Exchanging everything again changes nothing
+    a.send_to(b, full=True)
+    b.send_to(a, full=True)
+    assert a.run("dump") == b.run("dump") == state
+
+
+def _stream(records):
+    """An export stream as a peer sends it: one gzip stream, arriving line by line."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for record in records:
+        yield compressor.compress(peer_sync._line(record)) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def _course_records(count, end=True):
+    yield {"type": "header", "format": peer_sync.EXPORT_FORMAT, "node": "other", "since": None,
+           "high_water": 9, "full": True}
+    for n in range(1, count + 1):
+        yield {"type": "row", "table": "courses", "uid": f"other:{n}",
+               "data": {"title": f"Course {n}", "playlist_id": f"PL{n}", "is_hidden": False}}
+    if end:
+        yield {"type": "end", "rows": count, "deletes": 0}
+
+
+def test_import_commits_batch_by_batch(db, monkeypatch):
+    monkeypatch.setattr(peer_sync.get_sync_service(), "batch_size", 2)
+    seen = []
+
+    def _watched(chunks):
+        for chunk in chunks:
+            yield chunk
+            # Between chunks, other connections can write and see the batches committed so far
+            other = sqlite3.connect(engine.url.database, timeout=0, isolation_level=None)
+            other.execute("BEGIN IMMEDIATE")
+            seen.append(other.execute("SELECT COUNT(*) FROM courses").fetchone()[0])
+            other.execute("ROLLBACK")
+            other.close()
+
+    # The stream breaks off after five rows
+    result = peer_sync.import_changes(_watched(_stream(_course_records(5, end=False))), "other")
+    assert result["status"] == "error" and not result["complete"]
+    assert seen[-1] == 4 and sorted(set(seen)) == [0, 2, 4]
+    assert db.query(Course).count() == 5
+
+    # The next exchange sends them again; nothing is duplicated
+    result = peer_sync.import_changes(_stream(_course_records(5)), "other")
+    assert result["status"] == "success"
+    assert db.query(Course).count() == 5
+
+
+def test_pushed_stream_is_read_as_it_arrives(client, db, peer_secret):
+    resp = client.post("/api/sync/peer/import", params={"peer": "other"}, content=_stream(_course_records(3)),
+                       headers={**peer_secret, "Content-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "success", resp.json()
+    assert db.query(Course).count() == 3
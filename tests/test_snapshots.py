@@ -0,0 +1,35 @@
+import fcntl
+import os
+
+from backend.models import Course
+from backend.services import snapshots
+
+
+def test_schedulers_of_several_processes_share_one_snapshot(db):
+    db.add(Course(title="Course", playlist_id="PL1"))
+    db.commit()
+    before = len(snapshots.list_snapshots())
+
+    # Another process's scheduler is mid-snapshot
+    os.makedirs(snapshots.SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(snapshots.SNAPSHOT_DIR, snapshots.SCHEDULER_LOCK_FILE), "a") as held:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        assert snapshots.scheduled_snapshot(3600)["status"] == "skipped"
+
+    assert snapshots.scheduled_snapshot(3600)["status"] == "success"
+    # A scheduler whose tick comes a little later finds the fresh snapshot
+    db.add(Course(title="Other", playlist_id="PL2"))
+    db.commit()
+    assert snapshots.scheduled_snapshot(3600) == {"status": "skipped", "message": "A snapshot was taken recently."}
+    assert len(snapshots.list_snapshots()) == before + 1
+
+
+def test_unchanged_check_holds_across_processes(db):
+    assert snapshots.create_snapshot()["status"] == "success"
+    # The signature is kept on disk rather than in the process that took the snapshot
+    assert snapshots._last_source_signature() is not None
+    assert snapshots.scheduled_snapshot(0) == {"status": "skipped", "message": "Database unchanged since the last snapshot."}
+
+    db.add(Course(title="Course", playlist_id="PL1"))
+    db.commit()
+    assert snapshots.scheduled_snapshot(0)["status"] == "success"
@@ -0,0 +1,305 @@
+import sqlite3
+
+from sqlalchemy import create_engine, inspect, select
+
+from backend.database import SessionLocal, engine
+from backend.models import Course, SyncChange, User, Video
+from backend.services import analytics, jobs, peer_sync, sync_scheduler, sync_service
+from backend.services.sync_service import REMOTE_PREFIX, SyncService
+
+ADMIN = {"X-Admin-Token": "test-admin-token"}
+
+
+def _service(tmp_path, **options):
+    """A SyncService mirroring to a SQLite file, which stands in for the MySQL remote."""
+    return SyncService(remote_url=f"sqlite:///{tmp_path}/remote.db", **options)
+
+
+def _local_rows(table):
+    with engine.connect() as conn:
+        return [dict(r) for r in conn.execute(select(table).order_by(table.c.id)).mappings()]
+
+
+def _remote_rows(service, table):
+    remote = service.remote_metadata.tables[f"{REMOTE_PREFIX}{table.name}"]
+    with service.remote_engine.connect() as conn:
+        return [dict(r) for r in conn.execute(select(remote).order_by(remote.c.id)).mappings()]
+
+
+def _add_courses(db, *playlists):
+    for playlist in playlists:
+        db.add(Course(title=f"Course {playlist}", playlist_id=playlist))
+    db.commit()
+
+
+def _copy_local_db(dest):
+    src = sqlite3.connect(engine.url.database)
+    out = sqlite3.connect(dest)
+    src.backup(out)
+    out.close()
+    src.close()
+
+
+def test_mirror_holds_no_accounts(db, make_user, tmp_path):
+    make_user("ann")
+    db.add(Course(title="Course", playlist_id="PL1"))
+    db.commit()
+    remote_url = f"sqlite:///{tmp_path}/remote.db"
+    remote = create_engine(remote_url)
+    with remote.begin() as conn:
+        # A mirror written before accounts were kept local
+        conn.exec_driver_sql(f"CREATE TABLE {REMOTE_PREFIX}users (id INTEGER PRIMARY KEY, password_hash TEXT)")
+
+    service = SyncService(remote_url=remote_url)
+    assert service.run_sync(force=True)["status"] == "success"
+
+    tables = inspect(remote).get_table_names()
+    assert f"{REMOTE_PREFIX}courses" in tables
+    assert f"{REMOTE_PREFIX}users" not in tables
+
+    # A restore rebuilds everything else from the mirror and keeps the local accounts
+    target = tmp_path / "restored.db"
+    _copy_local_db(target)
+    result = service.restore(str(target))
+    assert result["status"] == "success", result
+    restored = create_engine(f"sqlite:///{target}")
+    with restored.connect() as conn:
+        assert conn.execute(User.__table__.select()).mappings().one()["username"] == "ann"
+        assert conn.execute(Course.__table__.select()).mappings().one()["playlist_id"] == "PL1"
+    restored.dispose()
+    remote.dispose()
+
+
+def test_restore_keeps_the_changelog_sequence_and_resets_peer_cursors(db, tmp_path):
+    db.add(Course(title="Course", playlist_id="PL1"))
+    db.commit()
+    service = SyncService(remote_url=f"sqlite:///{tmp_path}/remote.db")
+    assert service.run_sync(force=True)["status"] == "success"
+    for n in range(3):
+        db.add(Course(title=f"Later {n}", playlist_id=f"PL-later-{n}"))
+        db.commit()
+    before = analytics.data_version(db)
+    service._save_state({
+        "peer_acks": {"other": before},
+        "peers": {"http://other:8000": {"node": "other", "pulled": 12, "pushed": before}},
+    })
+    db.close()
+
+    # A connection opened before the restore, like another worker process's
+    held = sqlite3.connect(engine.url.database, isolation_level=None)
+    held.execute("SELECT 1 FROM courses").fetchall()
+
+    # Restores the live database: the courses added after the sync are gone
+    result = service.restore()
+    assert result["status"] == "success", result
+    backup = sqlite3.connect(result["backup"])
+    assert backup.execute("SELECT COUNT(*) FROM courses").fetchone()[0] == 4
+    backup.close()
+
+    # ...sees the restored rows, and what it writes lands in the live file
+    assert held.execute("SELECT playlist_id FROM courses").fetchall() == [("PL1",)]
+    held.execute("INSERT INTO courses (title, playlist_id) VALUES ('Held', 'PL-held')")
+    held.close()
+    with SessionLocal() as session:
+        assert session.query(Course).filter(Course.playlist_id == "PL-held").count() == 1
+        session.query(Course).filter(Course.playlist_id == "PL-held").delete()
+        session.commit()
+
+    state = service._get_state()
+    assert state["peer_acks"] == {}
+    assert state["peers"]["http://other:8000"] == {"node": "other", "pulled": None, "pushed": None}
+    assert state["pruned_through"] > before
+
+    with SessionLocal() as session:
+        assert analytics.data_version(session) > before
+
+    # A peer that pulled up to the old changelog gets everything again, under the same uids
+    header, body = peer_sync.build_export(before, requester="other")
+    assert header["full"] and header["high_water"] >= state["pruned_through"]
+    rows = [r for r in peer_sync._iter_records(body) if r["type"] == "row"]
+    assert [(r["uid"], r["data"]["playlist_id"]) for r in rows] == [(f"{peer_sync.node_id()}:1", "PL1")]
+
+    # ...then only what changed since
+    with SessionLocal() as session:
+        session.add(Course(title="After", playlist_id="PL-after"))
+        session.commit()
+    header, body = peer_sync.build_export(header["high_water"], requester="other")
+    assert not header["full"]
+    assert [r["data"]["playlist_id"] for r in peer_sync._iter_records(body) if r["type"] == "row"] == ["PL-after"]
+
+
+def test_sync_runs_are_shared_jobs_one_at_a_time(client, db, tmp_path, monkeypatch):
+    db.add(Course(title="Course", playlist_id="PL1"))
+    db.commit()
+    service = SyncService(remote_url=f"sqlite:///{tmp_path}/remote.db")
+    monkeypatch.setattr(sync_scheduler, "get_sync_service", lambda: service)
+
+    started = sync_scheduler.start_sync_job(force=True)
+    assert started["status"] == "started"
+    # Any mode, from any process, finds the queued run
+    assert sync_scheduler.start_sync_job(mode="restore") == {"status": "already_running", "job_id": started["job_id"]}
+    status = client.get("/api/sync/status", headers=ADMIN).json()
+    assert status["current_job_id"] == started["job_id"]
+    assert client.get(f"/api/sync/jobs/{started['job_id']}", headers=ADMIN).json()["status"] == "queued"
+
+    job = jobs._claim("sync", "w1")
+    assert job.id == started["job_id"]
+    jobs._run(job, "w1")
+
+    report = client.get(f"/api/sync/jobs/{started['job_id']}", headers=ADMIN).json()
+    assert report["status"] == "success", report
+    assert (report["mode"], report["force"]) == ("sync", True)
+    assert report["tables"]["courses"]["rows"] == 1
+    assert sync_scheduler.current_job_id() is None
+    assert client.get("/api/sync/jobs/999999", headers=ADMIN).status_code == 404
+
+
+def test_bulk_upsert_inserts_and_updates_remote_rows(db, tmp_path):
+    _add_courses(db, "PL1", "PL2", "PL3", "PL4", "PL5")
+    service = _service(tmp_path, batch_size=2)
+    service.remote_metadata.create_all(bind=service.remote_engine)
+    table = Course.__table__
+    remote = service.remote_metadata.tables[f"{REMOTE_PREFIX}courses"]
+    with service.remote_engine.begin() as conn:
+        # Already on the remote, but out of date
+        conn.execute(remote.insert(), [{"id": 1, "title": "Stale", "playlist_id": "PL1"}])
+
+    with SessionLocal() as session:
+        result = service._sync_table_core(Course, remote.name, session)
+    assert (result["upserted"], result["batches"]) == (5, 3)
+    assert _remote_rows(service, table) == _local_rows(table)
+
+    db.query(Course).filter(Course.playlist_id == "PL2").update({"title": "Renamed"})
+    db.commit()
+    with SessionLocal() as session:
+        service._sync_table_core(Course, remote.name, session)
+    assert _remote_rows(service, table) == _local_rows(table)
+
+
+def test_incremental_sync_sends_only_changed_rows_and_prunes_the_changelog(db, tmp_path):
+    _add_courses(db, "PL1", "PL2", "PL3", "PL4")
+    service = _service(tmp_path)
+    service._save_state({"peer_acks": {}})
+    first = service.run_sync(force=True)
+    assert first["status"] == "success"
+    assert "incremental" not in first["details"]["Course"]
+    assert db.query(SyncChange).count() == 0
+
+    db.query(Course).filter(Course.playlist_id == "PL2").update({"title": "Renamed"})
+    db.query(Course).filter(Course.playlist_id == "PL3").delete()
+    db.add(Course(title="Course PL5", playlist_id="PL5"))
+    db.commit()
+    assert db.query(SyncChange).count() == 3
+
+    second = service.run_sync(force=True)
+    assert second["status"] == "success"
+    course = second["details"]["Course"]
+    assert course["incremental"] is True
+    assert (course["total"], course["upserted"], course["deleted"]) == (3, 2, 1)
+    assert second["details"]["Video"]["total"] == 0
+    assert _remote_rows(service, Course.__table__) == _local_rows(Course.__table__)
+    assert db.query(SyncChange).count() == 0
+
+
+def test_verify_finds_injected_drift_and_repair_clears_it(db, tmp_path):
+    _add_courses(db, *[f"PL{i}" for i in range(1, 41)])
+    service = _service(tmp_path)
+    assert service.run_sync(force=True)["status"] == "success"
+    assert service.reconcile(leaf_size=4, fanout=4)["in_sync"] is True
+
+    remote = service.remote_metadata.tables[f"{REMOTE_PREFIX}courses"]
+    with service.remote_engine.begin() as conn:
+        conn.execute(remote.update().where(remote.c.id == 5).values(title="Drifted"))
+        conn.execute(remote.delete().where(remote.c.id == 30))
+        conn.execute(remote.insert(), [{"id": 100, "title": "Stray", "playlist_id": "PLX"}])
+
+    report = service.reconcile(leaf_size=4, fanout=4)
+    assert report["in_sync"] is False
+    ranges = report["details"]["Course"]["differing_ranges"]
+    assert [lo <= 5 <= hi for lo, hi in ranges].count(True) == 1
+    assert [lo <= 30 <= hi for lo, hi in ranges].count(True) == 1
+    assert [lo <= 100 <= hi for lo, hi in ranges].count(True) == 1
+    # Only the leaves holding drift, not the whole table
+    assert all(hi - lo < 4 for lo, hi in ranges) and len(ranges) == 3
+    assert report["details"]["Video"]["differing_ranges"] == []
+
+    repaired = service.reconcile(repair=True, leaf_size=4, fanout=4)
+    assert (repaired["details"]["Course"]["resent"], repaired["details"]["Course"]["deleted"]) == (8, 1)
+    again = service.reconcile(leaf_size=4, fanout=4)
+    assert again["in_sync"] is True
+    assert _remote_rows(service, Course.__table__) == _local_rows(Course.__table__)
+
+
+def test_full_sync_streams_the_table_in_bounded_batches(db, tmp_path):
+    _add_courses(db, *[f"PL{i}" for i in range(1, 11)])
+    service = _service(tmp_path, batch_size=3)
+
+    with SessionLocal() as session:
+        chunks = list(service._stream_rows(session, Course.__table__))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    assert [row["id"] for chunk in chunks for row in chunk] == sorted(c.id for c in db.query(Course))
+
+    result = service.run_sync(force=True)
+    assert result["status"] == "success"
+    assert (result["details"]["Course"]["upserted"], result["details"]["Course"]["batches"]) == (10, 4)
+    assert _remote_rows(service, Course.__table__) == _local_rows(Course.__table__)
+
+
+def _add_course_videos(db, courses, per_course):
+    _add_courses(db, *[f"PL{i}" for i in range(1, courses + 1)])
+    for course in db.query(Course).all():
+        for n in range(per_course):
+            db.add(Video(course_id=course.id, youtube_id=f"{course.playlist_id}-{n}", title=f"Video {n}", order=n))
+    db.commit()
+
+
+def test_partitioned_sync_copies_every_row_once(db, tmp_path):
+    _add_course_videos(db, courses=10, per_course=2)
+    service = _service(tmp_path, batch_size=2, parallelism=2, partition_rows=3)
+
+    result = service.run_sync(force=True)
+    assert result["status"] == "success"
+    courses, videos = result["details"]["Course"], result["details"]["Video"]
+    assert (courses["partitions"], courses["total"]) == (4, 10)
+    assert (videos["partitions"], videos["total"]) == (7, 20)
+    progress = service.get_progress()
+    assert progress["videos"]["status"] == "done"
+    assert progress["videos"]["rows"] == progress["videos"]["expected"] == 20
+    assert _remote_rows(service, Course.__table__) == _local_rows(Course.__table__)
+    assert _remote_rows(service, Video.__table__) == _local_rows(Video.__table__)
+
+
+def test_rowwise_partitions_send_only_their_own_slice(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(sync_service, "UPSERT_DIALECTS", ())
+    _add_course_videos(db, courses=10, per_course=1)
+    service = _service(tmp_path, parallelism=2, partition_rows=3)
+
+    result = service.run_sync(force=True)
+    assert result["status"] == "success"
+    courses = result["details"]["Course"]
+    assert (courses["partitions"], courses["total"], courses["synced"], courses["updated"]) == (4, 10, 10, 0)
+    assert _remote_rows(service, Video.__table__) == _local_rows(Video.__table__)
+
+
+def test_changelog_is_capped_while_the_remote_has_never_synced(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(sync_service, "SYNC_CHANGELOG_MAX_ROWS", 4)
+    service = _service(tmp_path)
+    service._save_state({"peer_acks": {}})
+    # Emptying the other tables for this test logged deletes of its own
+    db.query(SyncChange).delete()
+    _add_courses(db, "PL1", "PL2", "PL3")
+    service.prune_changelog(db)
+    # Within the cap the remote still needs every entry
+    assert db.query(SyncChange).count() == 3
+
+    _add_courses(db, "PL4", "PL5")
+    high = max(change.id for change in db.query(SyncChange))
+    service.prune_changelog(db)
+    assert db.query(SyncChange).count() == 0
+    state = service._get_state()
+    assert (state["pruned_through"], state["watermarks"]) == (high, {})
+
+    # The dropped entries are covered by a full transfer
+    result = service.run_sync(force=True)
+    assert "incremental" not in result["details"]["Course"]
+    assert _remote_rows(service, Course.__table__) == _local_rows(Course.__table__)